@@ -348,7 +348,13 @@ def table(
             return t
 
         table("games", "release_key")
-        table("users", "email")
+        users = table("users", "email")
+        users.add_global_secondary_index(
+            index_name="user_id-index",
+            partition_key=dynamodb.Attribute(
+                name="user_id", type=dynamodb.AttributeType.STRING
+            ),
+        )
         libraries = table("user_libraries", "user_id", "release_key")
         libraries.add_global_secondary_index(
             index_name="release_key-index",
@@ -356,8 +362,16 @@ def table(
                 name="release_key", type=dynamodb.AttributeType.STRING
             ),
         )
-        table("enrichment_jobs", "job_id")
+        jobs = table("enrichment_jobs", "job_id", ttl="expires_at")
+        # Sparse: only pending and running jobs carry active_status.
+        jobs.add_global_secondary_index(
+            index_name="active_status-index",
+            partition_key=dynamodb.Attribute(
+                name="active_status", type=dynamodb.AttributeType.STRING
+            ),
+        )
         table("metadata_overrides", "slug")
+        table("game_entities", "slug")
         table("profile_pics", "user_id")
         table("config", "key")
         passkeys = table("passkeys", "credential_id")
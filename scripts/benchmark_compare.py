@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""Benchmark the comparison service against a synthetic in-memory read model.
+
+Generates, from a fixed seed, N users with libraries drawn from M games, then
+times `compare()` and its pipeline stages (`_merge_duplicates`, `_filter`,
+`present_games`, ...) for shared, owned, exclusive and installed-only queries,
+and records the peak memory of one full comparison. Nothing touches DynamoDB:
+the read model is served by `InMemoryRepository`, so the numbers are the
+service's own cost.
+
+The catalog mimics a real one: most games are sold on one store, some on two or
+three (cross-platform duplicates the comparison merges), a few percent carry a
+manual override, and ownership follows a long-tailed popularity curve so
+friends' libraries overlap the way they do in practice.
+
+Results are written as JSON so runs from different releases can be diffed.
+
+Usage:
+    uv run python scripts/benchmark_compare.py
+    uv run python scripts/benchmark_compare.py --sizes 5x1000,50x10000 \\
+        --repeat 3 --output benchmark.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterable
+
+import numpy as np
+
+from gamatrix.constants import IGDB_GAME_MODE
+from gamatrix.games import service
+from gamatrix.games.cache import get_result_cache
+from gamatrix.games.catalog import build_catalog
+from gamatrix.games.entities import build_entity
+from gamatrix.games.service import ComparisonQuery, SortSpec
+from gamatrix.games.web import WebCompareOptions, present_games
+from gamatrix.storage import interning
+from gamatrix.storage.interning import InternedGame
+from gamatrix.storage.ownership import OwnershipIndex
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+log = logging.getLogger("benchmark_compare")
+
+DEFAULT_SIZES = "5x1000,50x10000,200x50000"
+DEFAULT_SEED = 1234
+DEFAULT_REPEAT = 5
+DEFAULT_SELECTED = 3
+
+# Store mix of a game's first release, and how often it is on more stores.
+STORE_WEIGHTS = {
+    "steam": 0.55,
+    "gog": 0.18,
+    "epic": 0.12,
+    "origin": 0.05,
+    "uplay": 0.04,
+    "battlenet": 0.03,
+    "xboxone": 0.02,
+    "bethesda": 0.01,
+}
+EXTRA_RELEASE_RATE = 0.25
+OVERRIDE_RATE = 0.03
+MULTIPLAYER_RATE = 0.35
+INSTALLED_RATE = 0.2
+# Library sizes are log-normal around this share of the catalog, capped.
+LIBRARY_SHARE = 0.08
+MAX_LIBRARY = 5000
+# Exponent of the popularity curve games are drawn from (0 is uniform).
+POPULARITY_SKEW = 0.8
+
+
+@dataclass(frozen=True)
+class Size:
+    users: int
+    games: int
+
+    @property
+    def label(self) -> str:
+        return f"{self.users}x{self.games}"
+
+
+def parse_sizes(raw: str) -> list[Size]:
+    """Parse `5x1000,50x10000` into sizes, smallest first."""
+    sizes = []
+    for part in raw.split(","):
+        users, _, games = part.strip().lower().partition("x")
+        if not users.isdigit() or not games.isdigit() or not int(users):
+            raise SystemExit(f"Bad size {part!r}; expected USERSxGAMES.")
+        sizes.append(Size(int(users), int(games)))
+    return sorted(sizes, key=lambda size: (size.games, size.users))
+
+
+@dataclass
+class Dataset:
+    users: list[dict]
+    games: dict[str, dict]
+    overrides: dict[str, dict]
+    libraries: dict[str, list[dict]]
+
+
+def generate(size: Size, seed: int) -> Dataset:
+    """Build a reproducible catalog and user libraries for `size`.
+
+    Keys only depend on the position of a game or user, so sizes run in one
+    process share interned ids instead of each growing the id space.
+    """
+    rng = np.random.default_rng(seed)
+    stores = list(STORE_WEIGHTS)
+    weights = np.array(list(STORE_WEIGHTS.values()))
+    weights /= weights.sum()
+
+    games: dict[str, dict] = {}
+    overrides: dict[str, dict] = {}
+    popularity: list[float] = []
+    ranks = rng.permutation(size.games)
+    for n in range(size.games):
+        slug = f"game-{n:06d}"
+        multiplayer = bool(rng.random() < MULTIPLAYER_RATE)
+        max_players = int(rng.integers(2, 9)) if multiplayer else 0
+        modes = [IGDB_GAME_MODE["singleplayer"]]
+        if multiplayer:
+            modes.append(IGDB_GAME_MODE["multiplayer"])
+        releases = 1 + int(rng.random() < EXTRA_RELEASE_RATE)
+        releases += int(releases > 1 and rng.random() < EXTRA_RELEASE_RATE)
+        for store in rng.choice(stores, size=releases, replace=False, p=weights):
+            release_key = f"{store}_{n}"
+            games[release_key] = {
+                "release_key": release_key,
+                "title": f"Game {n}",
+                "slug": slug,
+                "igdb_key": slug,
+                "platform": str(store),
+                "multiplayer": multiplayer,
+                "max_players": max_players,
+                "game_modes": modes,
+                "rating": round(float(rng.uniform(40, 95)), 1),
+                "rating_count": int(rng.integers(0, 500)),
+                "enrichment_status": "done",
+            }
+            popularity.append(1 / (ranks[n] + 1) ** POPULARITY_SKEW)
+        if rng.random() < OVERRIDE_RATE:
+            overrides[slug] = {
+                "slug": slug,
+                "max_players": int(rng.integers(2, 17)),
+                "comment": "Needs a LAN emulator",
+            }
+
+    release_keys = list(games)
+    # Gumbel top-k draws k distinct releases weighted by popularity in one pass.
+    log_weights = np.log(np.array(popularity))
+    median = max(1, int(len(release_keys) * LIBRARY_SHARE))
+    users = []
+    libraries = {}
+    for u in range(size.users):
+        user_id = f"bench-{u:04d}"
+        users.append({"user_id": user_id, "username": f"Player {u}"})
+        count = int(rng.lognormal(np.log(median), 0.6))
+        count = min(max(count, 1), MAX_LIBRARY, len(release_keys))
+        scores = log_weights + rng.gumbel(size=len(release_keys))
+        picks = np.argpartition(-scores, count - 1)[:count]
+        installed = rng.random(count) < INSTALLED_RATE
+        libraries[user_id] = [
+            {
+                "user_id": user_id,
+                "release_key": release_keys[int(i)],
+                "installed": bool(flag),
+            }
+            for i, flag in zip(picks, installed)
+        ]
+    return Dataset(users, games, overrides, libraries)
+
+
+class InMemoryRepository:
+    """A `ComparisonRepository` over a generated dataset.
+
+    The read model never changes, so the version stamp is constant and
+    `changed_slugs` never offers a patch.
+    """
+
+    def __init__(self, data: Dataset) -> None:
+        self._users = data.users
+        self._users_by_id = {str(u["user_id"]): u for u in data.users}
+        self._games = {
+            interning.release_keys.intern(rk): InternedGame(
+                interning.slugs.intern(game["slug"]), game
+            )
+            for rk, game in data.games.items()
+        }
+        self._overrides = {
+            interning.slugs.intern(slug): override
+            for slug, override in data.overrides.items()
+        }
+        releases: dict[str, list[dict]] = {}
+        for game in data.games.values():
+            releases.setdefault(game["slug"], []).append(game)
+        self._entities = {
+            interning.slugs.intern(slug): build_entity(
+                slug, rows, data.overrides.get(slug)
+            )
+            for slug, rows in releases.items()
+        }
+        self._index = OwnershipIndex()
+        for user_id, rows in data.libraries.items():
+            self._index.set_user(user_id, rows)
+
+    def scan_users(self) -> list[dict]:
+        return self._users
+
+    def users_by_user_id(self) -> dict[str, dict]:
+        return self._users_by_id
+
+    def get_ownership_index(self, user_ids: Iterable[str]) -> OwnershipIndex:
+        return self._index
+
+    def get_games_by_id(self) -> dict[int, InternedGame]:
+        return self._games
+
+    def get_metadata_by_slug_id(self) -> dict[int, dict]:
+        return self._overrides
+
+    def get_entities_by_slug_id(self) -> dict[int, dict]:
+        return self._entities
+
+    def read_model_version(
+        self, user_ids: Iterable[str]
+    ) -> tuple[tuple[str, int], ...]:
+        return (("memory", 0),)
+
+    def changed_slugs(
+        self, old: tuple[tuple[str, int], ...], new: tuple[tuple[str, int], ...]
+    ) -> set[str] | None:
+        return None
+
+
+def queries(user_ids: list[str], selected: int) -> dict[str, ComparisonQuery]:
+    chosen = user_ids[:selected]
+    base = {"selected_user_ids": chosen, "include_single_player": True}
+    return {
+        "shared": ComparisonQuery(**base),
+        "owned": ComparisonQuery(**base, scope="owned"),
+        "exclusive": ComparisonQuery(**base, exclusive=True),
+        "installed_only": ComparisonQuery(**base, installed_only=True),
+        "min_owners": ComparisonQuery(**base, min_owners=2),
+        "recommended": ComparisonQuery(
+            **base, sort=SortSpec(field="recommended", direction="desc")
+        ),
+        "shared_by_rating": ComparisonQuery(
+            **base, sort=SortSpec(field="rating", direction="desc")
+        ),
+    }
+
+
+def _time(fn: Callable[[], object], repeat: int) -> dict[str, float]:
+    """Min and median wall time of `fn` in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "min_ms": round(min(samples), 3),
+        "median_ms": round(statistics.median(samples), 3),
+    }
+
+
+def _peak_kib(fn: Callable[[], object]) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def bench_query(repo: InMemoryRepository, query: ComparisonQuery, repeat: int) -> dict:
+    """Time a full `compare()` and each pipeline stage for one query."""
+    users = [str(u["user_id"]) for u in repo.scan_users()]
+    selected = list(query.selected_user_ids)
+    excluded = [u for u in users if u not in selected] if query.exclusive else []
+    results = get_result_cache()
+
+    def full() -> service.ComparisonDataset:
+        # Every run is a cache miss: this measures the pipeline, not the LRU.
+        results.clear()
+        return service.compare(repo, query)
+
+    dataset = full()
+    view = repo.get_ownership_index(selected + excluded).view(selected + excluded)
+    catalog = service._catalog(repo)
+    rows = service._candidate_rows(view, catalog, query, selected, excluded)
+    groups = service._merge_duplicates(rows, catalog)
+    keep = service._filter(groups, query, view.mask(selected))
+    order = service._sort_order(groups, keep, query.sort)
+    opts = WebCompareOptions(selected_user_ids=selected)
+
+    stages = {
+        "candidate_rows": lambda: service._candidate_rows(
+            view, catalog, query, selected, excluded
+        ),
+        "merge_duplicates": lambda: service._merge_duplicates(rows, catalog),
+        "filter": lambda: service._filter(groups, query, view.mask(selected)),
+        "sort_order": lambda: service._sort_order(groups, keep, query.sort),
+        "build_items": lambda: [
+            service._build_item(groups, int(g), catalog, view) for g in order
+        ],
+        "present_games": lambda: present_games(dataset, opts),
+    }
+    return {
+        "candidates": len(rows.rk),
+        "groups": len(groups.rk),
+        "items": len(dataset.items),
+        "total": dataset.total,
+        "compare": _time(full, repeat),
+        "cached_compare": _time(lambda: service.compare(repo, query), repeat),
+        "stages": {name: _time(fn, repeat) for name, fn in stages.items()},
+        "peak_kib": _peak_kib(full),
+    }
+
+
+def bench_size(size: Size, seed: int, repeat: int, selected: int) -> dict:
+    start = time.perf_counter()
+    data = generate(size, seed)
+    repo = InMemoryRepository(data)
+    generated_s = time.perf_counter() - start
+    log.info(
+        "%s: %d releases, %d library rows (generated in %.1fs)",
+        size.label,
+        len(data.games),
+        sum(len(rows) for rows in data.libraries.values()),
+        generated_s,
+    )
+
+    catalog_args = (repo._games, repo._entities, repo._overrides)
+    result = {
+        "users": size.users,
+        "games": size.games,
+        "releases": len(data.games),
+        "overrides": len(data.overrides),
+        "library_rows": sum(len(rows) for rows in data.libraries.values()),
+        "build_catalog": _time(lambda: build_catalog(*catalog_args), repeat),
+        "build_catalog_peak_kib": _peak_kib(lambda: build_catalog(*catalog_args)),
+        "queries": {},
+    }
+    user_ids = [u["user_id"] for u in data.users]
+    for name, query in queries(user_ids, selected).items():
+        stats = bench_query(repo, query, repeat)
+        result["queries"][name] = stats
+        log.info(
+            "  %-16s %6d items  compare %8.2f ms  peak %9.1f KiB",
+            name,
+            stats["items"],
+            stats["compare"]["median_ms"],
+            stats["peak_kib"],
+        )
+    get_result_cache().clear()
+    return result
+
+
+def main() -> None:
+    # The service reads its cache size from Settings; nothing here is deployed,
+    # so don't demand production secrets.
+    os.environ.setdefault("LOCAL_DEV", "true")
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default=DEFAULT_SIZES,
+        help=f"Comma-separated USERSxGAMES sizes (default: {DEFAULT_SIZES}).",
+    )
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=DEFAULT_REPEAT,
+        help="Timed runs per measurement; the min and median are reported.",
+    )
+    parser.add_argument(
+        "--selected",
+        type=int,
+        default=DEFAULT_SELECTED,
+        help="Users selected in each query (the rest are the exclusive set).",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path("benchmark_compare.json"),
+        help="Where to write the JSON results.",
+    )
+    args = parser.parse_args()
+    if args.repeat < 1 or args.selected < 1:
+        raise SystemExit("--repeat and --selected must be at least 1.")
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "selected": args.selected,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sizes": [
+            bench_size(size, args.seed, args.repeat, args.selected)
+            for size in parse_sizes(args.sizes)
+        ],
+    }
+    args.output.write_text(json.dumps(report, indent=2) + "\n")
+    log.info("Wrote %s", args.output)
+
+
+if __name__ == "__main__":
+    main()
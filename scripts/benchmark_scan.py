@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Benchmark serial vs parallel segmented scans of a games-shaped table.
+
+Creates (once) a scratch table next to the app's tables, fills it with N
+synthetic game rows of realistic size, then times `Repository._scan` over it
+with each requested segment count. Point it at dynamodb-local (the default in
+the docker-compose stack) or, with care, a real account.
+
+The scratch table is left in place so reruns skip the seeding; pass --drop to
+delete it afterwards.
+
+Usage:
+    docker compose run --rm app python scripts/benchmark_scan.py
+    docker compose run --rm app python scripts/benchmark_scan.py \\
+        --items 50000 --segments 1,2,4,8 --repeat 3 --output scan.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from gamatrix.config import get_settings
+from gamatrix.storage.dynamo import Repository, _to_dynamo
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+log = logging.getLogger("benchmark_scan")
+
+DEFAULT_ITEMS = 20000
+DEFAULT_SEGMENTS = "1,2,4,8"
+DEFAULT_REPEAT = 3
+DEFAULT_SEED = 1234
+STORES = ("steam", "gog", "epic", "origin", "uplay")
+
+
+def table_name(repo: Repository) -> str:
+    return f"{repo.settings.table_prefix}-scan-benchmark"
+
+
+def game_row(n: int, rng: random.Random) -> dict:
+    """A games-table row with the fields (and roughly the size) of a real one."""
+    store = rng.choice(STORES)
+    title = f"Benchmark Game {n}"
+    return {
+        "release_key": f"{store}_{n}",
+        "title": title,
+        "slug": f"benchmark-game-{n}",
+        "igdb_key": f"benchmark-game-{n}",
+        "igdb_id": rng.randint(1, 300000),
+        "platform": store,
+        "multiplayer": rng.random() < 0.35,
+        "max_players": rng.choice((0, 0, 2, 4, 8)),
+        "rating": round(rng.uniform(40, 95), 2),
+        "rating_count": rng.randint(0, 5000),
+        "game_modes": rng.sample((1, 2, 3, 4, 5), rng.randint(1, 3)),
+        "enrichment_status": "done",
+        "enriched_at": "2026-01-01T00:00:00+00:00",
+        "summary": "x" * rng.randint(200, 800),
+    }
+
+
+def ensure_table(repo: Repository, items: int, seed: int) -> None:
+    name = table_name(repo)
+    client = repo._resource.meta.client
+    if name in client.list_tables()["TableNames"]:
+        count = client.describe_table(TableName=name)["Table"]["ItemCount"]
+        # ItemCount lags on real DynamoDB; dynamodb-local reports it exactly.
+        if count == items:
+            log.info("Reusing %s (%d items)", name, count)
+            return
+        client.delete_table(TableName=name)
+        client.get_waiter("table_not_exists").wait(TableName=name)
+    client.create_table(
+        TableName=name,
+        KeySchema=[{"AttributeName": "release_key", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "release_key", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    client.get_waiter("table_exists").wait(TableName=name)
+    rng = random.Random(seed)
+    with repo._table(name).batch_writer() as batch:
+        for n in range(items):
+            batch.put_item(Item=_to_dynamo(game_row(n, rng)))
+    log.info("Seeded %s with %d items", name, items)
+
+
+def bench_segments(repo: Repository, segments: int, repeat: int) -> dict:
+    timings = []
+    count = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = len(repo._scan(table_name(repo), segments))
+        timings.append(time.perf_counter() - started)
+    result = {
+        "segments": segments,
+        "items": count,
+        "min_ms": round(min(timings) * 1000, 1),
+        "median_ms": round(statistics.median(timings) * 1000, 1),
+    }
+    log.info(
+        "segments=%-2d items=%d min=%.1fms median=%.1fms",
+        segments,
+        count,
+        result["min_ms"],
+        result["median_ms"],
+    )
+    return result
+
+
+def main() -> None:
+    # Benchmarks never serve requests, so don't demand production secrets.
+    os.environ.setdefault("LOCAL_DEV", "true")
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=DEFAULT_ITEMS)
+    parser.add_argument(
+        "--segments",
+        default=DEFAULT_SEGMENTS,
+        help=f"Comma-separated segment counts (default: {DEFAULT_SEGMENTS}).",
+    )
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--drop", action="store_true", help="Delete the table after.")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path("benchmark_scan.json"),
+        help="Where to write the JSON results.",
+    )
+    args = parser.parse_args()
+    segment_counts = [int(part) for part in args.segments.split(",") if part]
+    if args.items < 1 or args.repeat < 1 or min(segment_counts, default=0) < 1:
+        raise SystemExit("--items, --repeat and every segment count must be >= 1.")
+
+    repo = Repository(get_settings())
+    ensure_table(repo, args.items, args.seed)
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "endpoint": repo.settings.dynamodb_endpoint_url or "aws",
+        "items": args.items,
+        "repeat": args.repeat,
+        "runs": [bench_segments(repo, n, args.repeat) for n in segment_counts],
+    }
+    if args.drop:
+        repo._resource.meta.client.delete_table(TableName=table_name(repo))
+    args.output.write_text(json.dumps(report, indent=2) + "\n")
+    log.info("Wrote %s", args.output)
+
+
+if __name__ == "__main__":
+    main()
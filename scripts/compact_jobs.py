@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Apply the finished-job retention policy to existing enrichment jobs.
+
+Jobs now get an `expires_at` TTL (and, with COMPACT_FINISHED_JOBS, lose their
+release-key list) as they finish. Jobs that finished before that keep every
+key forever; this one-shot pass retires them the same way, with the TTL
+counted from when each job finished, so long-finished jobs expire right away.
+Active jobs are left alone, except that pending or running jobs written before
+the active_status-index existed are backfilled into it (see
+`Repository.backfill_active_status`). Run it after each deploy; safe to rerun.
+
+Usage:
+    docker compose run --rm app python scripts/compact_jobs.py --dry-run
+    docker compose run --rm app python scripts/compact_jobs.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+
+from gamatrix.config import get_settings
+from gamatrix.jobs import JobRecord
+from gamatrix.storage.dynamo import Repository
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+log = logging.getLogger("compact_jobs")
+
+FIELDS = ("job_id", "status", "created_at", "updated_at", "completed_at", "expires_at")
+
+
+def unretired_jobs(repo: Repository) -> list[JobRecord]:
+    """Finished jobs the retention policy hasn't been applied to yet."""
+    finished = repo.list_finished_jobs(projection=FIELDS)
+    if repo.settings.job_retention_days <= 0:
+        # Without a TTL there's no marker of a retired job; compacting an
+        # already-compacted one is a no-op, so take them all.
+        return finished
+    return [j for j in finished if "expires_at" not in j]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Report what would change only."
+    )
+    args = parser.parse_args()
+
+    repo = Repository(get_settings())
+    backfilled = repo.backfill_active_status(dry_run=args.dry_run)
+    log.info("%d active job(s) missing from the active index", len(backfilled))
+    jobs = unretired_jobs(repo)
+    log.info(
+        "%d finished job(s) to retire (retention %d days, compaction %s)",
+        len(jobs),
+        repo.settings.job_retention_days,
+        "on" if repo.settings.compact_finished_jobs else "off",
+    )
+    if args.dry_run:
+        return
+    for job in jobs:
+        finished_at = (
+            job.get("completed_at") or job.get("updated_at") or job["created_at"]
+        )
+        repo.finish_job(job["job_id"], job["status"], completed_at=finished_at)
+    log.info("Retired %d job(s)", len(jobs))
+
+
+if __name__ == "__main__":
+    main()
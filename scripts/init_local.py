@@ -5,7 +5,9 @@
 
     just init-local      # or: python scripts/init_local.py
 
-Idempotent: existing tables/buckets are left alone. Pass
+Idempotent: existing tables/buckets are kept, gaining any secondary index added
+to their definition since they were created (jobs from before the
+active_status-index are backfilled into it too). Pass
 ``--skip-default-users`` when another step (for example sample-data seeding)
 will replace the user set immediately afterward.
 """
@@ -36,7 +38,17 @@ def _table_defs(s):
         {
             "TableName": s.users_table,
             "KeySchema": [{"AttributeName": "email", "KeyType": "HASH"}],
-            "AttributeDefinitions": [{"AttributeName": "email", "AttributeType": "S"}],
+            "AttributeDefinitions": [
+                {"AttributeName": "email", "AttributeType": "S"},
+                {"AttributeName": "user_id", "AttributeType": "S"},
+            ],
+            "GlobalSecondaryIndexes": [
+                {
+                    "IndexName": "user_id-index",
+                    "KeySchema": [{"AttributeName": "user_id", "KeyType": "HASH"}],
+                    "Projection": {"ProjectionType": "ALL"},
+                }
+            ],
         },
         {
             "TableName": s.libraries_table,
@@ -59,13 +71,30 @@ def _table_defs(s):
         {
             "TableName": s.jobs_table,
             "KeySchema": [{"AttributeName": "job_id", "KeyType": "HASH"}],
-            "AttributeDefinitions": [{"AttributeName": "job_id", "AttributeType": "S"}],
+            "AttributeDefinitions": [
+                {"AttributeName": "job_id", "AttributeType": "S"},
+                {"AttributeName": "active_status", "AttributeType": "S"},
+            ],
+            "GlobalSecondaryIndexes": [
+                {
+                    "IndexName": "active_status-index",
+                    "KeySchema": [
+                        {"AttributeName": "active_status", "KeyType": "HASH"}
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                }
+            ],
         },
         {
             "TableName": s.metadata_table,
             "KeySchema": [{"AttributeName": "slug", "KeyType": "HASH"}],
             "AttributeDefinitions": [{"AttributeName": "slug", "AttributeType": "S"}],
         },
+        {
+            "TableName": s.entities_table,
+            "KeySchema": [{"AttributeName": "slug", "KeyType": "HASH"}],
+            "AttributeDefinitions": [{"AttributeName": "slug", "AttributeType": "S"}],
+        },
         {
             "TableName": s.profile_pics_table,
             "KeySchema": [{"AttributeName": "user_id", "KeyType": "HASH"}],
@@ -129,9 +158,10 @@ def create_tables(settings) -> None:
         name = defn["TableName"]
         if name in existing:
             log.info("Table %s already exists", name)
+            add_missing_indexes(ddb, defn)
             continue
         ddb.create_table(BillingMode="PAY_PER_REQUEST", **defn)
-        if name == settings.auth_challenges_table:
+        if name in (settings.auth_challenges_table, settings.jobs_table):
             ddb.update_time_to_live(
                 TableName=name,
                 TimeToLiveSpecification={
@@ -142,6 +172,26 @@ def create_tables(settings) -> None:
         log.info("Created table %s", name)
 
 
+def add_missing_indexes(ddb, defn: dict) -> None:
+    """Create the GSIs in `defn` that an existing table doesn't have yet.
+
+    DynamoDB builds one new index per UpdateTable call and backfills it from
+    the items already in the table.
+    """
+    name = defn["TableName"]
+    table = ddb.describe_table(TableName=name)["Table"]
+    have = {i["IndexName"] for i in table.get("GlobalSecondaryIndexes", [])}
+    for index in defn.get("GlobalSecondaryIndexes", []):
+        if index["IndexName"] in have:
+            continue
+        ddb.update_table(
+            TableName=name,
+            AttributeDefinitions=defn["AttributeDefinitions"],
+            GlobalSecondaryIndexUpdates=[{"Create": index}],
+        )
+        log.info("Created index %s on %s", index["IndexName"], name)
+
+
 def create_bucket(settings) -> None:
     s3 = boto3.client(
         "s3",
@@ -179,6 +229,14 @@ def main() -> None:
     from gamatrix.storage.dynamo import get_repository
 
     repo = get_repository()
+    backfilled = repo.backfill_active_status()
+    if backfilled:
+        log.info("Backfilled %d job(s) into the active index", len(backfilled))
+    from gamatrix.games.entities import backfill_entities
+
+    entities = backfill_entities(repo)
+    if entities:
+        log.info("Backfilled %d game entities", len(entities))
     if repo.get_config("hidden") is None:
         repo.put_config("hidden", [])
     if repo.get_config("single_player") is None:
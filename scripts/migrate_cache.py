@@ -21,6 +21,7 @@
     IGDB_MAX_PLAYER_KEYS,
     IGDB_MULTIPLAYER_GAME_MODES,
 )
+from gamatrix.games.entities import rebuild_entities
 from gamatrix.helpers import get_slug_from_title, now_iso
 from gamatrix.storage.dynamo import get_repository
 
@@ -78,6 +79,7 @@ def migrate(cache_path: str) -> None:
         migrated += 1
 
     log.info("Migrated %d cached games into the games table", migrated)
+    rebuild_entities(repo)
 
 
 def main() -> None:
@@ -47,6 +47,7 @@ def main() -> None:
         log.warning("No 'metadata' section found in %s", path)
         return
 
+    from gamatrix.games.entities import rebuild_entities
     from gamatrix.helpers import get_slug_from_title
     from gamatrix.storage.dynamo import get_repository
 
@@ -78,6 +79,8 @@ def main() -> None:
         written += 1
 
     log.info("%s%d item(s) processed.", "[dry-run] " if args.dry_run else "", written)
+    if repo is not None:
+        rebuild_entities(repo)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Recompute the game entities table from the games and overrides tables.
+
+Entities are kept current as games and overrides are written. With --backfill
+only the entities that are missing or don't list all of their game's releases
+are built (and those of vanished games deleted); `just deploy` runs that after
+every deploy, and init_local.py on every init. Without it, every entity is
+rebuilt: use that after editing either table by hand.
+
+Usage (against production):
+    TABLE_PREFIX=gamatrix uv run python scripts/rebuild_entities.py [--backfill]
+
+Usage (against local dev stack):
+    uv run python scripts/rebuild_entities.py [--backfill]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+
+from gamatrix.games.entities import backfill_entities, rebuild_entities
+from gamatrix.storage.dynamo import get_repository
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+log = logging.getLogger("rebuild_entities")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Only build entities that are missing or incomplete.",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="With --backfill, report only."
+    )
+    args = parser.parse_args()
+    repo = get_repository()
+    if not args.backfill:
+        rebuild_entities(repo)
+        return
+    slugs = backfill_entities(repo, dry_run=args.dry_run)
+    verb = "to backfill" if args.dry_run else "backfilled"
+    log.info("%d game entities %s", len(slugs), verb)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@
 from fastapi.responses import RedirectResponse
 
 from gamatrix.auth.service import COOKIE_NAME, decode_session_token
+from gamatrix.storage.aio import AsyncRepository
 from gamatrix.storage.dynamo import Repository, get_repository
 
 
@@ -17,6 +18,10 @@ def get_repo() -> Repository:
     return get_repository()
 
 
+async def get_async_repo(repo: Repository = Depends(get_repo)) -> AsyncRepository:
+    return AsyncRepository(repo)
+
+
 def current_user(request: Request, repo: Repository = Depends(get_repo)) -> dict:
     """Return the logged-in user, or raise RedirectToLogin for page routes."""
     token = request.cookies.get(COOKIE_NAME)
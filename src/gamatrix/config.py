@@ -25,6 +25,9 @@ class Settings(BaseSettings):
     # --- Runtime mode ---
     # True when running under docker-compose against local AWS replacements.
     local_dev: bool = False
+    # Set by the Lambda runtime. A Lambda sandbox is frozen between invocations,
+    # so work a request leaves running in the background may never finish.
+    aws_lambda_function_name: str | None = None
 
     # --- AWS endpoints (overridden locally to point at dynamodb-local/minio) ---
     aws_region: str = "ca-central-1"
@@ -34,6 +37,22 @@ class Settings(BaseSettings):
 
     # --- DynamoDB ---
     table_prefix: str = "gamatrix"
+    # Parallel segments (one thread each) for full scans of the large tables:
+    # the games map load, refresh-all and clear_metadata. 1 scans serially.
+    scan_segments: int = 4
+    # BatchGetItem requests (100 keys each) in flight at once for a large
+    # lookup, e.g. an enrichment chunk's games. 1 sends them one at a time.
+    batch_get_concurrency: int = 4
+    # Threads async routes run Repository calls on (see storage/aio.py), apart
+    # from Starlette's shared threadpool. Bounds concurrent DynamoDB work. The
+    # DynamoDB client's connection pool is sized to these workers plus the scan
+    # and BatchGetItem threads, so no call waits on a free connection.
+    repository_workers: int = 32
+    # How user libraries are stored (see storage/library.py): "rows", one item
+    # per owned release key, or "packed", one compressed item (or a few shards)
+    # per user. Packed reads fall back to rows for libraries not yet repacked;
+    # the next upload converts them.
+    library_layout: str = "rows"
 
     # --- S3 ---
     upload_bucket: str = "gamatrix-gog-db-uploads"
@@ -87,6 +106,41 @@ class Settings(BaseSettings):
     # across separate processes (e.g. an upload/enrich Lambda) until expiry.
     read_cache_ttl_seconds: float = 60.0
 
+    # How long past that TTL the games map and users scan may still be served
+    # while one background refresh reloads them, so no request waits on the
+    # full-table scan. A read later than this reloads inline. 0 disables it, as
+    # does running in Lambda, where a refresh would be frozen with the sandbox.
+    read_cache_max_stale_seconds: float = 300.0
+
+    # Memory budget for the in-process read cache, by approximate entry size.
+    # Least recently used entries (typically idle users' libraries) are evicted
+    # past it. 0 means unbounded. Per-family hit/miss/eviction/load-time stats
+    # are at /api/cache/stats for sizing this against the function's memory.
+    read_cache_max_bytes: int = 256 * 1024 * 1024
+
+    # Shared tier behind the in-process read cache, so a cold process loads the
+    # read-model from its peers instead of DynamoDB (see storage/cache.py):
+    # "local" (in-process only), "sqlite" (READ_CACHE_URL is a file path shared
+    # by processes on one host) or "redis" (READ_CACHE_URL is redis:// or
+    # rediss://, and needs the "redis" extra). Writes go through to the shared
+    # tier and invalidate it.
+    read_cache_backend: str = "local"
+    read_cache_url: str | None = None
+
+    # Retention for finished (completed or failed) enrichment jobs: a DynamoDB
+    # TTL deletes them this many days after they finish (0 keeps them), and
+    # with compaction on, their release-key list is dropped as they complete,
+    # leaving a summary row (counts and timestamps); jobs reaped as stale keep
+    # theirs until the row expires. Jobs that finished before
+    # this policy can be brought under it with scripts/compact_jobs.py.
+    job_retention_days: int = 30
+    compact_finished_jobs: bool = True
+
+    # How many comparison results each process keeps (LRU). Results are keyed by
+    # the query and the read-model version, so any library, game or override
+    # change is picked up on the next request. 0 disables the result cache.
+    comparison_cache_entries: int = 256
+
     # SSM parameter names for the title filter lists (AWS only). Locally these
     # are seeded into DynamoDB config and read from there.
     hidden_games_param: str = "/gamatrix/hidden-games"
@@ -113,6 +167,11 @@ def jobs_table(self) -> str:
     def metadata_table(self) -> str:
         return f"{self.table_prefix}_metadata_overrides"
 
+    @property
+    def entities_table(self) -> str:
+        """One row per game (slug): its releases and merged display fields."""
+        return f"{self.table_prefix}_game_entities"
+
     @property
     def profile_pics_table(self) -> str:
         """Holds user-uploaded profile-pic bytes, keyed by user_id."""
@@ -1,29 +1,156 @@
-"""JSON serialization for the comparison application contract."""
+"""JSON serialization for the comparison application contract.
+
+Headless consumers can page through a result with `limit` and an opaque
+`cursor`. The cursor is the sort position of the last item returned (see
+`service.sort_position`) rather than an offset, so a page boundary stays put
+when rows are added or dropped between requests and no item is skipped or
+repeated.
+"""
 
 from __future__ import annotations
 
-from gamatrix.games.service import ComparisonDataset, ComparisonQuery
+import base64
+import binascii
+import bisect
+import json
+from typing import Iterator
+
+from gamatrix.games.service import (
+    ComparisonDataset,
+    ComparisonItem,
+    ComparisonQuery,
+    OverlapMatrix,
+    TitleMatch,
+    follows,
+    sort_position,
+)
+
+# Largest page a client can ask for.
+MAX_PAGE_SIZE = 1000
+# Most typeahead suggestions a client can ask for.
+MAX_SUGGESTIONS = 50
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that wasn't issued for this sort."""
+
+
+def encode_cursor(query: ComparisonQuery, item: ComparisonItem) -> str:
+    payload = [query.sort.field, query.sort.direction, *sort_position(item, query.sort)]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(query: ComparisonQuery, cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise InvalidCursor("Malformed cursor") from exc
+    if (
+        not isinstance(payload, list)
+        or len(payload) != 5
+        or payload[:2] != [query.sort.field, query.sort.direction]
+    ):
+        raise InvalidCursor("Cursor does not match this query's sort")
+    return tuple(payload[2:])
+
+
+def paginate(
+    query: ComparisonQuery,
+    dataset: ComparisonDataset,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> tuple[list[ComparisonItem], str | None]:
+    """Return the page of items after `cursor` and the cursor for the next one.
+
+    The next cursor is None on the last page. Raises InvalidCursor.
+    """
+    items = dataset.items
+    start = 0
+    if cursor:
+        after = decode_cursor(query, cursor)
+        try:
+            start = bisect.bisect_left(
+                items,
+                True,
+                key=lambda item: follows(
+                    sort_position(item, query.sort), after, query.sort
+                ),
+            )
+        except TypeError as exc:
+            # A cursor value of the wrong type for this sort field.
+            raise InvalidCursor("Malformed cursor") from exc
+    if limit is None:
+        return items[start:], None
+    page = items[start : start + limit]
+    if start + limit < len(items) and page:
+        return page, encode_cursor(query, page[-1])
+    return page, None
+
+
+def serialize_ndjson(items: list[ComparisonItem]) -> Iterator[bytes]:
+    """Serialize `items` as NDJSON, one JSON object per line.
+
+    This is chunked serialization, not streaming of the comparison: `compare`
+    sorts the whole result before its first item is known, so the items are
+    all computed up front. The lines are encoded one at a time as the response
+    is sent, so the body is never built whole.
+    """
+    for item in items:
+        yield json.dumps(item.to_dict(), separators=(",", ":")).encode() + b"\n"
 
 
 def serialize_comparison(
     query: ComparisonQuery,
     dataset: ComparisonDataset,
+    items: list[ComparisonItem] | None = None,
+    next_cursor: str | None = None,
 ) -> dict:
-    """Serialize a comparison query and dataset for headless consumers."""
+    """Serialize a comparison query and dataset (or one page of its `items`)
+    for headless consumers."""
+    if items is None:
+        items = dataset.items
     return {
-        "query": {
-            "selected_user_ids": list(query.selected_user_ids),
-            "include_single_player": query.include_single_player,
-            "installed_only": query.installed_only,
-            "exclude_platforms": list(query.exclude_platforms),
-            "exclusive": query.exclusive,
-            "scope": query.scope,
-            "sort": {
-                "field": query.sort.field,
-                "direction": query.sort.direction,
-            },
-        },
+        "query": serialize_query(query),
         "total": dataset.total,
         "excluded_user_ids": list(dataset.excluded_user_ids),
-        "games": [item.to_dict() for item in dataset.items],
+        "games": [item.to_dict() for item in items],
+        "next_cursor": next_cursor,
+        "facets": dataset.facets.counts() if dataset.facets else None,
+    }
+
+
+def serialize_overlap(query: ComparisonQuery, matrix: OverlapMatrix) -> dict:
+    """Serialize a pairwise overlap matrix for headless consumers."""
+    return {
+        "query": serialize_query(query),
+        "user_ids": list(matrix.user_ids),
+        "counts": matrix.counts,
+    }
+
+
+def serialize_title_matches(q: str, matches: list[TitleMatch]) -> dict:
+    """Serialize typeahead title matches for headless consumers."""
+    return {
+        "q": q,
+        "results": [{"slug": m.slug, "title": m.title} for m in matches],
+    }
+
+
+def serialize_query(query: ComparisonQuery) -> dict:
+    return {
+        "selected_user_ids": list(query.selected_user_ids),
+        "include_single_player": query.include_single_player,
+        "installed_only": query.installed_only,
+        "exclude_platforms": list(query.exclude_platforms),
+        "exclusive": query.exclusive,
+        "scope": query.scope,
+        "min_owners": query.min_owners,
+        "q": query.q,
+        "top": query.top,
+        "sort": {
+            "field": query.sort.field,
+            "direction": query.sort.direction,
+        },
     }
@@ -0,0 +1,116 @@
+"""LRU cache of comparison results.
+
+Most comparison traffic is the same group of friends re-requesting the same
+default view, and every HTMX filter toggle re-runs the pipeline. Results are
+cached per process under the canonical form of the query and stamped with the
+Repository's read-model version: a result is only served while the stamp still
+matches, so a library upload, game write or override change is picked up on the
+next request.
+
+When the stamp has moved on, the previous result is kept around so the service
+can patch it for just the slugs that changed, rather than rebuilding it. A
+patched result keeps the time of the full compute it started from, and stops
+being patchable once that is older than the read-cache TTL, so changes another
+process made are never missed for longer than a plain cached read would miss
+them.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Hashable, NamedTuple
+
+from gamatrix.config import get_settings
+
+
+class CachedResult(NamedTuple):
+    version: Any
+    value: Any
+    # time.monotonic() of the full compute this result was (patched) from.
+    computed_at: float
+
+
+class ResultCache:
+    """Thread-safe LRU of one result per key, with hit/miss/patch counters.
+
+    `max_entries` 0 disables it.
+    """
+
+    def __init__(self, max_entries: int, max_patch_age: float) -> None:
+        self.max_entries = max_entries
+        self.max_patch_age = max_patch_age
+        self.hits = 0
+        self.misses = 0
+        self.patches = 0
+        self._entries: OrderedDict[Hashable, CachedResult] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Hashable) -> Any | None:
+        """The cached value for `key` if it was computed at `version`."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def previous(self, key: Hashable) -> CachedResult | None:
+        """The result last cached for `key`, whatever its version, if it is
+        still recent enough to be patched forward."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry.computed_at >= self.max_patch_age:
+            return None
+        return entry
+
+    def put(
+        self,
+        key: Hashable,
+        version: Hashable,
+        value: Any,
+        patched_from: CachedResult | None = None,
+    ) -> Any:
+        if self.max_entries <= 0:
+            return value
+        if patched_from is None:
+            computed_at = time.monotonic()
+        else:
+            computed_at = patched_from.computed_at
+        with self._lock:
+            if patched_from is not None:
+                self.patches += 1
+            self._entries[key] = CachedResult(version, value, computed_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.patches = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "patches": self.patches,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+@lru_cache
+def get_result_cache() -> ResultCache:
+    settings = get_settings()
+    return ResultCache(
+        settings.comparison_cache_entries, settings.read_cache_ttl_seconds
+    )
@@ -0,0 +1,210 @@
+"""Columnar snapshot of the games catalog for vectorized comparison.
+
+The comparison service filters, merges and sorts thousands of candidate games
+per request. Doing that over per-game dicts and dataclasses costs a Python-level
+pass per step; this module instead lays the catalog out as NumPy arrays indexed
+by interned release-key id (see storage/interning.py), with manual overrides
+already applied, so each step is a boolean mask, a `reduceat` or an `argsort`.
+Only the rows that survive become `ComparisonItem`s.
+
+The per-release columns hold each release's own values (with its override
+applied), never a figure merged across the game's other releases: copies with
+different owners stay separate rows, and a merged row takes the maximum over
+just its members. The persisted game entities (see entities.py) supply the
+override's comment and url. A snapshot is built from the Repository's cached
+games map, entities and overrides and is reused until any of those is
+reloaded.
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from gamatrix.constants import (
+    ENRICHMENT_DONE,
+    ENRICHMENT_NOT_FOUND,
+    ENRICHMENT_PENDING,
+    ENRICHMENT_RUNNING,
+    IGDB_GAME_MODE,
+    IGDB_MULTIPLAYER_GAME_MODES,
+    PLATFORMS,
+)
+from gamatrix.storage import interning
+from gamatrix.storage.interning import InternedGame
+
+# Platform codes follow PLATFORMS order, so the code doubles as the preference
+# rank used when merging cross-platform copies. Unknown stores sort last.
+PLATFORM_CODES = {platform: code for code, platform in enumerate(PLATFORMS)}
+UNKNOWN_PLATFORM = len(PLATFORMS)
+
+# Code 0 is "no status recorded" (a stub that predates enrichment tracking).
+ENRICHMENT_STATUSES: tuple[str | None, ...] = (
+    None,
+    ENRICHMENT_PENDING,
+    ENRICHMENT_RUNNING,
+    ENRICHMENT_DONE,
+    ENRICHMENT_NOT_FOUND,
+)
+ENRICHMENT_CODES = {status: code for code, status in enumerate(ENRICHMENT_STATUSES)}
+
+
+@dataclass(frozen=True)
+class Catalog:
+    """Per-release columns, indexed by interned release-key id.
+
+    `present` is False for ids with no games-table row (interned from a library
+    before the game stub landed). `max_players` and `multiplayer` are the display
+    values, with overrides applied. `entities` and `overrides` are keyed by
+    interned slug id.
+    """
+
+    present: np.ndarray
+    slug_id: np.ndarray
+    # Position of the slug in sorted order, so title sorts are integer sorts.
+    slug_rank: np.ndarray
+    # Position of the release key in sorted order: the final, process-independent
+    # tie-break, so row order (and API cursors) agree across processes.
+    release_rank: np.ndarray
+    max_players: np.ndarray
+    multiplayer: np.ndarray
+    rating: np.ndarray
+    rating_count: np.ndarray
+    platform: np.ndarray
+    enrichment: np.ndarray
+    games: dict[int, InternedGame]
+    entities: dict[int, dict]
+    overrides: dict[int, dict]
+
+    @property
+    def size(self) -> int:
+        return len(self.present)
+
+    def has_slug(self, slug_id: int) -> bool:
+        """Whether any release in the catalog has slug id `slug_id`."""
+        return bool((self.slug_id[self.present] == slug_id).any())
+
+    def platform_name(self, rk: int) -> str:
+        """Store name for a release, keeping stores outside PLATFORMS as-is."""
+        code = int(self.platform[rk])
+        if code < UNKNOWN_PLATFORM:
+            return PLATFORMS[code]
+        return _store(self.games[rk].row, rk)
+
+
+def build_catalog(
+    games: dict[int, InternedGame],
+    entities: dict[int, dict],
+    overrides: dict[int, dict],
+) -> Catalog:
+    size = max(games, default=-1) + 1
+    present = np.zeros(size, dtype=bool)
+    slug_id = np.zeros(size, dtype=np.int64)
+    max_players = np.zeros(size, dtype=np.int64)
+    multiplayer = np.zeros(size, dtype=bool)
+    rating = np.zeros(size, dtype=np.float64)
+    rating_count = np.zeros(size, dtype=np.int64)
+    platform = np.full(size, UNKNOWN_PLATFORM, dtype=np.int16)
+    enrichment = np.zeros(size, dtype=np.int8)
+
+    for rk, game in games.items():
+        meta = game.row
+        present[rk] = True
+        slug_id[rk] = game.slug_id
+        players, mp = display_players(meta, overrides.get(game.slug_id))
+        max_players[rk] = players
+        multiplayer[rk] = mp
+        rating[rk] = meta.get("rating", 0) or 0
+        rating_count[rk] = meta.get("rating_count", 0) or 0
+        platform[rk] = PLATFORM_CODES.get(_store(meta, rk), UNKNOWN_PLATFORM)
+        enrichment[rk] = ENRICHMENT_CODES.get(meta.get("enrichment_status"), 0)
+
+    # Rank every slug id in this snapshot by its string, once, so sorting by
+    # title never compares strings per request.
+    slug_ids = np.unique(slug_id[present])
+    ranks = np.zeros(max(len(interning.slugs), 1), dtype=np.int64)
+    order = sorted(slug_ids.tolist(), key=interning.slugs.key)
+    ranks[order] = np.arange(len(order))
+    slug_rank = ranks[slug_id]
+
+    release_rank = np.zeros(size, dtype=np.int64)
+    order = sorted(
+        (int(rk) for rk in np.flatnonzero(present)), key=interning.release_keys.key
+    )
+    release_rank[order] = np.arange(len(order))
+
+    return Catalog(
+        present=present,
+        slug_id=slug_id,
+        slug_rank=slug_rank,
+        release_rank=release_rank,
+        max_players=max_players,
+        multiplayer=multiplayer,
+        rating=rating,
+        rating_count=rating_count,
+        platform=platform,
+        enrichment=enrichment,
+        games=games,
+        entities=entities,
+        overrides=overrides,
+    )
+
+
+_lock = threading.Lock()
+_snapshot: tuple[tuple[Any, ...], Catalog] | None = None
+
+
+def catalog_for(
+    games: dict[int, InternedGame],
+    entities: dict[int, dict],
+    overrides: dict[int, dict],
+) -> Catalog:
+    """Return the catalog for these cached maps, rebuilding only when any map
+    is a different object from the one the current snapshot was built on."""
+    global _snapshot
+    sources = (games, entities, overrides)
+    snapshot = _snapshot
+    if snapshot is not None and all(a is b for a, b in zip(snapshot[0], sources)):
+        return snapshot[1]
+    catalog = build_catalog(games, entities, overrides)
+    with _lock:
+        _snapshot = (sources, catalog)
+    return catalog
+
+
+def _store(meta: dict, rk: int) -> str:
+    return meta.get("platform") or interning.release_keys.key(rk).split("_")[0]
+
+
+def display_players(meta: dict, override: dict | None) -> tuple[int, bool]:
+    """(max players, multiplayer) to show for a game, overrides winning."""
+    if override and "max_players" in override:
+        players = override["max_players"]
+        return players, _multiplayer(players, meta.get("game_modes", []))
+    return _display_max_players(meta), bool(meta.get("multiplayer", False))
+
+
+def _display_max_players(meta: dict) -> int:
+    """Player count to show for a game.
+
+    IGDB gives confirmed single-player games no max-player figure, which would
+    otherwise render as an empty Players cell. When a game is known single-player
+    (IGDB lists the single-player mode and nothing multiplayer), surface that as
+    1 player instead of a blank. Games with an unknown mode set stay at 0 so we
+    don't claim a count IGDB never confirmed.
+    """
+    max_players = meta.get("max_players", 0)
+    if max_players or meta.get("multiplayer", False):
+        return max_players
+    if IGDB_GAME_MODE["singleplayer"] in meta.get("game_modes", []):
+        return 1
+    return max_players
+
+
+def _multiplayer(max_players: int, game_modes: list[int]) -> bool:
+    if max_players > 1:
+        return True
+    return any(m in IGDB_MULTIPLAYER_GAME_MODES for m in game_modes)
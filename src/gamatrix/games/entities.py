@@ -0,0 +1,146 @@
+"""Persisted game entities: one row per game (slug) across all its releases.
+
+A game owned on several stores has one games-table row per release key. Its
+entity row ties those together: the release keys in platform-preference order,
+the preferred release, and the display fields merged across releases with any
+manual override applied. The comparison catalog reads these instead of
+re-deriving them from every release row and override.
+
+Entities are rebuilt for just the affected slugs whenever game rows or
+overrides are written: at ingest, by the enricher and by the migration scripts.
+`backfill_entities` builds the ones that are missing or incomplete (run on
+init and after each deploy); `rebuild_entities` recomputes the whole table
+(bulk imports, hand edits).
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Iterable
+
+from gamatrix.games.catalog import PLATFORM_CODES, UNKNOWN_PLATFORM, display_players
+from gamatrix.helpers import now_iso
+from gamatrix.storage.dynamo import Repository
+
+log = logging.getLogger(__name__)
+
+
+def build_entity(slug: str, releases: list[dict], override: dict | None) -> dict:
+    """Merge a game's release rows (and its override) into an entity row."""
+    releases = sorted(releases, key=_preference)
+    preferred = releases[0]
+    shown = [display_players(game, override) for game in releases]
+    override = override or {}
+    return {
+        "slug": slug,
+        "release_keys": [game["release_key"] for game in releases],
+        "preferred_release_key": preferred["release_key"],
+        "title": preferred.get("title", preferred["release_key"]),
+        "igdb_key": preferred.get("igdb_key", preferred["release_key"]),
+        "max_players": max(players for players, _ in shown),
+        "multiplayer": any(mp for _, mp in shown),
+        "rating": max(game.get("rating", 0) or 0 for game in releases),
+        "rating_count": max(game.get("rating_count", 0) or 0 for game in releases),
+        "comment": override.get("comment") or "",
+        "url": override.get("url") or None,
+        "updated_at": now_iso(),
+    }
+
+
+def sync_entities(
+    repo: Repository, slugs: Iterable[str], written: Iterable[dict] = ()
+) -> None:
+    """Rebuild the entities of `slugs` from their release rows and overrides.
+
+    `written` are game rows the caller just wrote, so they needn't be read
+    back. Other releases are found through each entity's release list, or, for
+    a slug with no entity yet, in the games map (releases written before the
+    entity existed). A release that moved to another slug drops out, and an
+    entity left with no releases is deleted.
+    """
+    # Games with no slug can't be keyed as an entity; the catalog falls back to
+    # their release row.
+    slugs = {slug for slug in slugs if slug}
+    if not slugs:
+        return
+    written_rows = {game["release_key"]: game for game in written}
+    current = repo.batch_get_entities(slugs)
+    listed = {rk for entity in current.values() for rk in entity["release_keys"]}
+    games = {**repo.batch_get_games(listed - written_rows.keys()), **written_rows}
+    unlisted = slugs - current.keys()
+    if unlisted:
+        known = {
+            rk: game
+            for rk, game in repo.get_all_games_map().items()
+            if game.get("slug", "") in unlisted
+        }
+        games = {**known, **games}
+    overrides = repo.batch_get_metadata(slugs)
+
+    releases: dict[str, list[dict]] = {}
+    for game in games.values():
+        if game.get("slug", "") in slugs:
+            releases.setdefault(game.get("slug", ""), []).append(game)
+    repo.write_entities(
+        [
+            build_entity(slug, rows, overrides.get(slug))
+            for slug, rows in releases.items()
+        ],
+        removed=[slug for slug in current if slug not in releases],
+    )
+
+
+def rebuild_entities(repo: Repository) -> int:
+    """Recompute every entity from the full games and overrides tables.
+
+    Returns the number of entities written.
+    """
+    releases: dict[str, list[dict]] = {}
+    for game in repo.scan_all_games():
+        if game.get("slug"):
+            releases.setdefault(game["slug"], []).append(game)
+    overrides = repo.get_all_metadata()
+    stale = set(repo.get_all_entities()) - releases.keys()
+    repo.write_entities(
+        [
+            build_entity(slug, rows, overrides.get(slug))
+            for slug, rows in releases.items()
+        ],
+        removed=stale,
+    )
+    log.info("Rebuilt %d game entities (%d removed)", len(releases), len(stale))
+    return len(releases)
+
+
+def backfill_entities(repo: Repository, dry_run: bool = False) -> list[str]:
+    """Build the entities that are missing or don't list all of their game's
+    releases (games written before the entities table, or by a process that
+    didn't sync them), and delete entities whose game has no releases left.
+
+    Entities already in step are left alone, so this is cheap to rerun after
+    every deploy. Returns the slugs (re)built or deleted, in sorted order.
+    """
+    releases: dict[str, list[dict]] = {}
+    for game in repo.scan_all_games():
+        if game.get("slug"):
+            releases.setdefault(game["slug"], []).append(game)
+    current = repo.get_all_entities()
+    stale = {
+        slug
+        for slug, rows in releases.items()
+        if slug not in current
+        or set(current[slug]["release_keys"]) != {g["release_key"] for g in rows}
+    }
+    removed = current.keys() - releases.keys()
+    if not dry_run and (stale or removed):
+        overrides = repo.get_all_metadata()
+        repo.write_entities(
+            [build_entity(slug, releases[slug], overrides.get(slug)) for slug in stale],
+            removed=removed,
+        )
+    return sorted(stale | removed)
+
+
+def _preference(game: dict) -> tuple[int, str]:
+    platform = game.get("platform") or game["release_key"].split("_")[0]
+    return PLATFORM_CODES.get(platform, UNKNOWN_PLATFORM), game["release_key"]
@@ -1,13 +1,20 @@
-"""Game comparison routes: main page, table fragment, job polling, refresh."""
+"""Game comparison routes: main page, table fragment, job polling, refresh.
+
+The comparison routes are async and reach DynamoDB through `AsyncRepository`,
+so they wait on it without holding a Starlette threadpool thread.
+"""
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+import asyncio
+
+from fastapi import APIRouter, Depends, Form, HTTPException, Query, Request, status
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 
 from gamatrix.auth.dependencies import (
     current_user,
     current_user_api,
+    get_async_repo,
     get_repo,
     require_admin,
 )
@@ -18,8 +25,10 @@
     JOB_FAILED,
 )
 from gamatrix.games import api, service, web
+from gamatrix.games.cache import get_result_cache
 from gamatrix.games.preferences import merge_preferences
 from gamatrix.jobs import create_enrichment_job, is_job_stale
+from gamatrix.storage.aio import AsyncRepository
 from gamatrix.storage.dynamo import Repository
 from gamatrix.storage.queue import get_queue
 from gamatrix.templating import authenticated_fragment, authenticated_template
@@ -27,18 +36,27 @@
 router = APIRouter(tags=["games"])
 
 
+async def _users(arepo: AsyncRepository) -> dict[str, dict]:
+    return await arepo.run(arepo.repo.users_by_user_id)
+
+
 @router.get("/games", response_class=HTMLResponse)
-def games_page(
+async def games_page(
     request: Request,
     user: dict = Depends(current_user),
-    repo: Repository = Depends(get_repo),
+    arepo: AsyncRepository = Depends(get_async_repo),
 ):
-    opts = web.parse_options(request, user, repo)
+    repo = arepo.repo
+    opts = await arepo.run(web.parse_options, request, user, repo)
+    query = opts.to_query()
+    await arepo.prefetch_read_model(query.selected_user_ids)
     # Reuse an active enrichment job rather than queueing duplicate work on
     # every page load for the same stale selection.
-    job_id = service.ensure_enrichment_job(repo, get_queue(), opts.to_query())
-    users = {str(u["user_id"]): u for u in repo.scan_users() if u.get("user_id")}
-    result = service.compare(repo, opts.to_query())
+    job_id, result, users = await asyncio.gather(
+        arepo.run(service.ensure_enrichment_job, repo, get_queue(), query),
+        arepo.run(service.compare, repo, query),
+        _users(arepo),
+    )
     caption = web.build_caption(users, opts, result)
     return authenticated_template(
         request,
@@ -49,23 +67,26 @@ def games_page(
             "games": web.present_games(result, opts),
             "caption": caption,
             "opts": opts,
+            "facets": web.facet_counts(result),
             "prefs": merge_preferences(user.get("preferences", {})),
             "job_id": job_id,
-            "job": repo.get_job(job_id) if job_id else None,
+            "job": await arepo.get_job(job_id) if job_id else None,
             "is_grid": opts.all_games,
         },
     )
 
 
 @router.get("/games/table", response_class=HTMLResponse)
-def games_table(
+async def games_table(
     request: Request,
     user: dict = Depends(current_user_api),
-    repo: Repository = Depends(get_repo),
+    arepo: AsyncRepository = Depends(get_async_repo),
 ):
-    users = {str(u["user_id"]): u for u in repo.scan_users() if u.get("user_id")}
-    opts = web.parse_options(request, user, repo)
-    result = service.compare(repo, opts.to_query())
+    opts = await arepo.run(web.parse_options, request, user, arepo.repo)
+    query = opts.to_query()
+    await arepo.prefetch_read_model(query.selected_user_ids)
+    users = await _users(arepo)
+    result = await arepo.run(service.compare, arepo.repo, query)
     caption = web.build_caption(users, opts, result)
     return authenticated_fragment(
         request,
@@ -76,21 +97,126 @@ def games_table(
             "caption": caption,
             "opts": opts,
             "is_grid": opts.all_games,
+            "facets": web.facet_counts(result),
+            "facets_oob": True,
         },
     )
 
 
 @router.get("/api/games")
-def games_api(
+async def games_api(
     request: Request,
+    limit: int | None = Query(None, ge=1, le=api.MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    format: str | None = None,
+    min_owners: int | None = Query(None, ge=1),
+    top: int | None = Query(None, ge=1),
     user: dict = Depends(current_user_api),
-    repo: Repository = Depends(get_repo),
+    arepo: AsyncRepository = Depends(get_async_repo),
+):
+    """Return the comparison dataset as JSON for headless consumers.
+
+    `limit` and `cursor` page through the result; the response's `next_cursor`
+    fetches the following page. With `format=ndjson` (or an
+    `application/x-ndjson` Accept header) the page is sent as one game per
+    line instead, with the total and next cursor in response headers.
+    `min_owners` relaxes the shared view to games at least that many of the
+    selected users own, and `q` keeps only games whose title matches (see
+    /api/games/search). `sort=recommended` ranks games for the selected group
+    (see /api/games/picks) and returns the best `top` (default 20).
+    """
+    opts = await arepo.run(web.parse_options, request, user, arepo.repo)
+    query = opts.to_query()
+    await arepo.prefetch_read_model(query.selected_user_ids)
+    result = await arepo.run(service.compare, arepo.repo, query)
+    try:
+        items, next_cursor = api.paginate(query, result, limit, cursor)
+    except api.InvalidCursor as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+    if format == "ndjson" or "application/x-ndjson" in request.headers.get(
+        "accept", ""
+    ):
+        headers = {"X-Total-Count": str(result.total)}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return StreamingResponse(
+            api.serialize_ndjson(items),
+            media_type="application/x-ndjson",
+            headers=headers,
+        )
+    return JSONResponse(api.serialize_comparison(query, result, items, next_cursor))
+
+
+@router.get("/api/games/overlap")
+async def games_overlap_api(
+    request: Request,
+    user: dict = Depends(current_user_api),
+    arepo: AsyncRepository = Depends(get_async_repo),
 ):
-    """Return the comparison dataset as JSON for headless consumers."""
-    opts = web.parse_options(request, user, repo)
+    """Return how many games each pair of the selected users share.
+
+    Takes the same user and filter parameters as /api/games; with no users
+    selected, every user is included.
+    """
+    opts = await arepo.run(web.parse_options, request, user, arepo.repo)
     query = opts.to_query()
-    result = service.compare(repo, query)
-    return JSONResponse(api.serialize_comparison(query, result))
+    overlap = await arepo.run(service.overlap, arepo.repo, query)
+    return JSONResponse(api.serialize_overlap(query, overlap))
+
+
+@router.get("/api/games/search")
+async def games_search_api(
+    q: str = Query("", max_length=web.MAX_SEARCH_LENGTH),
+    limit: int = Query(10, ge=1, le=api.MAX_SUGGESTIONS),
+    user: dict = Depends(current_user_api),
+    arepo: AsyncRepository = Depends(get_async_repo),
+):
+    """Typeahead: game titles across the catalog matching `q`.
+
+    Titles starting with `q` rank first, then titles with a later word that
+    does; with no prefix match, near misses are returned instead. Pass the
+    chosen text back as `q` on /api/games or /games to filter by it.
+    """
+    matches = await arepo.run(service.search_titles, arepo.repo, q, limit)
+    return JSONResponse(api.serialize_title_matches(q, matches))
+
+
+@router.post("/api/games/picks")
+def games_pick_api(
+    slug: str = Form(..., min_length=1),
+    user: dict = Depends(current_user_api),
+    repo: Repository = Depends(get_repo),
+):
+    """Record that the current user picked a game to play.
+
+    Recently picked games rank lower in the recommended sort for any group the
+    user is in, so the suggestions rotate. 404 for a slug not in the catalog.
+    """
+    try:
+        picks = service.record_pick(repo, user, slug)
+    except service.UnknownGame as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+    return JSONResponse({"recent_picks": picks})
+
+
+@router.get("/api/cache/stats")
+def cache_stats_api(
+    admin: dict = Depends(require_admin),
+    repo: Repository = Depends(get_repo),
+):
+    """This process's cache counters: the read-model cache per key family
+    (hits, misses, loads and their time, evictions, entries, bytes) and the
+    comparison result cache."""
+    return JSONResponse(
+        {
+            "read_model": {
+                "max_bytes": repo.settings.read_cache_max_bytes,
+                "families": repo.cache_stats(),
+            },
+            "comparisons": get_result_cache().stats(),
+        }
+    )
 
 
 @router.get("/api/jobs/{job_id}", response_class=HTMLResponse)
@@ -0,0 +1,146 @@
+"""Title search over the cached games catalog.
+
+Titles are normalized the way slugs are (`get_slug_from_title`: lowercase,
+accents and apostrophes dropped, other punctuation collapsed), with words
+separated by spaces. Lookups are prefix matches against every word of every
+title, via binary search over a sorted list of title suffixes that start at a
+word boundary, so "wit" finds "The Witcher 3" as well as "Witchfire". A query
+with no prefix hit falls back to rapidfuzz partial matching over the same
+normalized titles, to catch typos.
+
+One index is built per games map and reused until the Repository reloads the
+map, the same way the comparison catalog is.
+"""
+
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from typing import Any
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from gamatrix.games.catalog import PLATFORM_CODES, UNKNOWN_PLATFORM
+from gamatrix.helpers import get_slug_from_title
+from gamatrix.storage import interning
+from gamatrix.storage.interning import InternedGame
+
+# Minimum rapidfuzz partial ratio for a fuzzy hit, and the shortest query the
+# fuzzy fallback runs for (a two-letter query partially matches everything).
+FUZZY_MATCH_THRESHOLD = 80.0
+MIN_FUZZY_LENGTH = 3
+
+
+def normalize_title(title: str) -> str:
+    """Search form of a title: its slug with words separated by spaces."""
+    return get_slug_from_title(title).replace("-", " ")
+
+
+class SearchIndex:
+    """Prefix and fuzzy title lookup, keyed by interned slug id."""
+
+    def __init__(self, titles: dict[int, str]) -> None:
+        self.titles = titles
+        self._slug_ids = np.fromiter(titles, dtype=np.int64, count=len(titles))
+        self._normalized = [normalize_title(title) for title in titles.values()]
+
+        suffixes: list[tuple[str, int]] = []
+        for row, name in enumerate(self._normalized):
+            start = 0
+            while start >= 0:
+                suffixes.append((name[start:], row))
+                start = name.find(" ", start)
+                start = start + 1 if start >= 0 else -1
+        suffixes.sort()
+        self._suffixes = [suffix for suffix, _ in suffixes]
+        self._rows = np.array([row for _, row in suffixes], dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def match(self, query: str) -> np.ndarray | None:
+        """Slug ids of the titles matching `query`, or None when the query
+        has nothing to search for (it normalizes to empty)."""
+        term = normalize_title(query)
+        if not term:
+            return None
+        rows = np.unique(self._prefix_rows(term))
+        if not len(rows):
+            rows = np.array([row for row, _ in self._fuzzy(term, None)], dtype=np.int64)
+        return self._slug_ids[rows]
+
+    def suggest(self, query: str, limit: int) -> list[tuple[int, str]]:
+        """Up to `limit` (slug id, title) pairs for a typeahead.
+
+        Titles that start with the query come first, then titles with a later
+        word that does, alphabetically within each; fuzzy hits only fill in
+        when there are no prefix hits.
+        """
+        term = normalize_title(query)
+        if not term or limit <= 0:
+            return []
+        rows = list(dict.fromkeys(int(row) for row in self._prefix_rows(term)))
+        if rows:
+            rows.sort(
+                key=lambda row: (
+                    not self._normalized[row].startswith(term),
+                    self._normalized[row],
+                )
+            )
+        else:
+            rows = [row for row, _ in self._fuzzy(term, limit)]
+        return [
+            (int(self._slug_ids[row]), self.titles[int(self._slug_ids[row])])
+            for row in rows[:limit]
+        ]
+
+    def _prefix_rows(self, term: str) -> np.ndarray:
+        # Normalized titles are [a-z0-9 ]; "~" sorts after all of them.
+        lo = bisect_left(self._suffixes, term)
+        hi = bisect_left(self._suffixes, term + "~", lo)
+        return self._rows[lo:hi]
+
+    def _fuzzy(self, term: str, limit: int | None) -> list[tuple[int, float]]:
+        if len(term) < MIN_FUZZY_LENGTH:
+            return []
+        hits = process.extract(
+            term,
+            self._normalized,
+            scorer=fuzz.partial_ratio,
+            score_cutoff=FUZZY_MATCH_THRESHOLD,
+            limit=limit,
+        )
+        return [(row, score) for _, score, row in hits]
+
+
+def build_search_index(games: dict[int, InternedGame]) -> SearchIndex:
+    """Index one title per game: that of its release on the most preferred
+    platform, which is the title the comparison lists."""
+    preferred: dict[int, tuple[tuple[int, int], str]] = {}
+    for rk, game in games.items():
+        if not game.row.get("slug"):
+            continue
+        store = game.row.get("platform") or interning.release_keys.key(rk).split("_")[0]
+        rank = (PLATFORM_CODES.get(store, UNKNOWN_PLATFORM), rk)
+        current = preferred.get(game.slug_id)
+        if current is None or rank < current[0]:
+            preferred[game.slug_id] = (rank, game.row.get("title") or game.row["slug"])
+    return SearchIndex({slug_id: title for slug_id, (_, title) in preferred.items()})
+
+
+_lock = threading.Lock()
+_snapshot: tuple[Any, SearchIndex] | None = None
+
+
+def search_index_for(games: dict[int, InternedGame]) -> SearchIndex:
+    """Return the index for this cached games map, rebuilding only when the
+    map is a different object from the one the current index was built on."""
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is not None and snapshot[0] is games:
+        return snapshot[1]
+    index = build_search_index(games)
+    with _lock:
+        _snapshot = (games, index)
+    return index
@@ -8,23 +8,30 @@
 
 from __future__ import annotations
 
-from dataclasses import asdict, dataclass, field, replace
+from dataclasses import asdict, dataclass, field
 from datetime import datetime, timedelta, timezone
-from typing import Literal, Protocol
+from typing import Any, Callable, Iterable, Literal, Protocol
+
+import numpy as np
 
 from gamatrix.config import Settings, get_settings
-from gamatrix.constants import (
-    ENRICHMENT_PENDING,
-    IGDB_GAME_MODE,
-    IGDB_MULTIPLAYER_GAME_MODES,
-    PLATFORMS,
-)
-from gamatrix.helpers import parse_iso
+from gamatrix.constants import ENRICHMENT_PENDING
+from gamatrix.games.cache import get_result_cache
+from gamatrix.games.catalog import PLATFORM_CODES, Catalog, catalog_for
+from gamatrix.games.search import SearchIndex, search_index_for
+from gamatrix.helpers import now_iso, parse_iso
 from gamatrix.jobs import create_enrichment_job
+from gamatrix.storage import interning
 from gamatrix.storage.dynamo import Repository
+from gamatrix.storage.interning import InternedGame
+from gamatrix.storage.ownership import OwnershipIndex, OwnershipView, popcount
 from gamatrix.storage.queue import EnrichmentQueue
 
 
+class UnknownGame(ValueError):
+    """Raised for a slug that isn't in the games catalog."""
+
+
 @dataclass
 class SortSpec:
     field: str = "title"
@@ -40,6 +47,14 @@ class ComparisonQuery:
     exclusive: bool = False
     scope: Literal["shared", "owned"] = "shared"
     sort: SortSpec = field(default_factory=SortSpec)
+    # Shared scope only: keep games at least this many of the selected users
+    # own (and, with installed_only, have installed) instead of all of them.
+    min_owners: int | None = None
+    # Title search (see search.py): only games whose title matches are listed.
+    q: str = ""
+    # Keep only the first `top` rows in sort order. The "recommended" sort
+    # defaults to RECOMMENDED_TOP.
+    top: int | None = None
 
 
 class ComparisonRepository(Protocol):
@@ -47,20 +62,23 @@ class ComparisonRepository(Protocol):
 
     def scan_users(self) -> list[dict]: ...
 
-    def get_user_library(self, user_id: str) -> list[dict]: ...
+    def users_by_user_id(self) -> dict[str, dict]: ...
 
-    def get_all_games_map(self) -> dict[str, dict]: ...
+    def get_ownership_index(self, user_ids: Iterable[str]) -> OwnershipIndex: ...
 
-    def get_all_metadata(self) -> dict[str, dict]: ...
+    def get_games_by_id(self) -> dict[int, InternedGame]: ...
 
+    def get_metadata_by_slug_id(self) -> dict[int, dict]: ...
 
-# Sortable columns -> key function over a comparison item.
-SORT_KEYS = {
-    "title": lambda g: g.slug,
-    "players": lambda g: g.max_players,
-    "rating": lambda g: g.rating,
-    "installed": lambda g: len(g.installed),
-}
+    def get_entities_by_slug_id(self) -> dict[int, dict]: ...
+
+    def read_model_version(
+        self, user_ids: Iterable[str]
+    ) -> tuple[tuple[str, int], ...]: ...
+
+    def changed_slugs(
+        self, old: tuple[tuple[str, int], ...], new: tuple[tuple[str, int], ...]
+    ) -> set[str] | None: ...
 
 
 @dataclass
@@ -79,182 +97,760 @@ class ComparisonItem:
     enrichment_status: str | None = None
     comment: str = ""
     url: str | None = None
+    # Recommendation score (sort field "recommended" only).
+    score: float | None = None
 
     def to_dict(self) -> dict:
         return asdict(self)
 
 
+# The "recommended" sort scores each game for the selected group (see
+# `_recommendation_scores`): weights of its rating, how sure that rating is,
+# the share of the group with it installed and whether it seats the group.
+RECOMMEND_WEIGHTS = {
+    "rating": 0.35,
+    "confidence": 0.15,
+    "installed": 0.25,
+    "fits": 0.25,
+}
+# Rating counts at or past this are fully trusted.
+RATING_COUNT_SATURATION = 1000
+# A game one of the selected users picked loses up to this much score, halving
+# every PICK_HALF_LIFE_DAYS; users keep their MAX_RECENT_PICKS latest picks.
+PICK_PENALTY = 0.5
+PICK_HALF_LIFE_DAYS = 7
+MAX_RECENT_PICKS = 20
+RECOMMENDED_TOP = 20
+
+# Player-count facet buckets: a game's max players falls in the last bucket
+# whose lower bound it reaches. 0 means IGDB gave no figure.
+PLAYER_BUCKETS = (("unknown", 0), ("1", 1), ("2", 2), ("3-4", 3), ("5-8", 5), ("9+", 9))
+
+
+@dataclass
+class Facets:
+    """Games per filter value, computed in the same pass as a comparison.
+
+    Each facet applies every filter except its own, so a count is how many
+    games would be listed with that value switched on: `platform` ignores the
+    platform exclusions, `mode` splits by multiplayer ignoring the
+    single-player toggle, and `installed` is what installed-only would leave.
+    `players` buckets the listed games by max players.
+
+    Each value holds the slug ids of its games rather than a count, so a
+    patched result can swap just the changed games in and out.
+    """
+
+    slugs: dict[str, dict[str, np.ndarray]]
+
+    def counts(self) -> dict[str, dict[str, int]]:
+        return {
+            facet: {value: len(ids) for value, ids in values.items()}
+            for facet, values in self.slugs.items()
+        }
+
+    def patched(self, fresh: Facets, slug_ids: np.ndarray) -> Facets:
+        """These facets with the games in `slug_ids` replaced by `fresh`'s."""
+        return Facets(
+            {
+                facet: {
+                    value: np.union1d(
+                        ids[~np.isin(ids, slug_ids)], fresh.slugs[facet][value]
+                    )
+                    for value, ids in values.items()
+                }
+                for facet, values in self.slugs.items()
+            }
+        )
+
+
 @dataclass
 class ComparisonDataset:
     items: list[ComparisonItem]
     excluded_user_ids: list[str]
     total: int
+    facets: Facets | None = None
+
+
+@dataclass
+class TitleMatch:
+    slug: str
+    title: str
+
+
+@dataclass
+class OverlapMatrix:
+    """Pairwise shared-game counts: `counts[i][j]` is how many games users
+    `user_ids[i]` and `user_ids[j]` both own; the diagonal is each user's own
+    count."""
+
+    user_ids: list[str]
+    counts: list[list[int]]
+
+
+@dataclass
+class _Rows:
+    """Candidate release rows for one comparison, as parallel columns.
+
+    Owner and installed masks have one bit per user the query reads, at the
+    dense positions of its `OwnershipView`: (rows, words) uint64 arrays.
+    """
+
+    rk: np.ndarray
+    owners: np.ndarray
+    installed: np.ndarray
+
+
+@dataclass
+class _Groups:
+    """Rows merged into one entry per (slug, owner set), as parallel columns.
+
+    `members` holds every merged row's release-key id, grouped and ordered by
+    platform preference; group `g` spans `members[starts[g]:ends[g]]` and its
+    representative release is the first of those.
+    """
+
+    members: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+    rk: np.ndarray
+    slug_id: np.ndarray
+    slug_rank: np.ndarray
+    release_rank: np.ndarray
+    owners: np.ndarray
+    installed: np.ndarray
+    max_players: np.ndarray
+    multiplayer: np.ndarray
+    rating: np.ndarray
+    rating_count: np.ndarray
+
+
+def query_key(query: ComparisonQuery) -> tuple:
+    """Canonical, hashable form of a query: equal for queries that must give
+    the same result, whatever order users and platforms were listed in."""
+    return (
+        tuple(sorted({str(u) for u in query.selected_user_ids})),
+        tuple(sorted(set(query.exclude_platforms))),
+        query.include_single_player,
+        query.installed_only,
+        query.exclusive,
+        query.scope,
+        query.sort.field,
+        query.sort.direction,
+        query.min_owners,
+        query.q.strip(),
+        _top(query),
+    )
 
 
 def compare(repo: ComparisonRepository, query: ComparisonQuery) -> ComparisonDataset:
-    users = {str(u["user_id"]): u for u in repo.scan_users() if u.get("user_id")}
+    """Compare libraries, serving repeat queries from the result cache.
+
+    When the Repository can tell which slugs changed since the previous result
+    was computed (see `changed_slugs`), that result is patched for just those
+    slugs instead of being rebuilt. Cached datasets are shared between callers
+    and must not be mutated.
+    """
+    users = repo.users_by_user_id()
     selected = [str(u) for u in query.selected_user_ids if str(u) in users]
 
     # For exclusive mode we need to know who else owns each game.
     excluded_ids: list[str] = []
-    libraries_needed = set(selected)
+    libraries_needed = list(selected)
     if query.exclusive:
         excluded_ids = [u for u in users if u not in selected]
-        libraries_needed.update(excluded_ids)
-
-    # Aggregate ownership/installed/platforms per release key.
-    agg: dict[str, dict] = {}
-    for user_id in libraries_needed:
-        for entry in repo.get_user_library(user_id):
-            rk = entry["release_key"]
-            platform = entry.get("platform", rk.split("_")[0])
-            if platform in query.exclude_platforms:
-                continue
-            slot = agg.setdefault(
-                rk, {"owners": set(), "installed": set(), "platform": platform}
-            )
-            slot["owners"].add(user_id)
-            if entry.get("installed"):
-                slot["installed"].add(user_id)
-
-    metadata = repo.get_all_games_map()
-    overrides = repo.get_all_metadata()
-
-    games: list[ComparisonItem] = []
-    for rk, slot in agg.items():
-        meta = metadata.get(rk)
-        if meta is None:
-            continue  # not yet ingested into the games table
-        game = _build_game(rk, slot, meta, overrides)
-        games.append(game)
-
-    games = _merge_duplicates(games)
-    games = _filter(games, query, selected, excluded_ids)
-    games.sort(
-        key=SORT_KEYS.get(query.sort.field, SORT_KEYS["title"]),
-        reverse=query.sort.direction == "desc",
-    )
+        libraries_needed.extend(excluded_ids)
+
+    results = get_result_cache()
+    key = query_key(query)
+    version = repo.read_model_version(libraries_needed)
+    cached = results.get(key, version)
+    if cached is not None:
+        return cached
+
+    # A top-k result can't be patched: a game outside the cut may have moved in.
+    previous = results.previous(key) if _top(query) is None else None
+    if previous is not None:
+        slugs = repo.changed_slugs(previous.version, version)
+        if slugs is not None:
+            dataset = _patch(repo, query, selected, excluded_ids, previous.value, slugs)
+            return results.put(key, version, dataset, patched_from=previous)
+
+    dataset = _compare(repo, query, selected, excluded_ids)
+    return results.put(key, version, dataset)
+
+
+def _compare(
+    repo: ComparisonRepository,
+    query: ComparisonQuery,
+    selected: list[str],
+    excluded_ids: list[str],
+    slugs: set[str] | None = None,
+) -> ComparisonDataset:
+    """Run the comparison pipeline, optionally for only the given slugs."""
+    libraries_needed = selected + excluded_ids
+    view = repo.get_ownership_index(libraries_needed).view(libraries_needed)
+    catalog = _catalog(repo)
+
+    selected_mask = view.mask(selected)
+    search = search_index_for(repo.get_games_by_id()) if query.q.strip() else None
+    rows = _candidate_rows(view, catalog, query, selected, excluded_ids, slugs, search)
+    all_groups = _merge_duplicates(rows, catalog)
+    groups = all_groups
+    if query.exclude_platforms:
+        # Platform facets count the excluded stores too, so merge the rows
+        # both with and without them.
+        groups = _merge_duplicates(_without_platforms(rows, catalog, query), catalog)
+    keep = _filter(groups, query, selected_mask)
+    scores = None
+    if query.sort.field == "recommended":
+        scores = _recommendation_scores(
+            groups, selected_mask, _pick_penalties(repo, selected)
+        )
+    order = _sort_order(groups, keep, query.sort, _top(query), scores)
+    games = [_build_item(groups, int(g), catalog, view, scores) for g in order]
 
     # Count unique games, not rows: the grid view can list the same title on
     # more than one row when platform copies have different owners, but those
     # are still one game. Rows are already grouped by slug, so distinct slugs
     # is the unique-game count.
-    total = len({g.slug for g in games})
+    total = len(np.unique(groups.slug_id[keep]))
+    facets = _facets(all_groups, groups, keep, query, selected_mask, catalog)
 
-    return ComparisonDataset(items=games, excluded_user_ids=excluded_ids, total=total)
+    return ComparisonDataset(
+        items=games, excluded_user_ids=excluded_ids, total=total, facets=facets
+    )
 
 
-def _build_game(rk: str, slot: dict, meta: dict, overrides: dict) -> ComparisonItem:
-    game = ComparisonItem(
-        release_key=rk,
-        title=meta.get("title", rk),
-        slug=meta.get("slug", ""),
-        igdb_key=meta.get("igdb_key", rk),
-        platforms=[slot["platform"]],
-        owners=sorted(slot["owners"]),
-        installed=sorted(slot["installed"]),
-        max_players=_display_max_players(meta),
-        multiplayer=meta.get("multiplayer", False),
-        rating=meta.get("rating", 0),
-        rating_count=meta.get("rating_count", 0),
-        enrichment_status=meta.get("enrichment_status"),
+def _patch(
+    repo: ComparisonRepository,
+    query: ComparisonQuery,
+    selected: list[str],
+    excluded_ids: list[str],
+    dataset: ComparisonDataset,
+    slugs: set[str],
+) -> ComparisonDataset:
+    """Bring `dataset` up to date by re-running the pipeline for `slugs` only.
+
+    Rows for those slugs are dropped and replaced with fresh ones, then the
+    list is re-sorted in the same order `_sort_order` produces (see
+    `sort_position`). The rest of the rows are already in order, so the sort is
+    close to a linear merge.
+    """
+    fresh = _compare(repo, query, selected, excluded_ids, slugs)
+    items = [item for item in dataset.items if item.slug not in slugs]
+    items.extend(fresh.items)
+
+    items.sort(key=lambda item: sort_position(item, query.sort))
+    if query.sort.direction == "desc":
+        # Only the sort field is reversed; ties stay in ascending title and
+        # release-key order. Python's sort is stable, also when reversed.
+        field_key = _ITEM_SORT_KEYS.get(query.sort.field, _ITEM_SORT_KEYS["title"])
+        items.sort(key=field_key, reverse=True)
+
+    facets = None
+    if dataset.facets is not None and fresh.facets is not None:
+        slug_ids = np.array([interning.slugs.intern(slug) for slug in slugs])
+        facets = dataset.facets.patched(fresh.facets, slug_ids)
+    return ComparisonDataset(
+        items=items,
+        excluded_user_ids=fresh.excluded_user_ids,
+        total=len({item.slug for item in items}),
+        facets=facets,
     )
 
-    # Apply manual overrides (config metadata in v1) by slug; these win over IGDB.
-    override = overrides.get(game.slug)
-    if override:
-        if "max_players" in override:
-            game.max_players = override["max_players"]
-            game.multiplayer = _multiplayer(
-                override["max_players"],
-                meta.get("game_modes", []),
-            )
-        if override.get("comment"):
-            game.comment = override["comment"]
-        if override.get("url"):
-            game.url = override["url"]
-    return game
-
-
-def _display_max_players(meta: dict) -> int:
-    """Player count to show for a game.
-
-    IGDB gives confirmed single-player games no max-player figure, which would
-    otherwise render as an empty Players cell. When a game is known single-player
-    (IGDB lists the single-player mode and nothing multiplayer), surface that as
-    1 player instead of a blank. Games with an unknown mode set stay at 0 so we
-    don't claim a count IGDB never confirmed.
+
+# Python-side equivalents of the `_sort_order` columns.
+_ITEM_SORT_KEYS: dict[str, Callable[[ComparisonItem], Any]] = {
+    "title": lambda item: item.slug,
+    "players": lambda item: item.max_players,
+    "rating": lambda item: item.rating,
+    "installed": lambda item: len(item.installed),
+    "recommended": lambda item: item.score or 0.0,
+}
+
+
+def sort_position(item: ComparisonItem, sort: SortSpec) -> tuple:
+    """An item's (sort field, slug, release key) position in a result.
+
+    Results are ordered by the sort field in the requested direction, then by
+    slug and release key ascending, which makes the position unique and the
+    same in every process.
     """
-    max_players = meta.get("max_players", 0)
-    if max_players or meta.get("multiplayer", False):
-        return max_players
-    if IGDB_GAME_MODE["singleplayer"] in meta.get("game_modes", []):
-        return 1
-    return max_players
+    field_key = _ITEM_SORT_KEYS.get(sort.field, _ITEM_SORT_KEYS["title"])
+    return (field_key(item), item.slug, item.release_key)
+
 
+def follows(position: tuple, after: tuple, sort: SortSpec) -> bool:
+    """Whether `position` comes after `after` in a result sorted by `sort`."""
+    if position[0] != after[0]:
+        if sort.direction == "desc":
+            return position[0] < after[0]
+        return position[0] > after[0]
+    return position[1:] > after[1:]
 
-def _multiplayer(max_players: int, game_modes: list[int]) -> bool:
-    if max_players > 1:
-        return True
-    return any(m in IGDB_MULTIPLAYER_GAME_MODES for m in game_modes)
+
+def _candidate_rows(
+    view: OwnershipView,
+    catalog: Catalog,
+    query: ComparisonQuery,
+    selected: list[str],
+    excluded_ids: list[str],
+    slugs: set[str] | None = None,
+    search: SearchIndex | None = None,
+) -> _Rows:
+    selected_mask = view.mask(selected)
+    excluded_mask = view.mask(excluded_ids)
+    shared = query.scope == "shared"
+    min_owners = _min_owners(query, len(selected))
+
+    # Shared scope needs every selected user, so only the smallest selected
+    # library has to be walked; owned scope takes the union, and so does
+    # "at least k of them", over the selected libraries only.
+    if shared and min_owners is None:
+        rk = view.release_keys(selected, require_all=True)
+    elif shared:
+        rk = view.release_keys(selected, require_all=False)
+    else:
+        rk = view.release_keys(selected + excluded_ids, require_all=False)
+
+    # Catalog filters are vectorized and run first to shrink the mask pass.
+    # Keys with no games-table row are libraries ingested ahead of their stubs.
+    rk = rk[rk < catalog.size]
+    rk = rk[catalog.present[rk]]
+    if slugs is not None:
+        slug_ids = [interning.slugs.intern(slug) for slug in slugs]
+        rk = rk[np.isin(catalog.slug_id[rk], slug_ids)]
+    if search is not None:
+        matches = search.match(query.q)
+        if matches is not None:
+            rk = rk[np.isin(catalog.slug_id[rk], matches)]
+
+    # Owner checks are exact per release key: cross-platform copies only merge
+    # when their owner sets match, so checking before the merge gives the same
+    # answer and skips merging rows that would be dropped.
+    # The view only holds the users this query reads, so the masks need no
+    # further restriction.
+    owners = view.owner_masks(rk)
+    keep = owners.any(axis=1)
+    if shared and min_owners is None:
+        keep &= ((owners & selected_mask) == selected_mask).all(axis=1)
+    elif shared:
+        keep &= popcount(owners & selected_mask) >= min_owners
+    if shared and query.exclusive:
+        keep &= ~(owners & excluded_mask).any(axis=1)
+    rk = rk[keep]
+    return _Rows(rk=rk, owners=owners[keep], installed=view.installed_masks(rk))
+
+
+def _without_platforms(rows: _Rows, catalog: Catalog, query: ComparisonQuery) -> _Rows:
+    """Drop the rows of releases on the query's excluded platforms."""
+    excluded_codes = [
+        PLATFORM_CODES[p] for p in query.exclude_platforms if p in PLATFORM_CODES
+    ]
+    keep = ~np.isin(catalog.platform[rows.rk], excluded_codes)
+    return _Rows(
+        rk=rows.rk[keep], owners=rows.owners[keep], installed=rows.installed[keep]
+    )
 
 
-def _merge_duplicates(games: list[ComparisonItem]) -> list[ComparisonItem]:
+def _merge_duplicates(rows: _Rows, catalog: Catalog) -> _Groups:
     """Merge same-title entries that have identical owners (cross-platform copies).
 
     Mirrors v1: copies of the same game on different stores held by the same set
     of owners collapse into one row listing all platforms; copies owned by
-    different people stay separate.
+    different people stay separate. Within a group the copy on the most
+    preferred platform (PLATFORMS order) represents the merged row.
     """
-    grouped: dict[tuple[str, frozenset[str]], ComparisonItem] = {}
-    for game in games:
-        key = (game.slug, frozenset(game.owners))
-        if key not in grouped:
-            grouped[key] = replace(game, platforms=list(game.platforms))
-            continue
-        existing = grouped[key]
-        for platform in game.platforms:
-            if platform not in existing.platforms:
-                existing.platforms.append(platform)
-        existing.installed = sorted(set(existing.installed) | set(game.installed))
-        existing.max_players = max(existing.max_players, game.max_players)
-        existing.multiplayer = existing.multiplayer or game.multiplayer
-        existing.rating = max(existing.rating, game.rating)
-
-    for game in grouped.values():
-        game.platforms = _sort_platforms(game.platforms)
-    return list(grouped.values())
-
-
-def _sort_platforms(platforms: list[str]) -> list[str]:
-    return sorted(
-        platforms,
-        key=lambda p: PLATFORMS.index(p) if p in PLATFORMS else len(PLATFORMS),
+    slug_id = catalog.slug_id[rows.rk]
+    platform = catalog.platform[rows.rk]
+    if len(rows.owners):
+        _, owner_code = np.unique(rows.owners, axis=0, return_inverse=True)
+        owner_code = owner_code.reshape(-1)
+    else:
+        owner_code = np.zeros(0, dtype=np.int64)
+    order = np.lexsort((rows.rk, platform, owner_code, slug_id))
+    members = rows.rk[order]
+    slug_id, owner_code = slug_id[order], owner_code[order]
+
+    boundary = np.ones(len(members), dtype=bool)
+    boundary[1:] = (slug_id[1:] != slug_id[:-1]) | (owner_code[1:] != owner_code[:-1])
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], len(members))
+    if not len(members):
+        empty = np.zeros(0, dtype=np.int64)
+        return _Groups(
+            members=members,
+            starts=starts,
+            ends=ends,
+            rk=members,
+            slug_id=empty,
+            slug_rank=empty,
+            release_rank=empty,
+            owners=rows.owners,
+            installed=rows.installed,
+            max_players=empty,
+            multiplayer=np.zeros(0, dtype=bool),
+            rating=np.zeros(0, dtype=np.float64),
+            rating_count=empty,
+        )
+
+    rk = members[starts]
+    return _Groups(
+        members=members,
+        starts=starts,
+        ends=ends,
+        rk=rk,
+        slug_id=slug_id[starts],
+        slug_rank=catalog.slug_rank[rk],
+        release_rank=catalog.release_rank[rk],
+        owners=rows.owners[order][starts],
+        installed=np.bitwise_or.reduceat(rows.installed[order], starts),
+        max_players=np.maximum.reduceat(catalog.max_players[members], starts),
+        multiplayer=np.logical_or.reduceat(catalog.multiplayer[members], starts),
+        rating=np.maximum.reduceat(catalog.rating[members], starts),
+        rating_count=np.maximum.reduceat(catalog.rating_count[members], starts),
     )
 
 
 def _filter(
-    games: list[ComparisonItem],
+    groups: _Groups, query: ComparisonQuery, selected_mask: np.ndarray
+) -> np.ndarray:
+    """Boolean mask of the merged rows that pass the query's filters.
+
+    Owner and exclusive checks already ran per release key; what's left depends
+    on merged fields (multiplayer and installed are unions across copies).
+    """
+    keep = np.ones(len(groups.rk), dtype=bool)
+    if not query.include_single_player:
+        keep &= groups.multiplayer
+    if query.installed_only:
+        keep &= _installed(groups, query, selected_mask)
+    return keep
+
+
+def _installed(
+    groups: _Groups, query: ComparisonQuery, selected_mask: np.ndarray
+) -> np.ndarray:
+    """Mask of the merged rows installed-only keeps (all of them outside
+    shared scope, where it doesn't apply)."""
+    if query.scope != "shared":
+        return np.ones(len(groups.rk), dtype=bool)
+    installed = groups.installed & selected_mask
+    min_owners = _min_owners(query, int(popcount(selected_mask)))
+    if min_owners is None:
+        return (installed == selected_mask).all(axis=1)
+    return popcount(installed) >= min_owners
+
+
+def _facets(
+    all_groups: _Groups,
+    groups: _Groups,
+    keep: np.ndarray,
     query: ComparisonQuery,
-    selected: list[str],
-    excluded_ids: list[str],
-) -> list[ComparisonItem]:
-    selected_set = set(selected)
-    excluded_set = set(excluded_ids)
-    result = []
-    for game in games:
-        if not query.include_single_player and not game.multiplayer:
+    selected_mask: np.ndarray,
+    catalog: Catalog,
+) -> Facets:
+    """Facet a comparison's merged rows (see `Facets`).
+
+    `all_groups` are the rows merged before platform exclusions, `groups` and
+    `keep` the ones the result was built from.
+    """
+    # A merged row counts for every platform one of its copies is on.
+    sizes = all_groups.ends - all_groups.starts
+    listed = np.repeat(_filter(all_groups, query, selected_mask), sizes)
+    member_slug = np.repeat(all_groups.slug_id, sizes)[listed]
+    member_platform = catalog.platform[all_groups.members][listed]
+
+    multiplayer = groups.multiplayer
+    installed = _installed(groups, query, selected_mask)
+    shown = installed if query.installed_only else np.ones_like(installed)
+    if not query.include_single_player:
+        installed = installed & multiplayer
+    bucket = np.digitize(groups.max_players, [low for _, low in PLAYER_BUCKETS]) - 1
+
+    return Facets(
+        {
+            "platform": {
+                name: np.unique(member_slug[member_platform == code])
+                for name, code in PLATFORM_CODES.items()
+            },
+            "mode": {
+                "multiplayer": np.unique(groups.slug_id[shown & multiplayer]),
+                "single_player": np.unique(groups.slug_id[shown & ~multiplayer]),
+            },
+            "installed": {"installed": np.unique(groups.slug_id[installed])},
+            "players": {
+                name: np.unique(groups.slug_id[keep & (bucket == b)])
+                for b, (name, _) in enumerate(PLAYER_BUCKETS)
+            },
+        }
+    )
+
+
+def _min_owners(query: ComparisonQuery, selected: int) -> int | None:
+    """The effective "at least k owners" threshold, or None when the query
+    needs every selected user (k unset, or at least the selection size)."""
+    if query.min_owners is None or query.scope != "shared":
+        return None
+    if query.min_owners >= selected:
+        return None
+    return max(query.min_owners, 1)
+
+
+def _sort_order(
+    groups: _Groups,
+    keep: np.ndarray,
+    sort: SortSpec,
+    top: int | None = None,
+    scores: np.ndarray | None = None,
+) -> np.ndarray:
+    """Indexes of the kept groups in display order, ties broken by title and
+    then by the representative release key; only the first `top` if given.
+
+    `scores` are the recommendation scores, for the "recommended" sort.
+    """
+    idx = np.flatnonzero(keep)
+    primary: np.ndarray
+    if sort.field == "recommended" and scores is not None:
+        primary = scores[idx]
+    elif sort.field == "players":
+        primary = groups.max_players[idx]
+    elif sort.field == "rating":
+        primary = groups.rating[idx]
+    elif sort.field == "installed":
+        primary = popcount(groups.installed[idx])
+    else:
+        primary = groups.slug_rank[idx]
+    if sort.direction == "desc":
+        primary = -primary
+    if top is not None and top < len(idx):
+        # Partial sort: only rows that tie with or beat the k-th best primary
+        # value can make the cut, so just those get the full sort.
+        cut = primary <= np.partition(primary, top - 1)[top - 1]
+        idx, primary = idx[cut], primary[cut]
+    title = groups.slug_rank[idx]
+    release = groups.release_rank[idx]
+    return idx[np.lexsort((release, title, primary))][:top]
+
+
+def _top(query: ComparisonQuery) -> int | None:
+    if query.top is not None:
+        return max(query.top, 1)
+    if query.sort.field == "recommended":
+        return RECOMMENDED_TOP
+    return None
+
+
+def _recommendation_scores(
+    groups: _Groups, selected_mask: np.ndarray, penalties: dict[int, float]
+) -> np.ndarray:
+    """Score every merged row for the selected group in one vectorized pass.
+
+    A weighted sum of the rating, the confidence in it (log rating count), the
+    share of the group with the game installed, and whether its max players
+    seats the whole group (half credit when unknown), less the penalty for a
+    recent pick.
+    """
+    group_size = max(int(popcount(selected_mask)), 1)
+    rating = groups.rating / 100
+    confidence = np.minimum(
+        np.log1p(groups.rating_count) / np.log1p(RATING_COUNT_SATURATION), 1.0
+    )
+    installed = popcount(groups.installed & selected_mask) / group_size
+    fits = np.where(
+        groups.max_players >= group_size, 1.0, np.where(groups.max_players, 0.0, 0.5)
+    )
+    score = (
+        RECOMMEND_WEIGHTS["rating"] * rating
+        + RECOMMEND_WEIGHTS["confidence"] * confidence
+        + RECOMMEND_WEIGHTS["installed"] * installed
+        + RECOMMEND_WEIGHTS["fits"] * fits
+    )
+    if penalties:
+        picked = np.fromiter(penalties, dtype=np.int64, count=len(penalties))
+        penalty = np.fromiter(penalties.values(), dtype=np.float64, count=len(picked))
+        order = np.argsort(picked)
+        picked, penalty = picked[order], penalty[order]
+        at = np.minimum(np.searchsorted(picked, groups.slug_id), len(picked) - 1)
+        score = score - np.where(picked[at] == groups.slug_id, penalty[at], 0.0)
+    return np.round(score, 4)
+
+
+def _pick_penalties(
+    repo: ComparisonRepository, selected: list[str]
+) -> dict[int, float]:
+    """Score penalty per slug id for games the selected users picked recently."""
+    users = repo.users_by_user_id()
+    now = datetime.now(timezone.utc)
+    penalties: dict[int, float] = {}
+    for user_id in set(selected):
+        user = users.get(str(user_id))
+        if user is None:
             continue
-        if query.scope == "shared":
-            owners = set(game.owners)
-            if not selected_set.issubset(owners):
-                continue
-            if query.installed_only and not selected_set.issubset(set(game.installed)):
+        for pick in user.get("recent_picks") or []:
+            age = (now - parse_iso(pick["picked_at"])).total_seconds() / 86400
+            penalty = PICK_PENALTY * 0.5 ** (max(age, 0) / PICK_HALF_LIFE_DAYS)
+            # A slug nothing in the catalog has ever had can't match a game;
+            # interning it would only grow the interner.
+            slug_id = interning.slugs.get(pick["slug"])
+            if slug_id is None:
                 continue
-            if query.exclusive and owners & excluded_set:
-                continue
-        result.append(game)
-    return result
+            penalties[slug_id] = max(penalties.get(slug_id, 0.0), penalty)
+    return penalties
+
+
+def record_pick(repo: Repository, user: dict, slug: str) -> list[dict]:
+    """Remember that `user` picked `slug`, so recommendations rotate it out
+    for a while. Returns the user's updated recent picks.
+
+    Raises UnknownGame unless `slug` is a game in the catalog.
+    """
+    slug_id = interning.slugs.get(slug)
+    if slug_id is None or not _catalog(repo).has_slug(slug_id):
+        raise UnknownGame(f"No game with slug {slug!r}")
+    picks = [p for p in user.get("recent_picks") or [] if p.get("slug") != slug]
+    picks.insert(0, {"slug": slug, "picked_at": now_iso()})
+    picks = picks[:MAX_RECENT_PICKS]
+    repo.update_user(user["email"], {"recent_picks": picks})
+    return picks
+
+
+def _build_item(
+    groups: _Groups,
+    g: int,
+    catalog: Catalog,
+    view: OwnershipView,
+    scores: np.ndarray | None = None,
+) -> ComparisonItem:
+    rk = int(groups.rk[g])
+    release_key = interning.release_keys.key(rk)
+    game = catalog.games[rk]
+    meta = game.row
+    # Manual overrides (config metadata in v1) are keyed by slug and win over
+    # IGDB; the player columns already had them applied in the catalog, and the
+    # game's entity carries its override's comment and url.
+    override = (
+        catalog.entities.get(game.slug_id) or catalog.overrides.get(game.slug_id) or {}
+    )
+    members = [int(m) for m in groups.members[groups.starts[g] : groups.ends[g]]]
+    return ComparisonItem(
+        release_key=release_key,
+        title=meta.get("title", release_key),
+        slug=meta.get("slug", ""),
+        igdb_key=meta.get("igdb_key", release_key),
+        platforms=list(dict.fromkeys(catalog.platform_name(m) for m in members)),
+        owners=view.user_ids_of(groups.owners[g]),
+        installed=view.user_ids_of(groups.installed[g]),
+        max_players=int(groups.max_players[g]),
+        multiplayer=bool(groups.multiplayer[g]),
+        rating=_number(groups.rating[g]),
+        rating_count=meta.get("rating_count", 0),
+        enrichment_status=meta.get("enrichment_status"),
+        comment=override.get("comment") or "",
+        url=override.get("url") or None,
+        score=None if scores is None else float(scores[g]),
+    )
+
+
+def _catalog(repo: ComparisonRepository) -> Catalog:
+    return catalog_for(
+        repo.get_games_by_id(),
+        repo.get_entities_by_slug_id(),
+        repo.get_metadata_by_slug_id(),
+    )
+
+
+def _number(value: float) -> int | float:
+    """Hand a float column value back as an int when it is whole."""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def overlap(repo: ComparisonRepository, query: ComparisonQuery) -> OverlapMatrix:
+    """Shared-game counts for every pair of the query's users, in one pass.
+
+    Counts unique games the way `compare` totals them for a two-user shared
+    comparison: both users own the same release, on a platform that isn't
+    excluded. `include_single_player` and `installed_only` apply as in
+    `compare`, except that a game counts as multiplayer when any of its
+    releases is, and installed means both users installed that release.
+    With no users selected, every user is included. Results are cached per
+    read-model version alongside comparisons.
+    """
+    users = list(repo.users_by_user_id())
+    wanted = {str(u) for u in query.selected_user_ids}
+    user_ids = sorted(u for u in users if u in wanted) if wanted else sorted(users)
+
+    results = get_result_cache()
+    key = (
+        "overlap",
+        tuple(user_ids),
+        tuple(sorted(set(query.exclude_platforms))),
+        query.include_single_player,
+        query.installed_only,
+    )
+    version = repo.read_model_version(user_ids)
+    cached = results.get(key, version)
+    if cached is not None:
+        return cached
+    return results.put(key, version, _overlap(repo, query, user_ids))
+
+
+def _overlap(
+    repo: ComparisonRepository, query: ComparisonQuery, user_ids: list[str]
+) -> OverlapMatrix:
+    view = repo.get_ownership_index(user_ids).view(user_ids)
+    catalog = _catalog(repo)
+    n = len(user_ids)
+    counts = np.zeros((n, n), dtype=np.int64)
+
+    rk = view.release_keys(user_ids, require_all=False)
+    rk = rk[rk < catalog.size]
+    rk = rk[catalog.present[rk]]
+    if query.exclude_platforms:
+        excluded_codes = [
+            PLATFORM_CODES[p] for p in query.exclude_platforms if p in PLATFORM_CODES
+        ]
+        rk = rk[~np.isin(catalog.platform[rk], excluded_codes)]
+    # Group releases by game.
+    rk = rk[np.argsort(catalog.slug_id[rk], kind="stable")]
+    if len(rk) and not query.include_single_player:
+        starts = _run_starts(catalog.slug_id[rk])
+        multiplayer = np.logical_or.reduceat(catalog.multiplayer[rk], starts)
+        rk = rk[np.repeat(multiplayer, np.diff(np.append(starts, len(rk))))]
+    if not len(rk):
+        return OverlapMatrix(user_ids=user_ids, counts=counts.tolist())
+    starts = _run_starts(catalog.slug_id[rk])
+
+    # Release x user ownership matrix, one column per user.
+    owned = view.columns(rk, installed=query.installed_only)
+
+    # A pair shares a game when both own one of its releases. For each user,
+    # AND their column across the matrix and OR each game's releases together,
+    # so a game both own on two platforms still counts once.
+    for i in range(n):
+        both = owned & owned[:, i : i + 1]
+        counts[i] = np.logical_or.reduceat(both, starts, axis=0).sum(axis=0)
+    return OverlapMatrix(user_ids=user_ids, counts=counts.tolist())
+
+
+def _run_starts(values: np.ndarray) -> np.ndarray:
+    """Start offsets of each run of equal values in a (grouped) array."""
+    boundary = np.ones(len(values), dtype=bool)
+    boundary[1:] = values[1:] != values[:-1]
+    return np.flatnonzero(boundary)
+
+
+def search_titles(
+    repo: ComparisonRepository, q: str, limit: int = 10
+) -> list[TitleMatch]:
+    """Typeahead matches for `q` across the whole catalog."""
+    index = search_index_for(repo.get_games_by_id())
+    return [
+        TitleMatch(slug=interning.slugs.key(slug_id), title=title)
+        for slug_id, title in index.suggest(q, limit)
+    ]
 
 
 def ensure_enrichment_job(
@@ -284,13 +880,14 @@ def stale_release_keys(
     settings = settings or get_settings()
     cutoff = datetime.now(timezone.utc) - timedelta(days=settings.igdb_stale_days)
 
-    release_keys: set[str] = set()
-    for user_id in query.selected_user_ids:
-        for entry in repo.get_user_library(user_id):
-            release_keys.add(entry["release_key"])
+    index = repo.get_ownership_index(query.selected_user_ids)
+    release_keys = index.release_keys(query.selected_user_ids, require_all=False)
 
     stale: list[str] = []
-    for rk, game in repo.batch_get_games(release_keys).items():
+    for rk, game in repo.batch_get_games(
+        (interning.release_keys.key(k) for k in sorted(release_keys)),
+        projection=("enrichment_status", "enriched_at"),
+    ).items():
         status = game.get("enrichment_status")
         if status in (ENRICHMENT_PENDING, None):
             stale.append(rk)
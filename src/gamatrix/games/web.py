@@ -23,6 +23,9 @@
     SortSpec,
 )
 
+# Longer search text is cut off; no game title needs more.
+MAX_SEARCH_LENGTH = 100
+
 
 @dataclass
 class WebCompareOptions:
@@ -36,6 +39,9 @@ class WebCompareOptions:
     show_keys: bool = False
     sort: str = "title"
     direction: Literal["asc", "desc"] = "asc"
+    min_owners: int | None = None
+    q: str = ""
+    top: int | None = None
 
     @property
     def all_games(self) -> bool:
@@ -50,6 +56,9 @@ def to_query(self) -> ComparisonQuery:
             exclusive=self.exclusive,
             scope="owned" if self.all_games else "shared",
             sort=SortSpec(field=self.sort, direction=self.direction),
+            min_owners=self.min_owners,
+            q=self.q,
+            top=self.top,
         )
 
 
@@ -90,18 +99,22 @@ def flag(name: str, default: bool) -> bool:
     if not selected and not form_submitted:
         pref_users = prefs["selected_users"]
         if pref_users == "all":
-            selected = [
-                str(u["user_id"]) for u in repo.scan_users() if u.get("user_id")
-            ]
+            selected = list(repo.users_by_user_id())
         else:
             selected = list(pref_users)
 
     view = qp.get("view", prefs["default_view"])
     if view not in ("list", "grid"):
         view = "list"
+    sort = qp.get("sort", "title")
+    # Recommendations read best first unless asked otherwise.
+    default_dir = "desc" if sort == "recommended" else "asc"
     direction: Literal["asc", "desc"] = (
-        "desc" if qp.get("dir", "asc") == "desc" else "asc"
+        "desc" if qp.get("dir", default_dir) == "desc" else "asc"
     )
+    # "Owned by at least k": blank (the form's default) or junk means everyone.
+    min_owners = _positive_int(qp.get("min_owners", ""))
+    top = _positive_int(qp.get("top", ""))
 
     return WebCompareOptions(
         selected_user_ids=selected,
@@ -112,11 +125,25 @@ def flag(name: str, default: bool) -> bool:
         view=view,
         randomize=flag("randomize", False),
         show_keys=flag("show_keys", prefs["show_keys"]),
-        sort=qp.get("sort", "title"),
+        sort=sort,
         direction=direction,
+        min_owners=min_owners,
+        q=qp.get("q", "").strip()[:MAX_SEARCH_LENGTH],
+        top=top,
     )
 
 
+def _positive_int(raw: str) -> int | None:
+    """A query param as a positive int, or None if it is blank or not one.
+
+    Only ASCII digits count: `str.isdigit` also accepts characters like "²",
+    which `int` then rejects.
+    """
+    if raw.isascii() and raw.isdecimal():
+        return int(raw) or None
+    return None
+
+
 def present_games(dataset: ComparisonDataset, opts: WebCompareOptions) -> list[dict]:
     """Convert typed comparison items into the current template payload."""
     games = [item.to_dict() for item in dataset.items]
@@ -125,6 +152,13 @@ def present_games(dataset: ComparisonDataset, opts: WebCompareOptions) -> list[d
     return games
 
 
+def facet_counts(dataset: ComparisonDataset) -> dict[str, dict[str, int]] | None:
+    """Facet counts for the filter bar, if the dataset carries them."""
+    if dataset.facets is None:
+        return None
+    return dataset.facets.counts()
+
+
 def build_caption(
     users: dict[str, dict],
     opts: WebCompareOptions,
@@ -142,6 +176,8 @@ def build_caption(
         middle = "total games owned by"
     elif len(opts.selected_user_ids) == 1:
         middle = "games owned by"
+    elif opts.min_owners and opts.min_owners < len(opts.selected_user_ids):
+        middle = f"games owned by at least {opts.min_owners} of"
     else:
         middle = "games in common between"
 
@@ -152,6 +188,8 @@ def build_caption(
             users[u]["username"] for u in dataset.excluded_user_ids if u in users
         ]
         caption += f" and not owned by {', '.join(excluded_names)}"
+    if opts.q:
+        caption += f' matching "{opts.q}"'
     if opts.exclude_platforms:
         caption += f" ({', '.join(opts.exclude_platforms).title()} excluded)"
     if opts.installed_only and not opts.all_games:
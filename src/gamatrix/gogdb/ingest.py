@@ -3,6 +3,11 @@
 Used by both the S3-triggered db_parser Lambda (AWS) and the upload-complete
 endpoint (local dev). Writes the user's library, upserts game stubs, and
 creates an enrichment job for any games not yet enriched.
+
+Re-uploads are usually tiny diffs of the previous library, so the library is
+written with its delta and only stubs whose GOG-derived fields changed are
+rewritten. That lets the Repository patch its ownership index and cached
+comparisons for just the changed games instead of rebuilding them.
 """
 
 from __future__ import annotations
@@ -10,14 +15,19 @@
 import logging
 
 from gamatrix.constants import ENRICHMENT_PENDING
+from gamatrix.games.entities import sync_entities
 from gamatrix.gogdb.parser import GogDBParser
 from gamatrix.helpers import now_iso
 from gamatrix.jobs import create_enrichment_job
 from gamatrix.storage.dynamo import Repository
+from gamatrix.storage.ownership import diff_library
 from gamatrix.storage.queue import EnrichmentQueue
 
 log = logging.getLogger(__name__)
 
+# Game fields owned by the GOG DB; everything else on a game row is IGDB's.
+STUB_FIELDS = ("title", "slug", "igdb_key", "platform")
+
 
 def ingest_db_file(
     db_path: str,
@@ -31,49 +41,56 @@ def ingest_db_file(
     finally:
         parser.close()
 
-    timestamp = now_iso()
-    entries = [{**e, "db_updated_at": timestamp} for e in parsed.entries]
-    repo.replace_user_library(parsed.user_id, entries)
+    # When the library was uploaded lives on the user record, not on each row,
+    # so an unchanged re-upload writes no library rows at all. The rows read
+    # for the diff are the ones the replace writes against, not read again.
+    entries = parsed.entries
+    delta = diff_library(repo.get_user_library(parsed.user_id), entries)
+    changes = repo.replace_user_library(parsed.user_id, entries, delta=delta)
 
     user = repo.get_user_by_user_id(parsed.user_id)
     if user:
-        repo.update_user(user["email"], {"db_updated_at": timestamp})
+        repo.update_user(user["email"], {"db_updated_at": now_iso()})
 
-    # Upsert game stubs; collect release keys that still need IGDB enrichment.
+    # Upsert game stubs; collect release keys that still need IGDB enrichment,
+    # and the rows written, whose game entities need refreshing.
     to_enrich: list[str] = []
+    written: list[dict] = []
+    moved_from: set[str] = set()
     for stub in parsed.games:
         existing = repo.get_game(stub["release_key"])
         if existing is None:
-            repo.put_game(
-                {
-                    **stub,
-                    "enrichment_status": ENRICHMENT_PENDING,
-                    "max_players": 0,
-                    "multiplayer": False,
-                    "rating": 0,
-                    "enriched_at": None,
-                }
-            )
+            row = {
+                **stub,
+                "enrichment_status": ENRICHMENT_PENDING,
+                "max_players": 0,
+                "multiplayer": False,
+                "rating": 0,
+                "enriched_at": None,
+            }
+            repo.put_game(row)
+            written.append(row)
             to_enrich.append(stub["release_key"])
         else:
-            # Keep IGDB fields; refresh the GOG-derived ones in case of changes.
-            repo.put_game(
-                {
-                    **existing,
-                    "title": stub["title"],
-                    "slug": stub["slug"],
-                    "igdb_key": stub["igdb_key"],
-                    "platform": stub["platform"],
-                }
-            )
+            # Keep IGDB fields; refresh the GOG-derived ones if they changed.
+            refreshed = {**existing, **{k: stub[k] for k in STUB_FIELDS}}
+            if refreshed != existing:
+                repo.put_game(refreshed)
+                written.append(refreshed)
+                moved_from.add(existing.get("slug", ""))
             if existing.get("enrichment_status") == ENRICHMENT_PENDING:
                 to_enrich.append(stub["release_key"])
+    sync_entities(repo, moved_from | {row.get("slug", "") for row in written}, written)
 
     job_id = create_enrichment_job(repo, queue, to_enrich)
     log.info(
-        "Ingested user %s: %d library entries, %d new games to enrich",
+        "Ingested user %s: %d library entries (%d added, %d removed, "
+        "%d install changes), %d new games to enrich",
         parsed.user_id,
         len(entries),
+        len(changes.added),
+        len(changes.removed),
+        len(changes.install_changed),
         len(to_enrich),
     )
     return parsed.user_id, job_id
@@ -21,6 +21,7 @@
     JOB_COMPLETED,
     JOB_RUNNING,
 )
+from gamatrix.games.entities import sync_entities
 from gamatrix.helpers import now_iso
 from gamatrix.igdb.client import GameMetadata, IGDBClient
 from gamatrix.storage.dynamo import Repository
@@ -39,6 +40,11 @@ async def run_job(
     if job is None:
         log.error("Enrichment job %s not found", job_id)
         return
+    if "release_keys" not in job:
+        # Finished and compacted (see `compact_finished_jobs`); a redelivered
+        # chunk has nothing left to do and must not reopen the job.
+        log.info("Enrichment job %s already finished; skipping", job_id)
+        return
 
     repo.update_job(job_id, {"status": JOB_RUNNING, "updated_at": now_iso()})
     release_keys: list[str] = job.get("release_keys", [])
@@ -71,6 +77,7 @@ async def run_job(
     completed = len(keys) - to_enrich
     progress = repo.set_chunk_progress(job_id, chunk_id, completed)
 
+    written: list[dict] = []
     if by_igdb_key:
         client_id, client_secret = resolve_igdb_credentials(settings)
         # Parallel enricher invocations each pace themselves, so scale the delay
@@ -87,17 +94,20 @@ async def run_job(
                     log.exception("Failed to enrich %s (%s)", igdb_key, title)
                     meta = GameMetadata()
                 for rk in rks:
-                    _write_metadata(repo, games[rk], meta)
+                    written.append(_write_metadata(repo, games[rk], meta))
                     completed += 1
                 # Absolute per-chunk progress: a redelivered or concurrent run
                 # of this chunk converges here instead of pushing the count past
                 # `total` (see #131).
                 progress = repo.set_chunk_progress(job_id, chunk_id, completed)
 
+    # Refresh the merged game entities once per chunk rather than per game.
+    sync_entities(repo, {game.get("slug", "") for game in written}, written)
+
     # The chunk that accounts for the final outstanding keys closes the job.
     # Idempotent: re-completing an already-completed job is harmless.
     if sum(progress.values()) >= total:
-        repo.update_job(job_id, {"status": JOB_COMPLETED, "completed_at": now_iso()})
+        repo.finish_job(job_id, JOB_COMPLETED)
         log.info("Enrichment job %s completed (%d games)", job_id, total)
     else:
         log.info(
@@ -105,18 +115,18 @@ async def run_job(
         )
 
 
-def _write_metadata(repo: Repository, game: dict, meta: GameMetadata) -> None:
+def _write_metadata(repo: Repository, game: dict, meta: GameMetadata) -> dict:
     status = ENRICHMENT_DONE if meta.found else ENRICHMENT_NOT_FOUND
-    repo.put_game(
-        {
-            **game,
-            "igdb_id": meta.igdb_id,
-            "game_modes": meta.game_modes,
-            "max_players": meta.max_players,
-            "multiplayer": meta.multiplayer,
-            "rating": meta.rating,
-            "rating_count": meta.rating_count,
-            "enrichment_status": status,
-            "enriched_at": now_iso(),
-        }
-    )
+    row = {
+        **game,
+        "igdb_id": meta.igdb_id,
+        "game_modes": meta.game_modes,
+        "max_players": meta.max_players,
+        "multiplayer": meta.multiplayer,
+        "rating": meta.rating,
+        "rating_count": meta.rating_count,
+        "enrichment_status": status,
+        "enriched_at": now_iso(),
+    }
+    repo.put_game(row)
+    return row
@@ -32,7 +32,8 @@ class JobRecord(TypedDict):
     status: str
     created_at: str
     completed_at: str | None
-    release_keys: list[str]
+    # Dropped when the job finishes if `compact_finished_jobs` is on.
+    release_keys: NotRequired[list[str]]
     total: int
     completed_count: int
     # Absolute progress per chunk (`{chunk_id: count}`); `completed_count` is
@@ -40,6 +41,10 @@ class JobRecord(TypedDict):
     # clobber each other. Empty until the first chunk records progress.
     chunk_progress: NotRequired[dict[str, int]]
     updated_at: NotRequired[str]
+    # Mirrors `status` while the job is pending or running, and is removed once
+    # it ends, so only active jobs appear in the sparse active_status-index.
+    # Maintained by the Repository; callers never set it.
+    active_status: NotRequired[str]
 
 
 def is_job_active(job: JobRecord) -> bool:
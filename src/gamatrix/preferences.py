@@ -7,7 +7,12 @@
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import HTMLResponse, JSONResponse, Response
 
-from gamatrix.auth.dependencies import current_user, current_user_api, get_repo
+from gamatrix.auth.dependencies import (
+    current_user,
+    current_user_api,
+    get_async_repo,
+    get_repo,
+)
 from gamatrix.constants import (
     DISPLAY_NAME_MAX_LENGTH,
     PLATFORMS,
@@ -16,6 +21,7 @@
 from gamatrix.games.preferences import DISPLAY_MODES, merge_preferences
 from gamatrix.helpers import pic_url
 from gamatrix.images import process_profile_pic
+from gamatrix.storage.aio import AsyncRepository
 from gamatrix.storage.dynamo import Repository
 from gamatrix.templating import authenticated_template
 
@@ -44,7 +50,7 @@ def preferences_form(
     user: dict = Depends(current_user),
     repo: Repository = Depends(get_repo),
 ):
-    users = {str(u["user_id"]): u for u in repo.scan_users() if u.get("user_id")}
+    users = repo.users_by_user_id()
     return authenticated_template(
         request,
         "preferences.html.jinja",
@@ -60,7 +66,7 @@ def preferences_form(
 async def save_preferences(
     request: Request,
     user: dict = Depends(current_user_api),
-    repo: Repository = Depends(get_repo),
+    arepo: AsyncRepository = Depends(get_async_repo),
 ):
     """Persist preferences. Accepts form posts from the prefs page or the
     auto-save on the filter bar."""
@@ -94,7 +100,7 @@ def flag(name: str) -> bool:
         "selected_users": selected if selected else "all",
         "display_mode": display_mode,
     }
-    repo.update_user(user["email"], {"preferences": prefs})
+    await arepo.update_user(user["email"], {"preferences": prefs})
     return Response(status_code=204)
 
 
@@ -102,7 +108,7 @@ def flag(name: str) -> bool:
 async def save_profile(
     request: Request,
     user: dict = Depends(current_user_api),
-    repo: Repository = Depends(get_repo),
+    arepo: AsyncRepository = Depends(get_async_repo),
 ):
     """Update the signed-in user's display name."""
     form = await request.form()
@@ -110,7 +116,7 @@ async def save_profile(
         name = clean_display_name(str(form.get("username", "")))
     except ValueError as exc:
         return JSONResponse({"error": str(exc)}, status_code=400)
-    repo.update_user(user["email"], {"username": name})
+    await arepo.update_user(user["email"], {"username": name})
     return JSONResponse({"username": name})
 
 
@@ -132,7 +138,7 @@ async def _read_body_capped(request: Request, limit: int) -> bytes | None:
 async def upload_profile_pic(
     request: Request,
     user: dict = Depends(current_user_api),
-    repo: Repository = Depends(get_repo),
+    arepo: AsyncRepository = Depends(get_async_repo),
 ):
     """Accept a raw image body, resize it, and store it as the user's pic.
 
@@ -151,9 +157,9 @@ async def upload_profile_pic(
         return JSONResponse({"error": str(exc)}, status_code=400)
 
     user_id = str(user["user_id"])
-    repo.put_profile_pic(user_id, png)
+    await arepo.run(arepo.repo.put_profile_pic, user_id, png)
     updated = int(time.time())
-    repo.update_user(user["email"], {"pic_updated": updated})
+    await arepo.update_user(user["email"], {"pic_updated": updated})
     url = pic_url({**user, "pic_updated": updated})
     return JSONResponse({"pic_url": url})
 
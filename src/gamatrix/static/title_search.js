@@ -0,0 +1,59 @@
+// Typeahead for the games page title search.
+//
+// As the user types, fetch matching titles from /api/games/search and offer
+// them through the input's <datalist>. The filter form itself re-runs the
+// comparison (HTMX, debounced keyup on the same input), so this only fills in
+// suggestions. Responses that arrive after a newer keystroke are dropped.
+(function () {
+    "use strict";
+
+    const DEBOUNCE_MS = 200;
+    let timer = null;
+    let latest = 0;
+
+    function render(list, results) {
+        list.replaceChildren(
+            ...results.map(function (match) {
+                const option = document.createElement("option");
+                option.value = match.title;
+                return option;
+            })
+        );
+    }
+
+    function lookup(input, list) {
+        const q = input.value.trim();
+        const request = ++latest;
+        if (!q) {
+            render(list, []);
+            return;
+        }
+        fetch("/api/games/search?limit=10&q=" + encodeURIComponent(q), {
+            credentials: "same-origin",
+        })
+            .then(function (response) {
+                return response.ok ? response.json() : { results: [] };
+            })
+            .then(function (payload) {
+                if (request === latest) {
+                    render(list, payload.results);
+                }
+            })
+            .catch(function () {});
+    }
+
+    document.addEventListener("input", function (event) {
+        const input = event.target;
+        if (input.id !== "title-search") {
+            return;
+        }
+        const list = document.getElementById(input.getAttribute("list"));
+        if (!list) {
+            return;
+        }
+        clearTimeout(timer);
+        timer = setTimeout(function () {
+            lookup(input, list);
+        }, DEBOUNCE_MS);
+    });
+})();
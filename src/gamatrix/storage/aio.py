@@ -0,0 +1,73 @@
+"""Awaitable Repository access for async routes.
+
+boto3 blocks, and no async-native DynamoDB client is among our dependencies,
+so `AsyncRepository` runs Repository calls on a dedicated thread pool of
+`repository_workers` threads. Routes awaiting DynamoDB then hold neither the
+event loop nor a slot in Starlette's shared threadpool (40 threads), which a
+burst of comparison requests would otherwise exhaust, queueing even requests
+that never touch DynamoDB. Independent reads can be awaited together (see
+`prefetch_read_model`).
+
+Calls go to the same Repository, so they share its read cache.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Iterable, TypeVar
+
+from gamatrix.config import get_settings
+from gamatrix.storage.dynamo import Repository
+
+if TYPE_CHECKING:
+    from gamatrix.jobs import JobRecord
+
+T = TypeVar("T")
+
+
+@functools.lru_cache
+def _executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=get_settings().repository_workers,
+        thread_name_prefix="repository",
+    )
+
+
+class AsyncRepository:
+    def __init__(
+        self, repo: Repository, executor: ThreadPoolExecutor | None = None
+    ) -> None:
+        self.repo = repo
+        self._executor = executor or _executor()
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking call (a Repository method, or a service function
+        taking `self.repo`) on the repository pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    async def scan_users(self) -> list[dict]:
+        return await self.run(self.repo.scan_users)
+
+    async def get_job(self, job_id: str) -> JobRecord | None:
+        return await self.run(self.repo.get_job, job_id)
+
+    async def update_user(self, email: str, attrs: dict) -> None:
+        await self.run(self.repo.update_user, email, attrs)
+
+    async def prefetch_read_model(self, user_ids: Iterable[str]) -> None:
+        """Load the comparison read model for these users' libraries, with
+        every table read in flight at once, so a comparison run right after
+        is served from the read cache instead of reading them one by one."""
+        repo = self.repo
+        await asyncio.gather(
+            self.run(repo.scan_users),
+            self.run(repo.get_all_games_map),
+            self.run(repo.get_all_metadata),
+            self.run(repo.get_all_entities),
+            *(self.run(repo.get_user_library, user_id) for user_id in set(user_ids)),
+        )
@@ -0,0 +1,455 @@
+"""The Repository's read-model cache: an in-process tier and a shared one.
+
+Every process keeps its own in-memory copy of the comparison read-model in a
+`ReadCache`: TTL entries evicted least-recently-used first once their
+approximate size exceeds a byte budget, with hit/miss/eviction/load-time
+counters per key family ("games_map", "library", ...) for sizing that budget.
+
+On its own that means each web worker, Lambda and local worker scans the games
+table once per TTL. A shared tier sits behind the in-process one: a process
+that misses locally first looks there, and only the first process to miss in a
+TTL window reads DynamoDB and publishes the result.
+
+Backends store opaque bytes with a TTL:
+
+- `RedisCache`: any server speaking the Redis protocol (Redis, Valkey,
+  ElastiCache), through redis-py; install the `redis` extra to use it.
+- `SQLiteCache`: a file shared by processes on one host. The local stand-in
+  for development (docker-compose mounts one file into the app and worker) and
+  tests.
+
+Publishes are guarded by a per-key generation that every invalidation bumps.
+A process reads the generation before it loads a value from DynamoDB and
+publishes only if it is unchanged, so a load that started before another
+process's write can't put its (now stale) result back after that write
+invalidated the key.
+
+The shared tier is best-effort: a backend that errors is logged and treated as
+a miss, and the Repository falls back to reading DynamoDB.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import logging
+import math
+import os
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Any, Callable, NamedTuple, Protocol
+from urllib.parse import urlsplit
+
+from gamatrix.config import Settings
+
+log = logging.getLogger(__name__)
+
+# Entries are a big-endian wall-clock expiry followed by zlib-compressed JSON,
+# so a reader can give its local copy the same remaining lifetime.
+_HEADER = struct.Struct("!d")
+# zlib level 1: the games map compresses ~10x at a fraction of level 6's cost.
+_COMPRESSION_LEVEL = 1
+# Items measured per container by `approximate_size`; the rest are assumed to
+# be the same size on average.
+_SIZE_SAMPLE = 32
+
+
+def approximate_size(value: Any) -> int:
+    """Approximate memory footprint of a read-model value in bytes.
+
+    Sums `sys.getsizeof` over the value and what it contains, measuring a
+    sample of each large container's items and extrapolating, so sizing the
+    whole games map costs about as much as sizing a few hundred rows. Objects
+    shared between entries (interned strings, small ints) are counted again.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        sample = [
+            approximate_size(k) + approximate_size(v)
+            for k, v in itertools.islice(value.items(), _SIZE_SAMPLE)
+        ]
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        sample = [approximate_size(v) for v in itertools.islice(value, _SIZE_SAMPLE)]
+    else:
+        return size
+    if sample:
+        size += sum(sample) * len(value) // len(sample)
+    return size
+
+
+def family(key: str) -> str:
+    """Key family the counters are kept under: "library:42" -> "library"."""
+    return key.split(":", 1)[0]
+
+
+@dataclass
+class FamilyStats:
+    hits: int = 0
+    misses: int = 0
+    # Loads from DynamoDB, and from the shared tier, on a local miss or refresh.
+    loads: int = 0
+    load_seconds: float = 0.0
+    shared_hits: int = 0
+    # Expired values served while a background refresh reloads them, and the
+    # refreshes started.
+    stale_hits: int = 0
+    refreshes: int = 0
+    # Entries dropped for the byte budget (including ones too big to keep).
+    evictions: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+
+class _Entry(NamedTuple):
+    expires_at: float  # time.monotonic()
+    value: Any
+    size: int
+
+
+class ReadCache:
+    """Thread-safe in-process tier: TTL entries, least recently used evicted
+    first while the total approximate size exceeds `max_bytes`.
+
+    `max_bytes` 0 means unbounded (TTL expiry only). An entry bigger than the
+    whole budget is not kept at all. An expired entry is a miss but stays
+    (see `peek`) until it is replaced or evicted.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._stats: dict[str, FamilyStats] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        found = self.lookup(key)
+        return None if found is None else found[0]
+
+    def lookup(self, key: str, max_stale: float = 0.0) -> tuple[Any, bool] | None:
+        """(value, whether it has expired) for `key`, or None on a miss.
+
+        An expired value is still returned up to `max_stale` seconds past its
+        TTL, for the caller to serve while it refreshes the entry.
+        """
+        with self._lock:
+            stats = self._family(key)
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if entry is not None and now >= entry.expires_at + max_stale:
+                entry = None
+            if entry is None:
+                stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            stale = now >= entry.expires_at
+            if stale:
+                stats.stale_hits += 1
+            else:
+                stats.hits += 1
+            return entry.value, stale
+
+    def put(self, key: str, value: Any, ttl: float) -> None:
+        size = approximate_size(value)
+        with self._lock:
+            self._remove(key)
+            if self.max_bytes and size > self.max_bytes:
+                self._family(key).evictions += 1
+                return
+            self._entries[key] = _Entry(time.monotonic() + ttl, value, size)
+            stats = self._family(key)
+            stats.entries += 1
+            stats.bytes += size
+            self.bytes += size
+            if self.max_bytes and self.bytes > self.max_bytes:
+                self._evict()
+
+    def peek(self, key: str) -> Any | None:
+        """The value `key` holds, even if expired. Not counted as a hit and
+        doesn't make the entry recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+        return None if entry is None else entry.value
+
+    def expire(self, key: str) -> None:
+        """Make `key` a miss from now on, even for stale reads."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = entry._replace(expires_at=-math.inf)
+
+    def record_load(
+        self, key: str, seconds: float, shared: bool = False, refresh: bool = False
+    ) -> None:
+        """Count a load of `key` (from the shared tier if `shared`, in the
+        background if `refresh`) and the time it took."""
+        with self._lock:
+            stats = self._family(key)
+            if refresh:
+                stats.refreshes += 1
+            stats.loads += 1
+            stats.load_seconds += seconds
+            if shared:
+                stats.shared_hits += 1
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            return {name: asdict(stats) for name, stats in sorted(self._stats.items())}
+
+    def _family(self, key: str) -> FamilyStats:
+        name = family(key)
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = FamilyStats()
+        return stats
+
+    def _remove(self, key: str) -> _Entry | None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            stats = self._family(key)
+            stats.entries -= 1
+            stats.bytes -= entry.size
+            self.bytes -= entry.size
+        return entry
+
+    def _evict(self) -> None:
+        # Expired entries go first: they're dead weight nobody has re-read.
+        now = time.monotonic()
+        for key in [k for k, e in self._entries.items() if e.expires_at <= now]:
+            self._remove(key)
+        while self.bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self._family(key).evictions += 1
+
+
+class SharedCache(Protocol):
+    def get(self, key: str) -> bytes | None: ...
+
+    def generation(self, key: str) -> int | None:
+        """The key's current generation (0 if never invalidated), or None if
+        the backend can't be reached."""
+
+    def set(self, key: str, value: bytes, ttl: float, generation: int) -> None:
+        """Store `value`, unless the key's generation has moved past
+        `generation` (it was invalidated since the caller read it)."""
+
+    def delete(self, key: str) -> None:
+        """Drop the key's value and bump its generation."""
+
+
+def _generation_key(key: str) -> str:
+    return f"{key}#gen"
+
+
+def encode_entry(value: Any, expires_at: float) -> bytes | None:
+    """Serialize a read-model value for the shared tier, or None if it isn't
+    JSON-serializable (it is then only cached in-process)."""
+    try:
+        payload = json.dumps(value, separators=(",", ":")).encode()
+    except (TypeError, ValueError):
+        return None
+    return _HEADER.pack(expires_at) + zlib.compress(payload, _COMPRESSION_LEVEL)
+
+
+def decode_entry(data: bytes) -> tuple[float, Any] | None:
+    """(wall-clock expiry, value) of an encoded entry, or None if corrupt."""
+    try:
+        (expires_at,) = _HEADER.unpack_from(data)
+        return expires_at, json.loads(zlib.decompress(data[_HEADER.size :]))
+    except (struct.error, zlib.error, ValueError):
+        return None
+
+
+class SQLiteCache:
+    """Shared cache in a SQLite file (one host, any number of processes)."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        # WAL lets readers in other processes proceed while one writes.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS read_cache "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS read_cache_generations "
+            "(key TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+        )
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value FROM read_cache WHERE key = ? AND expires_at > ?",
+                    (key, time.time()),
+                ).fetchone()
+        except sqlite3.Error as exc:
+            log.warning("Shared cache read of %s failed: %s", key, exc)
+            return None
+        return bytes(row[0]) if row else None
+
+    def generation(self, key: str) -> int | None:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT generation FROM read_cache_generations WHERE key = ?",
+                    (key,),
+                ).fetchone()
+        except sqlite3.Error as exc:
+            log.warning("Shared cache read of %s failed: %s", key, exc)
+            return None
+        return row[0] if row else 0
+
+    def set(self, key: str, value: bytes, ttl: float, generation: int) -> None:
+        now = time.time()
+        try:
+            with self._lock:
+                # One statement, so the generation check and the write are
+                # atomic against other processes' invalidations.
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO read_cache SELECT ?, ?, ? "
+                    "WHERE COALESCE((SELECT generation FROM read_cache_generations"
+                    " WHERE key = ?), 0) = ?",
+                    (key, value, now + ttl, key, generation),
+                )
+                # Expired rows are otherwise only ever overwritten.
+                self._conn.execute(
+                    "DELETE FROM read_cache WHERE expires_at <= ?", (now,)
+                )
+        except sqlite3.Error as exc:
+            log.warning("Shared cache write of %s failed: %s", key, exc)
+
+    def delete(self, key: str) -> None:
+        try:
+            with self._lock:
+                # Generation first: from here on, loads that started before
+                # this write can no longer publish.
+                self._conn.execute(
+                    "INSERT INTO read_cache_generations VALUES (?, 1) "
+                    "ON CONFLICT(key) DO UPDATE SET generation = generation + 1",
+                    (key,),
+                )
+                self._conn.execute("DELETE FROM read_cache WHERE key = ?", (key,))
+        except sqlite3.Error as exc:
+            log.warning("Shared cache delete of %s failed: %s", key, exc)
+
+
+# Publishes a value only if the key's generation is still the one the
+# publisher read before loading it (see `SharedCache.set`).
+_SET_IF_GENERATION = """
+if (redis.call('GET', KEYS[1]) or '0') == ARGV[1] then
+    redis.call('SET', KEYS[2], ARGV[2], 'PX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+class RedisCache:
+    """Shared cache on a Redis-protocol server, through redis-py (the `redis`
+    extra).
+
+    `url` is redis://[[user]:password@]host[:port][/db], or rediss:// for TLS.
+    Each key's generation lives in a "<key>#gen" counter with no TTL. After a
+    failure the cache reports misses for `RETRY_DELAY` seconds before trying
+    the server again, so an unreachable server costs one timeout rather than
+    one per read.
+    """
+
+    RETRY_DELAY = 5.0
+
+    def __init__(self, url: str, timeout: float = 1.0) -> None:
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImportError(
+                "The redis read cache needs the redis extra: "
+                "pip install 'gamatrix[redis]'"
+            ) from exc
+        if urlsplit(url).scheme not in ("redis", "rediss"):
+            raise ValueError(f"Unsupported read cache URL: {url!r}")
+        self._errors: tuple[type[Exception], ...] = (redis.RedisError, OSError)
+        self._client = redis.Redis.from_url(
+            url, socket_timeout=timeout, socket_connect_timeout=timeout
+        )
+        self._set_if_generation = self._client.register_script(_SET_IF_GENERATION)
+        self._retry_at = 0.0
+
+    def get(self, key: str) -> bytes | None:
+        return self._call("GET", lambda: self._client.get(key))
+
+    def generation(self, key: str) -> int | None:
+        value = self._call("GET", lambda: self._client.get(_generation_key(key)))
+        if value is None:
+            return None if self._failing() else 0
+        return int(value)
+
+    def set(self, key: str, value: bytes, ttl: float, generation: int) -> None:
+        px = max(1, int(ttl * 1000))
+        self._call(
+            "SET",
+            lambda: self._set_if_generation(
+                keys=[_generation_key(key), key], args=[generation, value, px]
+            ),
+        )
+
+    def delete(self, key: str) -> None:
+        def bump() -> None:
+            # Generation first: from here on, loads that started before this
+            # write can no longer publish.
+            pipe = self._client.pipeline(transaction=True)
+            pipe.incr(_generation_key(key))
+            pipe.delete(key)
+            pipe.execute()
+
+        self._call("DEL", bump)
+
+    def _failing(self) -> bool:
+        return time.monotonic() < self._retry_at
+
+    def _call(self, command: str, run: Callable[[], Any]) -> Any:
+        if self._failing():
+            return None
+        try:
+            return run()
+        except self._errors as exc:
+            log.warning("Shared cache %s failed: %s", command, exc)
+            self._retry_at = time.monotonic() + self.RETRY_DELAY
+            return None
+
+
+def shared_cache(settings: Settings) -> SharedCache | None:
+    """The shared cache tier configured by `settings`, or None for
+    in-process only."""
+    backend = settings.read_cache_backend
+    if backend == "local" or settings.read_cache_ttl_seconds <= 0:
+        return None
+    return _open(backend, settings.read_cache_url)
+
+
+@lru_cache(maxsize=None)
+def _open(backend: str, url: str | None) -> SharedCache:
+    # One backend (file handle / connection) per process, however many
+    # Repository instances share it.
+    if backend == "sqlite":
+        return SQLiteCache(
+            url or os.path.join(tempfile.gettempdir(), "gamatrix-read-cache.sqlite3")
+        )
+    if backend == "redis":
+        if not url:
+            raise ValueError("READ_CACHE_URL must be set for the redis read cache")
+        return RedisCache(url)
+    raise ValueError(f"Unknown read cache backend: {backend!r}")
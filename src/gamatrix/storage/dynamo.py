@@ -8,15 +8,36 @@
 from __future__ import annotations
 
 import decimal
+import itertools
+import logging
+import random
+import threading
 import time
-from typing import TYPE_CHECKING, Any, Iterable, cast
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Callable, Iterable, cast
 
 import boto3
 from boto3.dynamodb.conditions import Key
+from botocore.config import Config
+from botocore.exceptions import ClientError
 
 from gamatrix.config import Settings, get_settings
-from gamatrix.constants import ENRICHMENT_PENDING
-from gamatrix.helpers import now_iso
+from gamatrix.constants import ENRICHMENT_PENDING, JOB_PENDING, JOB_RUNNING
+from gamatrix.helpers import now_iso, parse_iso
+from gamatrix.storage import interning, library
+from gamatrix.storage.cache import (
+    ReadCache,
+    decode_entry,
+    encode_entry,
+    family,
+    shared_cache,
+)
+from gamatrix.storage.interning import InternedGame
+from gamatrix.storage.ownership import LibraryDelta, OwnershipIndex, diff_library
+
+log = logging.getLogger(__name__)
 
 if TYPE_CHECKING:
     # Annotation-only; importing at runtime would cycle (jobs imports Repository).
@@ -46,6 +67,125 @@ def _from_dynamo(value: Any) -> Any:
     return value
 
 
+def _projection(fields: Iterable[str]) -> dict[str, Any]:
+    """ProjectionExpression kwargs fetching just `fields`. Every name goes
+    through a placeholder, so reserved words (e.g. "name") are safe."""
+    names = {f"#p{i}": field for i, field in enumerate(fields)}
+    return {
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names,
+    }
+
+
+def _project(row: dict, fields: Iterable[str]) -> dict:
+    return {field: row[field] for field in fields if field in row}
+
+
+# Game columns the comparison reads (catalog, items, title search, and the old
+# slug of a rewritten game). The cached games map holds only these, so fields
+# like enriched_at, igdb_id or summary are never transferred or cached for it.
+COMPARISON_GAME_FIELDS = (
+    "release_key",
+    "title",
+    "slug",
+    "igdb_key",
+    "platform",
+    "max_players",
+    "multiplayer",
+    "rating",
+    "rating_count",
+    "game_modes",
+    "enrichment_status",
+)
+# Library columns the ownership index and library diffs read.
+LIBRARY_FIELDS = ("user_id", "release_key", "installed")
+
+
+# BatchGetItem caps at 100 keys per request. Unprocessed keys are retried up to
+# this many attempts in all, backing off exponentially (with full jitter).
+_BATCH_GET_SIZE = 100
+_BATCH_GET_ATTEMPTS = 8
+_BATCH_GET_BASE_DELAY = 0.05
+_BATCH_GET_MAX_DELAY = 2.0
+
+
+# Reads of a packed library that raced a rewrite (mixed shard generations)
+# are retried this many times in all.
+_PACKED_READ_ATTEMPTS = 3
+
+
+def _complete(shards: list[dict]) -> bool:
+    """Whether a packed library's shards are all from the same write."""
+    generations = {shard["generation"] for shard in shards}
+    return len(generations) == 1 and shards[0]["shards"] == len(shards)
+
+
+def _binary(value: Any) -> bytes:
+    # boto3 wraps binary attributes in `Binary`.
+    return bytes(getattr(value, "value", value))
+
+
+# Job statuses kept in the active_status-index (see `put_job`).
+_ACTIVE_JOB_STATUSES = (JOB_PENDING, JOB_RUNNING)
+
+
+class UnprocessedKeysError(RuntimeError):
+    """BatchGetItem kept returning keys unprocessed through every retry."""
+
+
+# Generation stamps for read-model cache entries. Process-wide, so a stamp is
+# never reused by another entry or another Repository instance.
+_generations = itertools.count(1)
+# How many logged read-model changes to keep for patching cached results.
+_MAX_CHANGES = 4096
+# Background refreshes of expired read-model entries run at once; only the
+# games map and users scan are revalidated, so more would sit idle.
+_REFRESH_WORKERS = 2
+
+
+def _changed_slugs(
+    key: str, before: Any, after: Any, games: dict[str, dict] | None
+) -> set[str] | None:
+    """Slugs whose comparison rows may differ between two values of cache
+    entry `key`, or None if any row may. Library release keys are mapped to
+    slugs through `games` (the cached games map); keys it has no row for have
+    no comparison rows yet."""
+    if before is after:
+        return set()
+    name = family(key)
+    if name == "library":
+        if games is None:
+            return None
+        changed = diff_library(before, after).release_keys
+        return {games[rk].get("slug", "") for rk in changed if rk in games}
+    if name == "users":
+        # Comparisons only read user ids from the users table.
+        def user_ids(users: list[dict]) -> dict[str, Any]:
+            return {u["email"]: u.get("user_id") for u in users}
+
+        return set() if user_ids(before) == user_ids(after) else None
+    if name in ("games_map", "metadata", "entities"):
+        # Maps of rows that each carry their slug; a rewritten game counts
+        # under its old slug and its new one.
+        slugs: set[str] = set()
+        for map_key in before.keys() | after.keys():
+            old, new = before.get(map_key), after.get(map_key)
+            if old != new:
+                slugs.update(row.get("slug", "") for row in (old, new) if row)
+        return slugs
+    return None
+
+
+def _max_pool_connections(settings: Settings) -> int:
+    """HTTP connections the DynamoDB client keeps: one per thread that can
+    call it at once (botocore's default of 10 would queue the rest)."""
+    return (
+        settings.repository_workers
+        + settings.scan_segments
+        + settings.batch_get_concurrency
+    )
+
+
 class Repository:
     def __init__(self, settings: Settings | None = None):
         self.settings = settings or get_settings()
@@ -53,12 +193,57 @@ def __init__(self, settings: Settings | None = None):
             "dynamodb",
             region_name=self.settings.aws_region,
             endpoint_url=self.settings.dynamodb_endpoint_url,
+            config=Config(max_pool_connections=_max_pool_connections(self.settings)),
         )
+        # The resource's low-level client. Unlike the resource (and its Table
+        # objects) it is thread-safe, so anything that may run on a worker
+        # thread (AsyncRepository.run, parallel scans and batch reads) reads
+        # through it.
+        self._client = self._resource.meta.client
         # Short-TTL cache for the comparison read-model so repeated filter/sort
         # requests reuse one set of reads. Entries are keyed by name; per-user
         # libraries use "library:<user_id>". Writes invalidate the affected key
-        # so the cache never serves data this process itself just changed.
-        self._cache: dict[str, tuple[float, Any]] = {}
+        # (library writes store the new rows instead) so the cache never serves
+        # data this process itself just changed. Bounded by
+        # `read_cache_max_bytes`, least recently used entries evicted first;
+        # an invalidated or expired entry is kept until then, as the value its
+        # reload is diffed against (see `_changes`).
+        self._cache = ReadCache(self.settings.read_cache_max_bytes)
+        # Optional cross-process tier behind it (see cache.py): a local miss
+        # reads a peer's copy before falling back to DynamoDB, so a hot entry
+        # like the games map is scanned once per fleet rather than per process.
+        self._shared = shared_cache(self.settings)
+        # Owner/installed bitmasks over the cached libraries (see ownership.py).
+        # Re-synced from the library cache on read and patched on library writes.
+        self._ownership = OwnershipIndex()
+        # Views derived from a cached entry (e.g. the games map re-keyed by
+        # interned id), stored with the source object they were built from.
+        self._derived: dict[str, tuple[Any, Any]] = {}
+        # Generation each cache key was last stored or invalidated at, so
+        # results computed from the read model can be stamped with its version.
+        self._versions: dict[str, int] = {}
+        # Generation of the value each key holds in `_cache` (live or not).
+        self._stored: dict[str, int] = {}
+        # Changes to the read model, logged as generation -> (generation of the
+        # value it replaced, slugs whose comparison rows differ between the
+        # two), so cached results can be patched instead of rebuilt (see
+        # `changed_slugs`). Found by diffing each stored value against the one
+        # it replaces rather than from this process's writes, so they cover
+        # writes by any process (libraries are ingested by the db_parser
+        # Lambda) once an expiry or invalidation reloads the entry.
+        self._changes: dict[int, tuple[int, frozenset[str]]] = {}
+        # Keys being reloaded in the background (see `_cache_load`), and the
+        # pool that reloads them. Its few threads are started on demand and
+        # joined at interpreter exit, so a refresh is never cut off midway.
+        self._refreshing: set[str] = set()
+        self._refresher = ThreadPoolExecutor(
+            max_workers=_REFRESH_WORKERS, thread_name_prefix="cache-refresh"
+        )
+        # Guards the generation bookkeeping above (`_versions`, `_stored`,
+        # `_changes`, `_refreshing`), which concurrent requests on worker
+        # threads update together with the cache entries they describe. It
+        # also orders a load's store against invalidations of the same key.
+        self._lock = threading.Lock()
 
     def _table(self, name: str):
         return self._resource.Table(name)
@@ -67,24 +252,229 @@ def _table(self, name: str):
     # read-model cache
     # ------------------------------------------------------------------
     def _cache_get(self, key: str) -> Any | None:
-        entry = self._cache.get(key)
-        if entry is None:
-            return None
-        expires_at, value = entry
-        if time.monotonic() >= expires_at:
-            self._cache.pop(key, None)
+        return self._cache.get(key)
+
+    def _cache_load(
+        self, key: str, load: Callable[[], Any], revalidate: bool = False
+    ) -> Any:
+        """Cached value of `key`: from this process, else from the shared
+        tier, else `load()` (a DynamoDB read) stored in both.
+
+        With `revalidate`, an expired value is still served for up to
+        `read_cache_max_stale_seconds` while a refresh on `_refresher` reloads
+        it, so only a read past that cap waits for the load. Not in Lambda,
+        whose sandbox is frozen once the response is sent: there the read that
+        finds the value expired reloads it inline.
+        """
+        max_stale = 0.0
+        if revalidate and not self.settings.aws_lambda_function_name:
+            max_stale = self.settings.read_cache_max_stale_seconds
+        found = self._cache.lookup(key, max_stale)
+        if found is not None:
+            value, stale = found
+            if stale:
+                self._revalidate(key, load)
+            return value
+        with self._lock:
+            version = self._versions.get(key, 0)
+        value, expires_at, generation = self._fetch(key, load)
+        return self._cache_put(
+            key, value, expires_at=expires_at, generation=generation, version=version
+        )
+
+    def _fetch(
+        self, key: str, load: Callable[[], Any], refresh: bool = False
+    ) -> tuple[Any, float | None, int | None]:
+        """(value, shared-tier expiry, None) of `key` from the shared tier, or
+        (`load()`, None, shared-tier generation read before loading) when it
+        has no copy."""
+        started = time.perf_counter()
+        generation = None
+        if self._shared is not None:
+            data = self._shared.get(self._shared_key(key))
+            entry = decode_entry(data) if data is not None else None
+            if entry is not None:
+                expires_at, value = entry
+                self._cache.record_load(
+                    key, time.perf_counter() - started, shared=True, refresh=refresh
+                )
+                return value, expires_at, None
+            generation = self._shared.generation(self._shared_key(key))
+        value = load()
+        self._cache.record_load(key, time.perf_counter() - started, refresh=refresh)
+        return value, None, generation
+
+    def _revalidate(self, key: str, load: Callable[[], Any]) -> None:
+        """Start a background reload of `key`, unless one is running."""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            version = self._versions.get(key, 0)
+        self._refresher.submit(self._refresh, key, load, version)
+
+    def _refresh(self, key: str, load: Callable[[], Any], version: int) -> None:
+        try:
+            value, expires_at, generation = self._fetch(key, load, refresh=True)
+            self._cache_put(
+                key,
+                value,
+                expires_at=expires_at,
+                generation=generation,
+                version=version,
+            )
+        except Exception:
+            # The stale value stays until the max-staleness cap, after which a
+            # read reloads inline (and surfaces the error).
+            log.exception("Background refresh of %s failed", key)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _shared_key(self, key: str) -> str:
+        # Deployments (and test runs) sharing one server don't see each other.
+        return f"{self.settings.table_prefix}:{key}"
+
+    def _shared_generation(self, key: str) -> int | None:
+        """The shared tier's generation of `key`; read before loading (or
+        writing) a value, it is what `_cache_put` publishes against."""
+        if self._shared is None:
             return None
-        return value
+        return self._shared.generation(self._shared_key(key))
 
-    def _cache_put(self, key: str, value: Any) -> Any:
+    def _cache_put(
+        self,
+        key: str,
+        value: Any,
+        expires_at: float | None = None,
+        generation: int | None = None,
+        version: int | None = None,
+    ) -> Any:
+        """Store `value` under `key` and give it a new generation, logging
+        how it differs from the value held before (see `_changes`).
+
+        A load passes the key's `version` (0 if never stamped) from before it
+        read: if the key was stored or invalidated since, what that has is at
+        least as new, so the loaded value is returned without being stored.
+        The value is published to the shared tier when `generation` (see
+        `_shared_generation`) is given and the key hasn't been invalidated
+        since, by any process. `expires_at` (wall clock) marks a copy read
+        from that tier; it is kept locally only for the shared entry's
+        remaining lifetime.
+        """
         ttl = self.settings.read_cache_ttl_seconds
-        if ttl > 0:
-            self._cache[key] = (time.monotonic() + ttl, value)
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+        with self._lock:
+            base = self._stored.get(key)
+            previous = self._cache.peek(key)
+            games = self._cache.peek("games_map")
+        # Diffed outside the lock: the games map takes a while to compare.
+        touched = None
+        if base is not None and previous is not None:
+            touched = _changed_slugs(key, previous, value, games)
+        with self._lock:
+            if version is not None and self._versions.get(key, 0) != version:
+                return value
+            if self._stored.get(key) != base:
+                # Another value was stored meanwhile; the diff isn't against it.
+                touched = None
+            stamp = self._stamp(key, touched, base)
+            if ttl > 0:
+                self._cache.put(key, value, ttl)
+                self._stored[key] = stamp
+        if ttl > 0 and self._shared is not None and generation is not None:
+            data = encode_entry(value, time.time() + ttl)
+            if data is not None:
+                self._shared.set(self._shared_key(key), data, ttl, generation)
         return value
 
     def _cache_invalidate(self, *keys: str) -> None:
+        """Expire `keys` in the cache and give them new generations. The
+        values stay (until evicted) for their reloads to be diffed against."""
         for key in keys:
-            self._cache.pop(key, None)
+            with self._lock:
+                self._cache.expire(key)
+                self._stamp(key)
+            if self._shared is not None:
+                self._shared.delete(self._shared_key(key))
+
+    def _stamp(
+        self, key: str, touched: Iterable[str] | None = None, base: int | None = None
+    ) -> int:
+        """Give `key` a new generation and return it. Callers hold `_lock`.
+
+        With `touched` and `base`, the change is logged as only affecting
+        those slugs since generation `base`.
+        """
+        generation = next(_generations)
+        self._versions[key] = generation
+        if touched is None or base is None:
+            return generation
+        self._changes[generation] = (base, frozenset(touched))
+        while len(self._changes) > _MAX_CHANGES:
+            del self._changes[next(iter(self._changes))]
+        return generation
+
+    def cache_stats(self) -> dict[str, dict[str, Any]]:
+        """Read cache counters and current size per key family."""
+        return self._cache.stats()
+
+    def read_model_version(
+        self, user_ids: Iterable[str]
+    ) -> tuple[tuple[str, int], ...]:
+        """Version stamp of the comparison inputs for these users' libraries.
+
+        Loads (or reuses) the cached users, games map, overrides and libraries,
+        then returns the generation each was stored at. Any write or reload in
+        between produces a different tuple, so the stamp can key derived results.
+        """
+        self.scan_users()
+        self.get_all_games_map()
+        self.get_all_metadata()
+        self.get_all_entities()
+        keys = ["users", "games_map", "metadata", "entities"]
+        for user_id in sorted({str(u) for u in user_ids}):
+            self.get_user_library(user_id)
+            keys.append(f"library:{user_id}")
+        with self._lock:
+            return tuple((key, self._versions[key]) for key in keys)
+
+    def changed_slugs(
+        self, old: tuple[tuple[str, int], ...], new: tuple[tuple[str, int], ...]
+    ) -> set[str] | None:
+        """Slugs whose comparison rows may differ between two version stamps.
+
+        Walks the logged changes back from `new` to `old`. Returns None when any
+        step wasn't logged (the value it replaced had been evicted, or the set
+        of users changed), in which case nothing short of a full recompute is
+        safe.
+        """
+        if [key for key, _ in old] != [key for key, _ in new]:
+            return None
+        slugs: set[str] = set()
+        with self._lock:
+            for (_, since), (_, generation) in zip(old, new):
+                while generation != since:
+                    change = self._changes.get(generation)
+                    if change is None or generation < since:
+                        return None
+                    generation, touched = change
+                    slugs |= touched
+        return slugs
+
+    def _cache_derived(self, key: str, source: Any, build: Callable[[Any], Any]) -> Any:
+        """Return `build(source)`, rebuilt only when `source` is a new object.
+
+        Keyed on the identity of the cached entry it derives from, so the view
+        can never outlive (or lag behind) the entry itself.
+        """
+        derived = self._derived.get(key)
+        if derived is not None and derived[0] is source:
+            return derived[1]
+        value = build(source)
+        self._derived[key] = (source, value)
+        return value
 
     # ------------------------------------------------------------------
     # games
@@ -96,37 +486,49 @@ def get_game(self, release_key: str) -> dict | None:
         item = resp.get("Item")
         return _from_dynamo(item) if item else None
 
-    def batch_get_games(self, release_keys: Iterable[str]) -> dict[str, dict]:
-        keys = list(dict.fromkeys(release_keys))  # de-dupe, preserve order
-        result: dict[str, dict] = {}
-        # BatchGetItem caps at 100 keys per request.
-        for i in range(0, len(keys), 100):
-            chunk = keys[i : i + 100]
-            resp = self._resource.batch_get_item(
-                RequestItems={
-                    self.settings.games_table: {
-                        "Keys": [{"release_key": k} for k in chunk]
-                    }
-                }
-            )
-            for item in resp["Responses"].get(self.settings.games_table, []):
-                game = _from_dynamo(item)
-                result[game["release_key"]] = game
-        return result
+    def batch_get_games(
+        self, release_keys: Iterable[str], projection: Iterable[str] | None = None
+    ) -> dict[str, dict]:
+        return self._batch_get(
+            self.settings.games_table, "release_key", release_keys, projection
+        )
 
     def get_all_games_map(self) -> dict[str, dict]:
-        """Cached full games table keyed by release_key.
+        """Cached games table keyed by release_key, each row projected to
+        `COMPARISON_GAME_FIELDS`.
 
         The comparison service looks up metadata for whatever release keys the
         selected libraries contain. Serving every lookup from one cached scan
         replaces the per-request chain of BatchGetItem calls and lets repeated
-        filter/sort changes hit memory instead of DynamoDB.
+        filter/sort changes hit memory instead of DynamoDB. Use
+        `scan_all_games` or `batch_get_games` for whole rows.
         """
-        cached = self._cache_get("games_map")
-        if cached is not None:
-            return cached
-        games = {g["release_key"]: g for g in self._scan(self.settings.games_table)}
-        return self._cache_put("games_map", games)
+        return self._cache_load(
+            "games_map",
+            lambda: {
+                g["release_key"]: g
+                for g in self._scan(
+                    self.settings.games_table,
+                    self.settings.scan_segments,
+                    projection=COMPARISON_GAME_FIELDS,
+                )
+            },
+            revalidate=True,
+        )
+
+    def get_games_by_id(self) -> dict[int, InternedGame]:
+        """The cached games map keyed by interned release-key id, with each
+        row's slug interned too, so comparison joins run on ints."""
+        return self._cache_derived(
+            "games_by_id",
+            self.get_all_games_map(),
+            lambda games: {
+                interning.release_keys.intern(rk): InternedGame(
+                    interning.slugs.intern(game.get("slug", "")), game
+                )
+                for rk, game in games.items()
+            },
+        )
 
     def put_game(self, game: dict) -> None:
         self._table(self.settings.games_table).put_item(Item=_to_dynamo(game))
@@ -145,8 +547,11 @@ def mark_games_pending(self, games: list[dict]) -> None:
                 )
         self._cache_invalidate("games_map")
 
-    def scan_all_games(self) -> list[dict]:
-        return self._scan(self.settings.games_table)
+    def scan_all_games(self, projection: Iterable[str] | None = None) -> list[dict]:
+        """Every game row, uncached; just the `projection` fields if given."""
+        return self._scan(
+            self.settings.games_table, self.settings.scan_segments, projection
+        )
 
     # ------------------------------------------------------------------
     # users
@@ -159,20 +564,60 @@ def get_user(self, email: str) -> dict | None:
         return _from_dynamo(item) if item else None
 
     def get_user_by_user_id(self, user_id: str) -> dict | None:
-        # Small table; a filtered scan is fine at this scale.
-        for user in self.scan_users():
-            if str(user.get("user_id")) == str(user_id):
-                return user
-        return None
+        """The user linked to a GOG user id: from the cached users when they're
+        loaded, else one keyed query on `user_id-index` (no table scan).
+
+        A users table created before the index existed (scripts/init_local.py
+        adds it) rejects the query; the lookup then goes through the cached
+        users after all.
+        """
+        users = self._cache_get("users")
+        if users is not None:
+            return self._users_index(users).get(str(user_id))
+        try:
+            items = self._query_all(
+                self.settings.users_table,
+                IndexName="user_id-index",
+                KeyConditionExpression=Key("user_id").eq(str(user_id)),
+            )
+        except ClientError as e:
+            # DynamoDB reports a missing index as a validation error;
+            # dynamodb-local and moto as a missing resource.
+            code = e.response["Error"]["Code"]
+            if code not in ("ValidationException", "ResourceNotFoundException"):
+                raise
+            log.warning("No user_id-index on %s; scanning", self.settings.users_table)
+            return self.users_by_user_id().get(str(user_id))
+        return items[0] if items else None
 
     def scan_users(self) -> list[dict]:
-        cached = self._cache_get("users")
-        if cached is not None:
-            return cached
-        return self._cache_put("users", self._scan(self.settings.users_table))
+        return self._cache_load(
+            "users", lambda: self._scan(self.settings.users_table), revalidate=True
+        )
+
+    def users_by_user_id(self) -> dict[str, dict]:
+        """The cached users that have linked a GOG user id, keyed by it.
+
+        Rebuilt only when the users cache reloads; callers share the dict and
+        must not mutate it.
+        """
+        return self._users_index(self.scan_users())
+
+    def _users_index(self, users: list[dict]) -> dict[str, dict]:
+        return self._cache_derived(
+            "users_by_user_id",
+            users,
+            lambda users: {str(u["user_id"]): u for u in users if u.get("user_id")},
+        )
 
     def put_user(self, user: dict) -> None:
         user = {**user, "email": user["email"].lower()}
+        # user_id keys a GSI, so it must be a string when present; unlinked
+        # users leave it out and stay out of the index.
+        if user.get("user_id") is None:
+            user.pop("user_id", None)
+        else:
+            user["user_id"] = str(user["user_id"])
         self._table(self.settings.users_table).put_item(Item=_to_dynamo(user))
         self._cache_invalidate("users")
 
@@ -214,6 +659,8 @@ def ensure_webauthn_user_id(self, email: str, user_handle: str) -> str:
     def update_user(self, email: str, attrs: dict) -> None:
         if not attrs:
             return
+        if attrs.get("user_id") is not None:
+            attrs = {**attrs, "user_id": str(attrs["user_id"])}
         names = {f"#{k}": k for k in attrs}
         values = {f":{k}": _to_dynamo(v) for k, v in attrs.items()}
         expr = "SET " + ", ".join(f"#{k} = :{k}" for k in attrs)
@@ -226,26 +673,135 @@ def update_user(self, email: str, attrs: dict) -> None:
         self._cache_invalidate("users")
 
     # ------------------------------------------------------------------
-    # user_libraries  (PK user_id, SK release_key)
+    # user_libraries  (PK user_id, SK release_key, or "#library#<n>" for the
+    # shards of a packed library; see library.py)
     # ------------------------------------------------------------------
     def get_user_library(self, user_id: str) -> list[dict]:
-        key = f"library:{user_id}"
-        cached = self._cache_get(key)
-        if cached is not None:
-            return cached
+        """The user's library rows (cached), projected to `LIBRARY_FIELDS`."""
+        return self._cache_load(
+            f"library:{user_id}", lambda: self._read_library(str(user_id))
+        )
+
+    def _read_library(self, user_id: str) -> list[dict]:
+        if self._packed_libraries:
+            packed = self._read_packed_library(user_id)
+            if packed is not None:
+                return packed
+        return self._read_library_rows(user_id)
+
+    def _read_library_rows(self, user_id: str) -> list[dict]:
+        """The user's library in the row layout, ignoring any packed shards."""
         rows = self._query_all(
             self.settings.libraries_table,
-            KeyConditionExpression=Key("user_id").eq(str(user_id)),
+            projection=LIBRARY_FIELDS,
+            KeyConditionExpression=Key("user_id").eq(user_id),
         )
-        return self._cache_put(key, rows)
+        return [row for row in rows if not library.is_shard_key(row["release_key"])]
+
+    def _read_packed_library(self, user_id: str) -> list[dict] | None:
+        """The rows of the user's packed library; None if it isn't packed."""
+        for _ in range(_PACKED_READ_ATTEMPTS):
+            shards = self._query_all(
+                self.settings.libraries_table,
+                KeyConditionExpression=Key("user_id").eq(user_id)
+                & Key("release_key").begins_with(library.SHARD_PREFIX),
+            )
+            if not shards:
+                return None
+            if _complete(shards):
+                return [
+                    row
+                    for shard in sorted(shards, key=lambda s: s["release_key"])
+                    for row in library.decode(user_id, _binary(shard["data"]))
+                ]
+        raise RuntimeError(f"Packed library of {user_id} changed mid-read")
+
+    @property
+    def _packed_libraries(self) -> bool:
+        return self.settings.library_layout == "packed"
+
+    def _library_item_keys(self, user_id: str) -> list[str]:
+        """Sort keys of every item in the user's partition, either layout."""
+        items = self._query_all(
+            self.settings.libraries_table,
+            projection=("release_key",),
+            KeyConditionExpression=Key("user_id").eq(user_id),
+        )
+        return [item["release_key"] for item in items]
 
-    def replace_user_library(self, user_id: str, entries: list[dict]) -> None:
-        """Delete the user's existing library rows and write the new set."""
-        # Drop any cached copy so the read below sees current rows, and so later
-        # comparison reads pick up the replacement once writes land.
-        self._cache_invalidate(f"library:{user_id}")
-        table = self._table(self.settings.libraries_table)
-        existing = self.get_user_library(user_id)
+    def _write_packed_library(self, user_id: str, rows: list[dict]) -> None:
+        """Replace the user's library items with the packed shards of `rows`.
+
+        The shards (and the removal of surplus ones from a bigger previous
+        library) are written in one transaction, so readers see either the
+        old library or the new one. Rows of the row layout are deleted after.
+        """
+        table_name = self.settings.libraries_table
+        stored = self._library_item_keys(user_id)
+        payloads = library.pack(rows)
+        keys = [library.shard_key(i) for i in range(len(payloads))]
+        generation = uuid.uuid4().hex
+        updated_at = now_iso()
+        actions: list[Any] = [
+            {
+                "Put": {
+                    "TableName": table_name,
+                    "Item": {
+                        "user_id": user_id,
+                        "release_key": key,
+                        "format": library.FORMAT,
+                        "generation": generation,
+                        "shards": len(payloads),
+                        "entries": len(rows),
+                        "updated_at": updated_at,
+                        "data": payload,
+                    },
+                }
+            }
+            for key, payload in zip(keys, payloads)
+        ]
+        actions.extend(
+            {
+                "Delete": {
+                    "TableName": table_name,
+                    "Key": {"user_id": user_id, "release_key": key},
+                }
+            }
+            for key in stored
+            if library.is_shard_key(key) and key not in keys
+        )
+        self._client.transact_write_items(TransactItems=actions)
+        legacy = [key for key in stored if not library.is_shard_key(key)]
+        if legacy:
+            with self._table(table_name).batch_writer() as batch:
+                for key in legacy:
+                    batch.delete_item(Key={"user_id": user_id, "release_key": key})
+
+    def replace_user_library(
+        self, user_id: str, entries: list[dict], delta: LibraryDelta | None = None
+    ) -> LibraryDelta:
+        """Make the user's stored library match `entries`.
+
+        Only what changed is written: in the row layout, puts for added or
+        install-changed release keys and deletes for vanished ones; in the
+        packed layout, nothing at all when the library is unchanged. Returns
+        the change against the stored rows. When the library was last
+        updated is kept on the user record (`db_updated_at`), not per row.
+
+        `delta`, when given, is the diff from the currently cached rows (see
+        `diff_library`); the ownership index is then patched for just those
+        release keys instead of rebuilt, and while those rows are still the
+        live cache entry they stand in for the stored library, so it isn't
+        read again to find what to write.
+        """
+        key = f"library:{user_id}"
+        stored = None
+        if delta is not None and self._cache_get(key) is delta.base:
+            stored = delta.base
+        # Drop any cached copy so later comparison reads pick up the
+        # replacement once writes land.
+        self._cache_invalidate(key)
+        generation = self._shared_generation(key)
         incoming: dict[str, dict] = {}
         for entry in entries:
             release_key = entry["release_key"]
@@ -256,40 +812,114 @@ def replace_user_library(self, user_id: str, entries: list[dict]) -> None:
             current["installed"] = current.get("installed", False) or entry.get(
                 "installed", False
             )
-            for key, value in entry.items():
-                if key not in ("release_key", "installed") and value is not None:
-                    current[key] = value
-
-        existing_keys = {row["release_key"] for row in existing}
-        incoming_keys = set(incoming)
-        with table.batch_writer() as batch:
-            for release_key in existing_keys - incoming_keys:
-                batch.delete_item(
-                    Key={
-                        "user_id": str(user_id),
-                        "release_key": release_key,
-                    }
-                )
-            for entry in incoming.values():
-                item = {**entry, "user_id": str(user_id)}
-                batch.put_item(Item=_to_dynamo(item))
-        self._cache_invalidate(f"library:{user_id}")
+            for field, value in entry.items():
+                if field not in ("release_key", "installed") and value is not None:
+                    current[field] = value
+
+        rows = [{**entry, "user_id": str(user_id)} for entry in incoming.values()]
+        if self._packed_libraries:
+            changes = self._replace_packed_library(str(user_id), rows, stored)
+        else:
+            changes = self._replace_library_rows(str(user_id), rows, stored)
+        # Write the new rows through to the cache and the ownership index rather
+        # than dropping them, so the next comparison doesn't re-query the
+        # library and re-index it from scratch.
+        cached = [_project(row, LIBRARY_FIELDS) for row in rows]
+        self._cache_put(key, cached, generation=generation)
+        if delta is not None:
+            self._ownership.apply_delta(str(user_id), cached, delta)
+        else:
+            self._ownership.set_user(str(user_id), cached)
+        return changes
+
+    def _replace_library_rows(
+        self, user_id: str, rows: list[dict], stored: list[dict] | None = None
+    ) -> LibraryDelta:
+        shards: set[str] = set()
+        if stored is None:
+            # Shards of a packed library are dropped along with vanished rows.
+            # (Diffing cached rows instead leaves any to the next full read;
+            # the row layout ignores them anyway.)
+            items = self._query_all(
+                self.settings.libraries_table,
+                projection=("release_key", "installed"),
+                KeyConditionExpression=Key("user_id").eq(user_id),
+            )
+            shards = {
+                r["release_key"]
+                for r in items
+                if library.is_shard_key(r["release_key"])
+            }
+            stored = [r for r in items if r["release_key"] not in shards]
+        changes = diff_library(stored, rows)
+        changed = changes.added | changes.install_changed
+        with self._table(self.settings.libraries_table).batch_writer() as batch:
+            for release_key in changes.removed | shards:
+                batch.delete_item(Key={"user_id": user_id, "release_key": release_key})
+            for row in rows:
+                if row["release_key"] in changed:
+                    batch.put_item(Item=_to_dynamo(row))
+        return changes
+
+    def _replace_packed_library(
+        self, user_id: str, rows: list[dict], stored: list[dict] | None = None
+    ) -> LibraryDelta:
+        if stored is not None:
+            changes = diff_library(stored, rows)
+            if changes.release_keys:
+                self._write_packed_library(user_id, rows)
+            return changes
+        packed = self._read_packed_library(user_id)
+        if packed is None:
+            # Still in the row layout: diff against the rows being replaced.
+            changes = diff_library(self._read_library_rows(user_id), rows)
+        else:
+            changes = diff_library(packed, rows)
+            if not changes.release_keys:
+                return changes
+        self._write_packed_library(user_id, rows)
+        return changes
 
     def clear_user_library(self, user_id: str) -> int:
         """Delete every library row for a user. Returns the number removed."""
-        self._cache_invalidate(f"library:{user_id}")
+        key = f"library:{user_id}"
+        self._cache_invalidate(key)
         table = self._table(self.settings.libraries_table)
         existing = self.get_user_library(user_id)
+        generation = self._shared_generation(key)
         with table.batch_writer() as batch:
-            for row in existing:
+            for release_key in self._library_item_keys(str(user_id)):
                 batch.delete_item(
-                    Key={"user_id": str(user_id), "release_key": row["release_key"]}
+                    Key={"user_id": str(user_id), "release_key": release_key}
                 )
-        self._cache_invalidate(f"library:{user_id}")
+        self._ownership.set_user(
+            str(user_id), self._cache_put(key, [], generation=generation)
+        )
         return len(existing)
 
+    def get_ownership_index(self, user_ids: Iterable[str]) -> OwnershipIndex:
+        """Ownership index covering (at least) the given users' libraries.
+
+        Each library comes from the read-model cache; a user is only re-indexed
+        when their cached rows were reloaded since the last call.
+        """
+        for user_id in user_ids:
+            self._ownership.sync_user(str(user_id), self.get_user_library(user_id))
+        return self._ownership
+
     def get_owners_of_release(self, release_key: str) -> list[str]:
-        """Return user_ids that own a release, via the release_key GSI."""
+        """Return user_ids that own a release, via the release_key GSI.
+
+        Packed libraries have no per-release items for the GSI to index, so
+        the answer comes from the ownership index over every user's library
+        instead.
+        """
+        if self._packed_libraries:
+            index = self.get_ownership_index(self.users_by_user_id())
+            rk = interning.release_keys.get(release_key)
+            if rk is None:
+                return []
+            return index.owners_of(rk)
         items = self._query_all(
             self.settings.libraries_table,
             IndexName="release_key-index",
@@ -298,10 +928,15 @@ def get_owners_of_release(self, release_key: str) -> list[str]:
         return [i["user_id"] for i in items]
 
     # ------------------------------------------------------------------
-    # enrichment_jobs
+    # enrichment_jobs  (PK job_id; sparse active_status-index GSI over the
+    # `active_status` attribute, which only pending and running jobs carry)
     # ------------------------------------------------------------------
     def put_job(self, job: JobRecord) -> None:
-        self._table(self.settings.jobs_table).put_item(Item=_to_dynamo(job))
+        item = {**job}
+        item.pop("active_status", None)
+        if job["status"] in _ACTIVE_JOB_STATUSES:
+            item["active_status"] = job["status"]
+        self._table(self.settings.jobs_table).put_item(Item=_to_dynamo(item))
 
     def get_job(self, job_id: str) -> JobRecord | None:
         resp = self._table(self.settings.jobs_table).get_item(Key={"job_id": job_id})
@@ -316,10 +951,21 @@ def get_job(self, job_id: str) -> JobRecord | None:
             job["completed_count"] = sum(progress.values())
         return job
 
-    def update_job(self, job_id: str, attrs: dict) -> None:
-        names = {f"#{k}": k for k in attrs}
+    def update_job(self, job_id: str, attrs: dict, remove: Iterable[str] = ()) -> None:
+        # A status change moves the job into, between or out of the active
+        # index: terminal jobs drop `active_status` and leave it entirely.
+        # Retention is `finish_job`'s business, not any terminal write's.
+        remove = list(remove)
+        if "status" in attrs:
+            if attrs["status"] in _ACTIVE_JOB_STATUSES:
+                attrs = {**attrs, "active_status": attrs["status"]}
+            else:
+                remove.append("active_status")
+        names = {f"#{k}": k for k in [*attrs, *remove]}
         values = {f":{k}": _to_dynamo(v) for k, v in attrs.items()}
         expr = "SET " + ", ".join(f"#{k} = :{k}" for k in attrs)
+        if remove:
+            expr += " REMOVE " + ", ".join(f"#{k}" for k in remove)
         self._table(self.settings.jobs_table).update_item(
             Key={"job_id": job_id},
             UpdateExpression=expr,
@@ -327,6 +973,30 @@ def update_job(self, job_id: str, attrs: dict) -> None:
             ExpressionAttributeValues=values,
         )
 
+    def finish_job(
+        self,
+        job_id: str,
+        status: str,
+        completed_at: str | None = None,
+        compact: bool = True,
+    ) -> None:
+        """Move a job to a terminal status and apply the retention policy.
+
+        An `expires_at` TTL `job_retention_days` after `completed_at` (default:
+        now) lets DynamoDB delete the row, and with `compact` and
+        `compact_finished_jobs` the release-key list (by far the bulk of a job)
+        goes at once, leaving a summary of counts and times.
+        """
+        completed_at = completed_at or now_iso()
+        attrs: dict[str, Any] = {"status": status, "completed_at": completed_at}
+        if self.settings.job_retention_days > 0:
+            expires = parse_iso(completed_at) + timedelta(
+                days=self.settings.job_retention_days
+            )
+            attrs["expires_at"] = int(expires.timestamp())
+        compact = compact and self.settings.compact_finished_jobs
+        self.update_job(job_id, attrs, remove=["release_keys"] if compact else [])
+
     def set_chunk_progress(
         self, job_id: str, chunk_id: str, count: int
     ) -> dict[str, int]:
@@ -352,14 +1022,80 @@ def set_chunk_progress(
         attrs = _from_dynamo(resp.get("Attributes", {}))
         return attrs.get("chunk_progress", {})
 
-    def list_pending_jobs(self) -> list[dict]:
-        from gamatrix.constants import JOB_PENDING
+    def list_pending_jobs(self) -> list[JobRecord]:
+        return self._active_jobs(JOB_PENDING)
+
+    def _active_jobs(self, *statuses: str) -> list[JobRecord]:
+        """Jobs in the given active statuses (default: pending and running),
+        read from the sparse index, so finished jobs are never touched."""
+        return [
+            job
+            for status in statuses or _ACTIVE_JOB_STATUSES
+            for job in cast(
+                "list[JobRecord]",
+                self._query_all(
+                    self.settings.jobs_table,
+                    IndexName="active_status-index",
+                    KeyConditionExpression=Key("active_status").eq(status),
+                ),
+            )
+        ]
 
+    def list_finished_jobs(
+        self, projection: Iterable[str] | None = None
+    ) -> list[JobRecord]:
+        """Every completed or failed job, from a full scan (finished jobs are
+        not in the active index). For maintenance, not request paths."""
+        if projection is not None:
+            projection = dict.fromkeys(["job_id", "status", *projection])
+        jobs = self._scan(
+            self.settings.jobs_table, self.settings.scan_segments, projection
+        )
         return [
-            j
-            for j in self._scan(self.settings.jobs_table)
-            if j.get("status") == JOB_PENDING
+            cast("JobRecord", job)
+            for job in jobs
+            if job.get("status") not in _ACTIVE_JOB_STATUSES
+        ]
+
+    def backfill_active_status(self, dry_run: bool = False) -> list[str]:
+        """Put pending and running jobs that lack `active_status` into the
+        active index, and return their ids.
+
+        Jobs written before the index existed never got the attribute, so
+        `_active_jobs` can't see them: they'd neither be picked up nor reaped
+        when stale. A full scan, meant for the one-off upgrade (see
+        scripts/compact_jobs.py). With `dry_run`, only reports the ids.
+        """
+        jobs = self._scan(
+            self.settings.jobs_table,
+            self.settings.scan_segments,
+            projection=("job_id", "status", "active_status"),
+        )
+        missing = [
+            job
+            for job in jobs
+            if job.get("status") in _ACTIVE_JOB_STATUSES
+            and job.get("active_status") != job["status"]
         ]
+        if dry_run:
+            return [job["job_id"] for job in missing]
+        table = self._table(self.settings.jobs_table)
+        backfilled: list[str] = []
+        for job in missing:
+            try:
+                table.update_item(
+                    Key={"job_id": job["job_id"]},
+                    UpdateExpression="SET #a = :s",
+                    # A job that moved on since the scan has its own status
+                    # handling; don't put it back.
+                    ConditionExpression="#s = :s",
+                    ExpressionAttributeNames={"#a": "active_status", "#s": "status"},
+                    ExpressionAttributeValues={":s": job["status"]},
+                )
+                backfilled.append(job["job_id"])
+            except self._client.exceptions.ConditionalCheckFailedException:
+                continue
+        return backfilled
 
     def fail_stale_jobs(self, jobs: Iterable[JobRecord] | None = None) -> list[str]:
         """Mark presumed-dead jobs (see `is_job_stale`) as failed and return
@@ -369,21 +1105,20 @@ def fail_stale_jobs(self, jobs: Iterable[JobRecord] | None = None) -> list[str]:
         writing a terminal status: left alone they pin the progress bar and
         block new enrichment forever. This is the application-side backstop to
         the queue's redrive-to-DLQ policy, which only caps redeliveries and
-        can't update the job record. Pass `jobs` to reuse an existing scan."""
+        can't update the job record. Pass `jobs` to reuse an existing read."""
         # Imported here, not at module scope: gamatrix.jobs imports Repository
         # from this module, so a top-level import would be circular.
         from gamatrix.constants import JOB_FAILED
         from gamatrix.jobs import is_job_active, is_job_stale
 
         if jobs is None:
-            jobs = cast("list[JobRecord]", self._scan(self.settings.jobs_table))
+            jobs = self._active_jobs()
         reaped: list[str] = []
         for j in jobs:
             if is_job_active(j) and is_job_stale(j):
-                self.update_job(
-                    j["job_id"],
-                    {"status": JOB_FAILED, "completed_at": now_iso()},
-                )
+                # Presumed dead, not known done: the release keys stay, for
+                # looking into or re-queueing, until the row expires.
+                self.finish_job(j["job_id"], JOB_FAILED, compact=False)
                 reaped.append(j["job_id"])
         return reaped
 
@@ -398,7 +1133,7 @@ def get_active_job(self) -> JobRecord | None:
         # from this module, so a top-level import would be circular.
         from gamatrix.jobs import is_job_active
 
-        jobs = cast("list[JobRecord]", self._scan(self.settings.jobs_table))
+        jobs = self._active_jobs()
         reaped = set(self.fail_stale_jobs(jobs))
         active = [j for j in jobs if is_job_active(j) and j["job_id"] not in reaped]
         if not active:
@@ -409,11 +1144,21 @@ def get_active_job(self) -> JobRecord | None:
     # metadata_overrides  (PK slug)
     # ------------------------------------------------------------------
     def get_all_metadata(self) -> dict[str, dict]:
-        cached = self._cache_get("metadata")
-        if cached is not None:
-            return cached
-        overrides = {m["slug"]: m for m in self._scan(self.settings.metadata_table)}
-        return self._cache_put("metadata", overrides)
+        return self._cache_load(
+            "metadata",
+            lambda: {m["slug"]: m for m in self._scan(self.settings.metadata_table)},
+        )
+
+    def get_metadata_by_slug_id(self) -> dict[int, dict]:
+        """The cached overrides keyed by interned slug id."""
+        return self._cache_derived(
+            "metadata_by_slug_id",
+            self.get_all_metadata(),
+            lambda overrides: {
+                interning.slugs.intern(slug): override
+                for slug, override in overrides.items()
+            },
+        )
 
     def put_metadata(self, override: dict) -> None:
         self._table(self.settings.metadata_table).put_item(Item=_to_dynamo(override))
@@ -422,13 +1167,50 @@ def put_metadata(self, override: dict) -> None:
     def clear_metadata(self) -> int:
         """Delete every override row. Returns the number removed."""
         table = self._table(self.settings.metadata_table)
-        rows = self._scan(self.settings.metadata_table)
+        rows = self._scan(self.settings.metadata_table, self.settings.scan_segments)
         with table.batch_writer() as batch:
             for row in rows:
                 batch.delete_item(Key={"slug": row["slug"]})
         self._cache_invalidate("metadata")
         return len(rows)
 
+    def batch_get_metadata(self, slugs: Iterable[str]) -> dict[str, dict]:
+        return self._batch_get(self.settings.metadata_table, "slug", slugs)
+
+    # ------------------------------------------------------------------
+    # game_entities  (PK slug; maintained by games/entities.py)
+    # ------------------------------------------------------------------
+    def get_all_entities(self) -> dict[str, dict]:
+        return self._cache_load(
+            "entities",
+            lambda: {e["slug"]: e for e in self._scan(self.settings.entities_table)},
+        )
+
+    def get_entities_by_slug_id(self) -> dict[int, dict]:
+        """The cached entities keyed by interned slug id."""
+        return self._cache_derived(
+            "entities_by_slug_id",
+            self.get_all_entities(),
+            lambda entities: {
+                interning.slugs.intern(slug): entity
+                for slug, entity in entities.items()
+            },
+        )
+
+    def batch_get_entities(self, slugs: Iterable[str]) -> dict[str, dict]:
+        return self._batch_get(self.settings.entities_table, "slug", slugs)
+
+    def write_entities(self, entities: list[dict], removed: Iterable[str] = ()) -> None:
+        """Upsert entity rows and delete the entities of slugs in `removed`."""
+        gone = set(removed)
+        table = self._table(self.settings.entities_table)
+        with table.batch_writer() as batch:
+            for slug in gone:
+                batch.delete_item(Key={"slug": slug})
+            for entity in entities:
+                batch.put_item(Item=_to_dynamo(entity))
+        self._cache_invalidate("entities")
+
     # ------------------------------------------------------------------
     # profile_pics  (PK user_id -> processed PNG bytes)
     # ------------------------------------------------------------------
@@ -476,7 +1258,7 @@ def put_passkey(self, passkey: dict) -> bool:
                 ConditionExpression="attribute_not_exists(credential_id)",
             )
             return True
-        except self._resource.meta.client.exceptions.ConditionalCheckFailedException:
+        except self._client.exceptions.ConditionalCheckFailedException:
             return False
 
     def get_passkey(self, credential_id: str) -> dict | None:
@@ -501,7 +1283,7 @@ def delete_passkey(self, credential_id: str, user_handle: str) -> bool:
                 ExpressionAttributeValues={":user_handle": user_handle},
             )
             return True
-        except self._resource.meta.client.exceptions.ConditionalCheckFailedException:
+        except self._client.exceptions.ConditionalCheckFailedException:
             return False
 
     def delete_all_passkeys(self, user_handle: str) -> int:
@@ -553,7 +1335,7 @@ def update_passkey_after_authentication(
                 ),
             )
             return True
-        except self._resource.meta.client.exceptions.ConditionalCheckFailedException:
+        except self._client.exceptions.ConditionalCheckFailedException:
             return False
 
     def put_auth_challenge(self, challenge: dict) -> None:
@@ -575,7 +1357,7 @@ def consume_auth_challenge(self, challenge_id: str) -> bool:
                 ConditionExpression="attribute_exists(challenge_id)",
             )
             return True
-        except self._resource.meta.client.exceptions.ConditionalCheckFailedException:
+        except self._client.exceptions.ConditionalCheckFailedException:
             return False
 
     # ------------------------------------------------------------------
@@ -608,7 +1390,7 @@ def delete_api_token(self, token_id: str, email: str) -> bool:
                 ExpressionAttributeValues={":email": email.lower()},
             )
             return True
-        except self._resource.meta.client.exceptions.ConditionalCheckFailedException:
+        except self._client.exceptions.ConditionalCheckFailedException:
             return False
 
     def touch_api_token(self, token_id: str, when: str) -> None:
@@ -622,24 +1404,113 @@ def touch_api_token(self, token_id: str, when: str) -> None:
     # ------------------------------------------------------------------
     # internal
     # ------------------------------------------------------------------
-    def _scan(self, table_name: str) -> list[dict]:
-        table = self._table(table_name)
+    def _scan(
+        self,
+        table_name: str,
+        segments: int = 1,
+        projection: Iterable[str] | None = None,
+    ) -> list[dict]:
+        """Scan a whole table, following LastEvaluatedKey.
+
+        With `segments` > 1 the table is read as that many DynamoDB scan
+        segments in parallel, one thread each, and the results joined in
+        segment order. Worth it for the big tables (games), whose serial scan
+        is dozens of sequential 1 MB pages. With `projection`, only those
+        attributes are returned.
+        """
+        kwargs = _projection(projection) if projection else {}
+        if segments <= 1:
+            return self._scan_segment(table_name, kwargs)
+        with ThreadPoolExecutor(max_workers=segments) as pool:
+            parts = pool.map(
+                lambda segment: self._scan_segment(
+                    table_name,
+                    {**kwargs, "Segment": segment, "TotalSegments": segments},
+                ),
+                range(segments),
+            )
+            return [item for part in parts for item in part]
+
+    def _scan_segment(self, table_name: str, kwargs: dict[str, Any]) -> list[dict]:
         items: list[dict] = []
-        kwargs: dict[str, Any] = {}
+        kwargs = {"TableName": table_name, **kwargs}
         while True:
-            resp = table.scan(**kwargs)
+            resp = self._client.scan(**kwargs)
             items.extend(_from_dynamo(i) for i in resp.get("Items", []))
             if "LastEvaluatedKey" not in resp:
                 return items
             kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
 
-    def _query_all(self, table_name: str, **kwargs: Any) -> list[dict]:
+    def _batch_get(
+        self,
+        table_name: str,
+        key_name: str,
+        keys: Iterable[str],
+        projection: Iterable[str] | None = None,
+    ) -> dict[str, dict]:
+        """BatchGetItem by partition key, returning items keyed by that key.
+
+        Keys go out in 100-key requests, up to `batch_get_concurrency` at a
+        time. Keys DynamoDB returns as unprocessed (throttling, the 16 MB
+        response cap) are retried with jittered backoff, so every existing
+        item comes back or `UnprocessedKeysError` is raised. With
+        `projection`, only those attributes (plus the key) are returned.
+        """
+        unique = list(dict.fromkeys(keys))  # de-dupe, preserve order
+        chunks = [
+            unique[i : i + _BATCH_GET_SIZE]
+            for i in range(0, len(unique), _BATCH_GET_SIZE)
+        ]
+        request: dict[str, Any] = {}
+        if projection is not None:
+            request = _projection(dict.fromkeys([key_name, *projection]))
+
+        def fetch(chunk: list[str]) -> list[dict]:
+            return self._batch_get_chunk(
+                table_name, {"Keys": [{key_name: k} for k in chunk], **request}
+            )
+
+        workers = min(self.settings.batch_get_concurrency, len(chunks))
+        if workers <= 1:
+            parts: Iterable[list[dict]] = map(fetch, chunks)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                parts = list(pool.map(fetch, chunks))
+        return {row[key_name]: row for part in parts for row in part}
+
+    def _batch_get_chunk(self, table_name: str, request: dict) -> list[dict]:
+        items: list[dict] = []
+        pending: Any = {table_name: request}
+        for attempt in range(_BATCH_GET_ATTEMPTS):
+            if attempt:
+                # Full jitter, so throttled workers don't retry in lockstep.
+                delay = min(_BATCH_GET_MAX_DELAY, _BATCH_GET_BASE_DELAY * 2**attempt)
+                time.sleep(random.uniform(0, delay))
+            resp = self._client.batch_get_item(RequestItems=pending)
+            items.extend(_from_dynamo(i) for i in resp["Responses"].get(table_name, []))
+            pending = resp.get("UnprocessedKeys") or {}
+            if not pending:
+                return items
+        raise UnprocessedKeysError(
+            f"{len(pending[table_name]['Keys'])} keys of {table_name} still "
+            f"unprocessed after {_BATCH_GET_ATTEMPTS} attempts"
+        )
+
+    def _query_all(
+        self,
+        table_name: str,
+        projection: Iterable[str] | None = None,
+        **kwargs: Any,
+    ) -> list[dict]:
         """Run a query, following LastEvaluatedKey so a large result set
-        (a single query page caps at 1 MB) is returned in full."""
-        table = self._table(table_name)
+        (a single query page caps at 1 MB) is returned in full. With
+        `projection`, only those attributes are returned."""
+        if projection:
+            kwargs.update(_projection(projection))
+        kwargs["TableName"] = table_name
         items: list[dict] = []
         while True:
-            resp = table.query(**kwargs)
+            resp = self._client.query(**kwargs)
             items.extend(_from_dynamo(i) for i in resp.get("Items", []))
             if "LastEvaluatedKey" not in resp:
                 return items
@@ -0,0 +1,62 @@
+"""Process-wide interning of release keys, slugs and user ids.
+
+The comparison read model joins libraries, games and overrides on string keys
+(`steam_1234567`, `gog_1207664643`, slugs, user ids). Interning hands each
+distinct string a compact, dense int id once per process, so the cached read
+model can be stored against ints and per-request joins become int lookups,
+bitmask positions and list indexes instead of repeated string hashing.
+
+Ids are append-only and never reused, so an id stays valid for the life of the
+process and can be shared across Repository instances.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import NamedTuple
+
+
+class Interner:
+    """Two-way mapping between strings and dense int ids."""
+
+    def __init__(self) -> None:
+        self._ids: dict[str, int] = {}
+        self._keys: list[str] = []
+        # Sync routes run on a threadpool; the lock only guards assigning a new
+        # id so two threads can't hand the same string different ids.
+        self._lock = threading.Lock()
+
+    def intern(self, key: str) -> int:
+        """Return the id for `key`, assigning the next free one if it's new."""
+        existing = self._ids.get(key)
+        if existing is not None:
+            return existing
+        with self._lock:
+            existing = self._ids.get(key)
+            if existing is None:
+                existing = len(self._keys)
+                self._keys.append(key)
+                self._ids[key] = existing
+            return existing
+
+    def get(self, key: str) -> int | None:
+        """Return the id for `key` without assigning one."""
+        return self._ids.get(key)
+
+    def key(self, id_: int) -> str:
+        return self._keys[id_]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+release_keys = Interner()
+slugs = Interner()
+user_ids = Interner()
+
+
+class InternedGame(NamedTuple):
+    """A cached games-table row with its slug pre-interned for joins."""
+
+    slug_id: int
+    row: dict
@@ -0,0 +1,122 @@
+"""Packed library layout: a user's whole library in one or a few items.
+
+The row layout stores one `user_libraries` item per owned release key, so a
+6k-game upload is 6k writes and reading it back costs thousands of read units.
+The packed layout (`library_layout = "packed"`) stores the library as
+compressed shards under the same partition key instead, with sort keys
+`#library#0`, `#library#1`, ... (release keys never start with "#").
+
+Shard payload, format 1, zlib-compressed:
+
+    !BHI       format, number of stores, number of entries
+    !I + utf8  store names (release-key prefixes), newline-separated
+    B * n      store index of each entry
+    bits       installed flag of each entry (numpy.packbits)
+    utf8       the rest of each release key, newline-separated
+
+A library is split into as many shards as it takes to keep each under
+`SHARD_BYTES`, comfortably inside DynamoDB's 400 KB item limit.
+"""
+
+from __future__ import annotations
+
+import struct
+import zlib
+from typing import Iterable
+
+import numpy as np
+
+FORMAT = 1
+SHARD_PREFIX = "#library#"
+# Compressed payload per shard; the rest of the 400 KB is attribute overhead.
+SHARD_BYTES = 350_000
+
+_HEADER = struct.Struct("!BHI")
+_LENGTH = struct.Struct("!I")
+
+
+def shard_key(index: int) -> str:
+    return f"{SHARD_PREFIX}{index}"
+
+
+def is_shard_key(release_key: str) -> bool:
+    return release_key.startswith(SHARD_PREFIX)
+
+
+def _split(release_key: str) -> tuple[str, str]:
+    store, sep, rest = release_key.partition("_")
+    if not sep or not store or "\n" in store:
+        return "", release_key
+    return store, rest
+
+
+def encode(rows: Iterable[dict]) -> bytes:
+    """Pack library rows (release_key, installed) into one payload."""
+    stores: dict[str, int] = {}
+    codes: list[int] = []
+    installed: list[bool] = []
+    rests: list[str] = []
+    for row in rows:
+        store, rest = _split(row["release_key"])
+        codes.append(stores.setdefault(store, len(stores)))
+        installed.append(bool(row.get("installed")))
+        rests.append(rest)
+    if len(stores) > 256:
+        raise ValueError("A packed library holds at most 256 distinct stores")
+    names = "\n".join(stores).encode()
+    payload = b"".join(
+        [
+            _HEADER.pack(FORMAT, len(stores), len(codes)),
+            _LENGTH.pack(len(names)),
+            names,
+            bytes(codes),
+            np.packbits(np.array(installed, dtype=bool)).tobytes(),
+            "\n".join(rests).encode(),
+        ]
+    )
+    return zlib.compress(payload)
+
+
+def decode(user_id: str, data: bytes) -> list[dict]:
+    """Library rows (user_id, release_key, installed) from one payload."""
+    payload = zlib.decompress(data)
+    version, n_stores, count = _HEADER.unpack_from(payload)
+    if version != FORMAT:
+        raise ValueError(f"Unknown packed library format {version}")
+    offset = _HEADER.size
+    (length,) = _LENGTH.unpack_from(payload, offset)
+    offset += _LENGTH.size
+    stores = payload[offset : offset + length].decode().split("\n")[:n_stores]
+    offset += length
+    codes = payload[offset : offset + count]
+    offset += count
+    packed = (count + 7) // 8
+    installed = np.unpackbits(
+        np.frombuffer(payload[offset : offset + packed], dtype=np.uint8), count=count
+    )
+    offset += packed
+    rests = payload[offset:].decode().split("\n") if count else []
+    rows = []
+    for code, flag, rest in zip(codes, map(bool, installed), rests):
+        store = stores[code]
+        rows.append(
+            {
+                "user_id": user_id,
+                "release_key": f"{store}_{rest}" if store else rest,
+                "installed": flag,
+            }
+        )
+    return rows
+
+
+def pack(rows: list[dict], shard_bytes: int = SHARD_BYTES) -> list[bytes]:
+    """Payloads for `rows`, split into as few shards as fit `shard_bytes`."""
+    shards = 1
+    while True:
+        size = -(-len(rows) // shards) if rows else 0
+        payloads = [
+            encode(rows[i : i + size]) for i in range(0, len(rows), size or 1)
+        ] or [encode([])]
+        if all(len(p) <= shard_bytes for p in payloads) or size <= 1:
+            return payloads
+        shards = max(shards + 1, -(-sum(map(len, payloads)) // shard_bytes))
@@ -0,0 +1,254 @@
+"""Bitmask ownership index over the cached user libraries.
+
+The index holds each user's library as two sorted arrays of interned
+release-key ids (see interning.py): the releases they own and the ones they
+have installed. A comparison takes an `OwnershipView` of just the users it
+reads, which numbers them 0..n-1 and builds, for its candidate releases, owner
+and installed masks with one bit per user at those dense positions. The masks
+are uint64 words (`WORD_BITS` users per word), so "does everyone selected own
+this?", "does anyone excluded own it?" and "how many have it installed?" are
+vectorized `&`, `==` and popcounts over whole columns, and a mask never
+grows with the number of users the process has ever seen.
+
+The Repository keeps one index per process, fed from the same library rows it
+caches, and updates it whenever it replaces or clears a library. A user's
+arrays are never modified in place, only replaced (under the index's lock, as
+requests on worker threads sync users concurrently), so a view keeps reading
+the libraries as they were when it was taken.
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from typing import Iterable
+
+import numpy as np
+
+from gamatrix.storage import interning
+
+WORD_BITS = 64
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+_EMPTY.flags.writeable = False
+
+
+@dataclass
+class LibraryDelta:
+    """What changed between a user's indexed library rows and a replacement.
+
+    `base` is the row list the diff was taken against; the delta only applies
+    on top of exactly those rows.
+    """
+
+    base: list[dict]
+    added: set[str] = field(default_factory=set)
+    removed: set[str] = field(default_factory=set)
+    install_changed: set[str] = field(default_factory=set)
+
+    @property
+    def release_keys(self) -> set[str]:
+        return self.added | self.removed | self.install_changed
+
+
+def diff_library(base: list[dict], entries: Iterable[dict]) -> LibraryDelta:
+    """Diff replacement library entries against the rows they replace.
+
+    Duplicate entries for a release key count as installed if any copy is, the
+    same way `Repository.replace_user_library` merges them.
+    """
+    before = {row["release_key"]: bool(row.get("installed")) for row in base}
+    after: dict[str, bool] = {}
+    for entry in entries:
+        release_key = entry["release_key"]
+        after[release_key] = after.get(release_key, False) or bool(
+            entry.get("installed")
+        )
+    delta = LibraryDelta(base=base)
+    delta.added = after.keys() - before.keys()
+    delta.removed = before.keys() - after.keys()
+    delta.install_changed = {
+        rk
+        for rk, installed in after.items()
+        if rk in before and before[rk] != installed
+    }
+    return delta
+
+
+def _ids(release_keys: Iterable[str]) -> np.ndarray:
+    """Sorted, read-only array of the interned ids of `release_keys`."""
+    ids = np.unique(
+        np.fromiter(
+            (interning.release_keys.intern(rk) for rk in release_keys), dtype=np.int64
+        )
+    )
+    ids.flags.writeable = False
+    return ids
+
+
+def _frozen(ids: np.ndarray) -> np.ndarray:
+    ids.flags.writeable = False
+    return ids
+
+
+def contains(sorted_ids: np.ndarray, rk: np.ndarray) -> np.ndarray:
+    """Boolean mask of the ids in `rk` that are in `sorted_ids`."""
+    if not len(sorted_ids):
+        return np.zeros(len(rk), dtype=bool)
+    at = np.minimum(np.searchsorted(sorted_ids, rk), len(sorted_ids) - 1)
+    return sorted_ids[at] == rk
+
+
+class OwnershipIndex:
+    def __init__(self) -> None:
+        # The library rows each user was last indexed from. `sync_user` compares
+        # by identity, so a cache hit on the same rows costs nothing.
+        self._sources: dict[str, list[dict]] = {}
+        # Sorted release-key ids each user owns, and has installed.
+        self._owned: dict[str, np.ndarray] = {}
+        self._installed: dict[str, np.ndarray] = {}
+        # Reentrant: `sync_user` and `apply_delta` fall back to `set_user`.
+        self._lock = threading.RLock()
+
+    def view(self, user_ids: Iterable[str]) -> OwnershipView:
+        """The libraries of `user_ids` (deduplicated, in order) as one view."""
+        users = list(dict.fromkeys(str(u) for u in user_ids))
+        with self._lock:
+            owned = [self._owned.get(u, _EMPTY) for u in users]
+            installed = [self._installed.get(u, _EMPTY) for u in users]
+        return OwnershipView(users, owned, installed)
+
+    def release_keys(self, user_ids: Iterable[str], require_all: bool) -> set[int]:
+        """Release-key ids owned by any of `user_ids`, or by all of them."""
+        view = self.view(user_ids)
+        ids = view.release_keys(view.user_ids, require_all)
+        return {int(rk) for rk in ids}
+
+    def owners_of(self, rk: int) -> list[str]:
+        """The (sorted) indexed users who own release-key id `rk`."""
+        probe = np.array([rk], dtype=np.int64)
+        with self._lock:
+            libraries = list(self._owned.items())
+        return sorted(
+            user_id for user_id, owned in libraries if contains(owned, probe)[0]
+        )
+
+    def sync_user(self, user_id: str, rows: list[dict]) -> None:
+        """Index `rows` for a user unless they are already the indexed rows."""
+        with self._lock:
+            if self._sources.get(str(user_id)) is rows:
+                return
+            self.set_user(user_id, rows)
+
+    def set_user(self, user_id: str, rows: list[dict]) -> None:
+        """Replace a user's indexed library with `rows`."""
+        owned = _ids(row["release_key"] for row in rows)
+        installed = _ids(row["release_key"] for row in rows if row.get("installed"))
+        with self._lock:
+            self._owned[str(user_id)] = owned
+            self._installed[str(user_id)] = installed
+            self._sources[str(user_id)] = rows
+
+    def apply_delta(self, user_id: str, rows: list[dict], delta: LibraryDelta) -> None:
+        """Move a user's indexed library to `rows` by patching in only the
+        delta's release keys.
+
+        Falls back to a full re-index unless the user is currently indexed from
+        the exact rows the delta was diffed against.
+        """
+        user_id = str(user_id)
+        with self._lock:
+            if self._sources.get(user_id) is not delta.base:
+                self.set_user(user_id, rows)
+                return
+            changed = delta.added | delta.install_changed
+            installed = [
+                row["release_key"]
+                for row in rows
+                if row["release_key"] in changed and row.get("installed")
+            ]
+            owned = self._owned[user_id]
+            owned = np.union1d(
+                owned[~np.isin(owned, _ids(delta.removed))], _ids(delta.added)
+            )
+            dropped = _ids(delta.removed | delta.install_changed)
+            was = self._installed[user_id]
+            self._owned[user_id] = _frozen(owned)
+            self._installed[user_id] = _frozen(
+                np.union1d(was[~np.isin(was, dropped)], _ids(installed))
+            )
+            self._sources[user_id] = rows
+
+
+class OwnershipView:
+    """Owner and installed masks of a fixed set of users, for one query.
+
+    User `user_ids[i]` is bit `i % WORD_BITS` of word `i // WORD_BITS`; a mask
+    is a uint64 array of `words` words, and masks of n releases are an
+    (n, words) array.
+    """
+
+    def __init__(
+        self,
+        user_ids: list[str],
+        owned: list[np.ndarray],
+        installed: list[np.ndarray],
+    ) -> None:
+        self.user_ids = user_ids
+        self._owned = owned
+        self._installed = installed
+        self._position = {user_id: i for i, user_id in enumerate(user_ids)}
+        self.words = max(1, -(-len(user_ids) // WORD_BITS))
+
+    def mask(self, user_ids: Iterable[str]) -> np.ndarray:
+        result = np.zeros(self.words, dtype=np.uint64)
+        for user_id in user_ids:
+            word, bit = divmod(self._position[str(user_id)], WORD_BITS)
+            result[word] |= np.uint64(1) << np.uint64(bit)
+        return result
+
+    def user_ids_of(self, mask: np.ndarray) -> list[str]:
+        """Decode a mask back into (sorted) user ids."""
+        bits = np.unpackbits(
+            mask.astype("<u8").view(np.uint8), bitorder="little"
+        ).nonzero()[0]
+        return sorted(self.user_ids[int(i)] for i in bits)
+
+    def release_keys(self, user_ids: Iterable[str], require_all: bool) -> np.ndarray:
+        """Sorted release-key ids owned by any of `user_ids`, or candidates
+        for being owned by all of them.
+
+        When every user must own a game, only the smallest library is
+        returned; the mask check on each key does the rest.
+        """
+        libraries = [self._owned[self._position[str(u)]] for u in user_ids]
+        if not libraries:
+            return _EMPTY
+        if require_all:
+            return min(libraries, key=len)
+        return np.unique(np.concatenate(libraries))
+
+    def columns(self, rk: np.ndarray, installed: bool = False) -> np.ndarray:
+        """(len(rk), users) booleans: whether each user owns (or has
+        installed) each release."""
+        libraries = self._installed if installed else self._owned
+        if not libraries:
+            return np.zeros((len(rk), 0), dtype=bool)
+        return np.stack([contains(ids, rk) for ids in libraries], axis=1)
+
+    def owner_masks(self, rk: np.ndarray) -> np.ndarray:
+        return self._pack(self.columns(rk))
+
+    def installed_masks(self, rk: np.ndarray) -> np.ndarray:
+        return self._pack(self.columns(rk, installed=True))
+
+    def _pack(self, columns: np.ndarray) -> np.ndarray:
+        padded = np.zeros((len(columns), self.words * WORD_BITS), dtype=bool)
+        padded[:, : columns.shape[1]] = columns
+        packed = np.packbits(padded, axis=1, bitorder="little")
+        return packed.view("<u8").astype(np.uint64, copy=False)
+
+
+def popcount(masks: np.ndarray) -> np.ndarray:
+    """Set bits per mask (the last axis holds a mask's words)."""
+    return np.bitwise_count(masks).sum(axis=-1, dtype=np.int64)
@@ -35,7 +35,17 @@ def _create_tables(settings: Settings) -> None:
     ddb.create_table(
         TableName=settings.users_table,
         KeySchema=[{"AttributeName": "email", "KeyType": "HASH"}],
-        AttributeDefinitions=[{"AttributeName": "email", "AttributeType": "S"}],
+        AttributeDefinitions=[
+            {"AttributeName": "email", "AttributeType": "S"},
+            {"AttributeName": "user_id", "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "user_id-index",
+                "KeySchema": [{"AttributeName": "user_id", "KeyType": "HASH"}],
+                "Projection": {"ProjectionType": "ALL"},
+            }
+        ],
         **common,
     )
     ddb.create_table(
@@ -58,8 +68,8 @@ def _create_tables(settings: Settings) -> None:
         **common,
     )
     for name, pk in [
-        (settings.jobs_table, "job_id"),
         (settings.metadata_table, "slug"),
+        (settings.entities_table, "slug"),
         (settings.profile_pics_table, "user_id"),
         (settings.config_table, "key"),
         (settings.auth_challenges_table, "challenge_id"),
@@ -70,6 +80,22 @@ def _create_tables(settings: Settings) -> None:
             AttributeDefinitions=[{"AttributeName": pk, "AttributeType": "S"}],
             **common,
         )
+    ddb.create_table(
+        TableName=settings.jobs_table,
+        KeySchema=[{"AttributeName": "job_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "job_id", "AttributeType": "S"},
+            {"AttributeName": "active_status", "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "active_status-index",
+                "KeySchema": [{"AttributeName": "active_status", "KeyType": "HASH"}],
+                "Projection": {"ProjectionType": "ALL"},
+            }
+        ],
+        **common,
+    )
     ddb.create_table(
         TableName=settings.passkeys_table,
         KeySchema=[{"AttributeName": "credential_id", "KeyType": "HASH"}],
@@ -0,0 +1,66 @@
+"""Smoke test for the synthetic comparison benchmark script."""
+
+from __future__ import annotations
+
+import importlib
+import json
+import sys
+from pathlib import Path
+
+from gamatrix.games.service import ComparisonQuery, _compare
+
+
+def _load_benchmark(monkeypatch) -> object:
+    scripts_dir = Path(__file__).resolve().parents[1] / "scripts"
+    monkeypatch.syspath_prepend(str(scripts_dir))
+    sys.modules.pop("benchmark_compare", None)
+    return importlib.import_module("benchmark_compare")
+
+
+def test_generator_is_seeded_and_duplicates_across_stores(monkeypatch):
+    bench = _load_benchmark(monkeypatch)
+    size = bench.Size(users=3, games=200)
+
+    first, second = bench.generate(size, 7), bench.generate(size, 7)
+    assert first.libraries == second.libraries
+    assert len(first.games) > size.games  # some games are on several stores
+    assert set(first.libraries) == {u["user_id"] for u in first.users}
+
+
+def test_in_memory_repository_serves_the_comparison(monkeypatch):
+    bench = _load_benchmark(monkeypatch)
+    data = bench.generate(bench.Size(users=2, games=300), 3)
+    repo = bench.InMemoryRepository(data)
+    user_ids = [u["user_id"] for u in data.users]
+
+    dataset = _compare(
+        repo,
+        ComparisonQuery(selected_user_ids=user_ids, include_single_player=True),
+        user_ids,
+        [],
+    )
+    both = set.intersection(
+        *({row["release_key"] for row in rows} for rows in data.libraries.values())
+    )
+    assert {data.games[rk]["slug"] for rk in both} == {
+        item.slug for item in dataset.items
+    }
+
+
+def test_main_writes_json_results(monkeypatch, tmp_path):
+    bench = _load_benchmark(monkeypatch)
+    output = tmp_path / "bench.json"
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["benchmark_compare.py", "--sizes", "3x100", "--repeat", "1"]
+        + ["--output", str(output)],
+    )
+    bench.main()
+
+    report = json.loads(output.read_text())
+    [size] = report["sizes"]
+    assert (size["users"], size["games"]) == (3, 100)
+    assert set(size["queries"]) >= {"shared", "owned", "exclusive", "installed_only"}
+    assert size["queries"]["owned"]["peak_kib"] > 0
+    assert "merge_duplicates" in size["queries"]["shared"]["stages"]
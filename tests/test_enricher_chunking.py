@@ -138,6 +138,12 @@ async def test_redelivered_chunk_does_not_inflate_progress(repo, settings, monke
     assert job["completed_count"] == 3
     assert job["status"] == JOB_COMPLETED
 
+    # A redelivery after the job finished (and was compacted) leaves it alone.
+    await run_job(job_id, repo, settings=settings, chunk_index=0)
+    job = repo.get_job(job_id)
+    assert job["completed_count"] == 3
+    assert job["status"] == JOB_COMPLETED
+
 
 async def test_local_worker_path_runs_whole_job_in_one_pass(
     repo, settings, monkeypatch
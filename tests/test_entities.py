@@ -0,0 +1,117 @@
+"""Tests for the persisted game entity layer."""
+
+from __future__ import annotations
+
+from gamatrix.games.entities import (
+    backfill_entities,
+    rebuild_entities,
+    sync_entities,
+)
+from gamatrix.games.service import ComparisonQuery, compare
+
+
+def _game(rk: str, slug: str, **fields) -> dict:
+    return {
+        "release_key": rk,
+        "title": slug.title(),
+        "slug": slug,
+        "igdb_key": slug,
+        "platform": rk.split("_")[0],
+        "multiplayer": False,
+        "max_players": 0,
+        "rating": 0,
+        **fields,
+    }
+
+
+def test_sync_merges_releases_and_applies_the_override(repo):
+    gog = _game("gog_1", "coop", max_players=2, multiplayer=True, rating=70)
+    steam = _game("steam_1", "coop", max_players=4, multiplayer=True, rating=80)
+    repo.put_game(gog)
+    sync_entities(repo, {"coop"}, [gog])
+    repo.put_game(steam)
+    repo.put_metadata({"slug": "coop", "comment": "Use Hamachi"})
+    # Only the new release is passed; the other is found via the entity.
+    sync_entities(repo, {"coop"}, [steam])
+
+    entity = repo.get_all_entities()["coop"]
+    assert entity["release_keys"] == ["steam_1", "gog_1"]
+    assert entity["preferred_release_key"] == "steam_1"
+    assert entity["max_players"] == 4
+    assert entity["multiplayer"] is True
+    assert entity["rating"] == 80
+    assert entity["comment"] == "Use Hamachi"
+
+
+def test_sync_drops_a_release_that_moved_to_another_slug(repo):
+    before = _game("steam_1", "oldname")
+    repo.put_game(before)
+    sync_entities(repo, {"oldname"}, [before])
+    after = {**before, "slug": "newname"}
+    repo.put_game(after)
+    sync_entities(repo, {"oldname", "newname"}, [after])
+
+    entities = repo.get_all_entities()
+    assert set(entities) == {"newname"}
+    assert entities["newname"]["release_keys"] == ["steam_1"]
+
+
+def test_comparison_reads_display_fields_from_the_entity(repo):
+    repo.put_user({"email": "a@x.com", "username": "A", "user_id": "1"})
+    repo.put_game(_game("steam_1", "coop", max_players=4, multiplayer=True))
+    repo.put_metadata({"slug": "coop", "max_players": 8, "url": "https://x.test"})
+    repo.replace_user_library("1", [{"release_key": "steam_1"}])
+    assert rebuild_entities(repo) == 1
+
+    [item] = compare(repo, ComparisonQuery(selected_user_ids=["1"])).items
+    assert item.max_players == 8
+    assert item.url == "https://x.test"
+
+
+def test_a_new_entity_includes_releases_written_before_it(repo):
+    # Enriched before the entities table existed, so it has no entity.
+    steam = _game("steam_1", "coop", max_players=4, multiplayer=True)
+    repo.put_game(steam)
+    for user_id in ("1", "2"):
+        repo.put_user({"email": f"{user_id}@x.com", "user_id": user_id})
+        repo.replace_user_library(user_id, [{"release_key": "steam_1"}])
+    gog = _game("gog_1", "coop")
+    repo.put_game(gog)
+    sync_entities(repo, {"coop"}, [gog])
+
+    entity = repo.get_all_entities()["coop"]
+    assert entity["release_keys"] == ["steam_1", "gog_1"]
+    assert (entity["max_players"], entity["multiplayer"]) == (4, True)
+    [item] = compare(repo, ComparisonQuery(selected_user_ids=["1", "2"])).items
+    assert item.max_players == 4
+
+
+def test_unmerged_releases_keep_their_own_player_counts(repo):
+    repo.put_game(_game("steam_1", "coop", max_players=4, multiplayer=True))
+    repo.put_game(_game("gog_1", "coop", max_players=2, multiplayer=True))
+    rebuild_entities(repo)
+    for user_id, rk in (("1", "steam_1"), ("2", "gog_1")):
+        repo.put_user({"email": f"{user_id}@x.com", "user_id": user_id})
+        repo.replace_user_library(user_id, [{"release_key": rk}])
+
+    query = ComparisonQuery(selected_user_ids=["1", "2"], scope="owned")
+    players = {g.platforms[0]: g.max_players for g in compare(repo, query).items}
+    assert players == {"steam": 4, "gog": 2}
+
+
+def test_backfill_builds_only_missing_or_incomplete_entities(repo):
+    repo.put_game(_game("steam_1", "coop"))
+    repo.put_game(_game("steam_2", "solo"))
+    sync_entities(repo, {"solo"}, [_game("steam_2", "solo")])
+    untouched = repo.get_all_entities()["solo"]
+    # Written behind the entities' back: a second release and a stale entity.
+    repo.put_game(_game("gog_2", "solo"))
+    repo.write_entities([{**untouched, "slug": "gone"}])
+
+    assert backfill_entities(repo, dry_run=True) == ["coop", "gone", "solo"]
+    assert "coop" not in repo.get_all_entities()
+    assert backfill_entities(repo) == ["coop", "gone", "solo"]
+    entities = repo.get_all_entities()
+    assert set(entities) == {"coop", "solo"}
+    assert entities["solo"]["release_keys"] == ["steam_2", "gog_2"]
+    assert backfill_entities(repo) == []
@@ -2,16 +2,26 @@
 
 from __future__ import annotations
 
+from dataclasses import replace
+
 import pytest
 
 from gamatrix.constants import IGDB_GAME_MODE, JOB_RUNNING
+from gamatrix.games.cache import ResultCache, get_result_cache
 from gamatrix.games.service import (
     ComparisonQuery,
     SortSpec,
+    UnknownGame,
     compare,
     ensure_enrichment_job,
+    overlap,
+    query_key,
+    record_pick,
 )
 from gamatrix.helpers import now_iso
+from gamatrix.storage.dynamo import Repository
+from gamatrix.storage.interning import slugs
+from gamatrix.storage.ownership import diff_library
 from gamatrix.storage.queue import EnrichmentQueue
 
 
@@ -93,6 +103,19 @@ def test_exclude_platform(populated):
     assert titles == {"Coop Game"}
 
 
+def test_exclusive_drops_games_other_users_own(populated):
+    populated.put_user({"email": "c@x.com", "username": "C", "user_id": "3"})
+    populated.replace_user_library(
+        "3", [{"release_key": "gog_12", "platform": "gog", "installed": False}]
+    )
+    result = compare(
+        populated,
+        ComparisonQuery(selected_user_ids=["1", "2"], exclusive=True),
+    )
+    assert {g.title for g in result.items} == {"Coop Game"}
+    assert result.excluded_user_ids == ["3"]
+
+
 def test_sort_by_rating_desc(populated):
     result = compare(
         populated,
@@ -105,6 +128,51 @@ def test_sort_by_rating_desc(populated):
     assert ratings == sorted(ratings, reverse=True)
 
 
+def test_sort_by_installed_desc_breaks_ties_by_title(populated):
+    result = compare(
+        populated,
+        ComparisonQuery(
+            selected_user_ids=["1", "2"],
+            scope="owned",
+            include_single_player=True,
+            sort=SortSpec(field="installed", direction="desc"),
+        ),
+    )
+    # Coop Game and Shared MP are installed by two users each; Solo by nobody.
+    assert [g.title for g in result.items] == ["Coop Game", "Shared MP", "Solo Game"]
+    assert [g.rating for g in result.items] == [90, 75, 0]
+    assert all(isinstance(g.rating, int) for g in result.items)
+
+
+def test_unlisted_store_keeps_its_name_and_sorts_after_known_platforms(repo):
+    repo.put_user({"email": "a@x.com", "username": "A", "user_id": "1"})
+    for rk, platform in (("humble_1", "humble"), ("epic_1", "epic")):
+        repo.put_game(
+            {
+                "release_key": rk,
+                "title": "Indie",
+                "slug": "indie",
+                "igdb_key": "indie",
+                "platform": platform,
+                "multiplayer": True,
+                "max_players": 2,
+            }
+        )
+    repo.replace_user_library(
+        "1",
+        [
+            {"release_key": "humble_1", "platform": "humble", "installed": False},
+            {"release_key": "epic_1", "platform": "epic", "installed": False},
+        ],
+    )
+    result = compare(
+        repo,
+        ComparisonQuery(selected_user_ids=["1"], exclude_platforms=["steam"]),
+    )
+    assert [g.platforms for g in result.items] == [["epic", "humble"]]
+    assert result.items[0].release_key == "epic_1"
+
+
 def test_metadata_override_applied(populated):
     populated.put_metadata(
         {"slug": "coopgame", "max_players": 2, "comment": "Use Hamachi"}
@@ -332,6 +400,297 @@ def test_owned_scope_lists_all_selected_users_games(populated):
     assert titles == {"Coop Game", "Solo Game", "Shared MP"}
 
 
+def test_min_owners_keeps_games_enough_selected_users_own(populated):
+    populated.put_user({"email": "c@x.com", "username": "C", "user_id": "3"})
+    populated.replace_user_library(
+        "3",
+        [
+            {"release_key": "steam_11", "platform": "steam", "installed": True},
+            {"release_key": "gog_12", "platform": "gog", "installed": False},
+        ],
+    )
+    users = ["1", "2", "3"]
+
+    def titles(**kwargs) -> set[str]:
+        query = ComparisonQuery(
+            selected_user_ids=users, include_single_player=True, **kwargs
+        )
+        return {g.title for g in compare(populated, query).items}
+
+    assert titles() == {"Shared MP"}
+    assert titles(min_owners=2) == {"Coop Game", "Solo Game", "Shared MP"}
+    # At least k as many as are selected is plain shared.
+    assert titles(min_owners=5) == {"Shared MP"}
+    # Installed only: at least two selected users have it installed.
+    assert titles(min_owners=2, installed_only=True) == {"Coop Game"}
+
+
+def test_facets_count_each_filter_value_in_the_same_pass(populated):
+    result = compare(
+        populated,
+        ComparisonQuery(selected_user_ids=["1", "2"], exclude_platforms=["gog"]),
+    )
+    counts = result.facets.counts()
+
+    assert [g.title for g in result.items] == ["Coop Game"]
+    # Platform counts ignore the platform exclusions themselves.
+    assert counts["platform"]["steam"] == 1
+    assert counts["platform"]["gog"] == 1
+    assert counts["platform"]["epic"] == 0
+    assert counts["mode"] == {"multiplayer": 1, "single_player": 0}
+    assert counts["installed"] == {"installed": 1}
+    assert counts["players"]["3-4"] == 1
+    assert sum(counts["players"].values()) == result.total
+
+
+def test_title_search_filters_before_items_are_built(populated):
+    def titles(q: str) -> set[str]:
+        query = ComparisonQuery(
+            selected_user_ids=["1"], include_single_player=True, q=q
+        )
+        return {g.title for g in compare(populated, query).items}
+
+    assert titles("game") == {"Coop Game", "Solo Game"}
+    assert titles("shared") == {"Shared MP"}
+    assert titles("") == {"Coop Game", "Solo Game", "Shared MP"}
+
+
+def test_recommended_sort_scores_the_group_and_rotates_recent_picks(populated):
+    query = ComparisonQuery(
+        selected_user_ids=["1", "2"],
+        sort=SortSpec(field="recommended", direction="desc"),
+    )
+    result = compare(populated, query)
+    # Coop Game rates higher and both users have it installed.
+    assert [g.title for g in result.items] == ["Coop Game", "Shared MP"]
+    assert result.items[0].score > result.items[1].score
+
+    record_pick(populated, populated.get_user("a@x.com"), "coopgame")
+    result = compare(populated, query)
+    assert [g.title for g in result.items] == ["Shared MP", "Coop Game"]
+
+
+def test_picks_of_games_outside_the_catalog_are_not_interned(populated):
+    with pytest.raises(UnknownGame):
+        record_pick(populated, populated.get_user("a@x.com"), "no-such-game")
+    assert "recent_picks" not in populated.get_user("a@x.com")
+
+    # Picks stored before slugs were checked are skipped when scoring.
+    populated.update_user(
+        "a@x.com",
+        {"recent_picks": [{"slug": "made-up-slug", "picked_at": now_iso()}]},
+    )
+    query = ComparisonQuery(
+        selected_user_ids=["1", "2"],
+        sort=SortSpec(field="recommended", direction="desc"),
+    )
+    assert [g.title for g in compare(populated, query).items] == [
+        "Coop Game",
+        "Shared MP",
+    ]
+    assert slugs.get("no-such-game") is None
+    assert slugs.get("made-up-slug") is None
+
+
+@pytest.mark.parametrize("field", ["title", "players", "rating", "installed"])
+def test_top_k_matches_the_head_of_the_full_sort(populated, field):
+    query = ComparisonQuery(
+        selected_user_ids=["1", "2"],
+        scope="owned",
+        include_single_player=True,
+        sort=SortSpec(field=field, direction="desc"),
+    )
+    full = compare(populated, query)
+    top = compare(populated, replace(query, top=2))
+    assert top.items == full.items[:2]
+    assert top.total == full.total
+
+
+def test_repeat_query_is_served_from_the_result_cache(populated):
+    first = compare(populated, ComparisonQuery(selected_user_ids=["1", "2"]))
+    again = compare(populated, ComparisonQuery(selected_user_ids=["2", "1"]))
+    assert again is first
+
+
+def test_result_cache_misses_after_library_game_or_override_change(populated):
+    query = ComparisonQuery(selected_user_ids=["1", "2"])
+    first = compare(populated, query)
+
+    populated.replace_user_library(
+        "2", [{"release_key": "steam_10", "platform": "steam", "installed": True}]
+    )
+    after_library = compare(populated, query)
+    assert after_library is not first
+    assert {g.title for g in after_library.items} == {"Coop Game"}
+
+    populated.put_metadata({"slug": "coopgame", "comment": "Use Hamachi"})
+    after_override = compare(populated, query)
+    assert after_override is not after_library
+    assert after_override.items[0].comment == "Use Hamachi"
+
+
+def test_query_key_ignores_listing_order():
+    a = ComparisonQuery(selected_user_ids=["1", "2"], exclude_platforms=["gog", "epic"])
+    b = ComparisonQuery(selected_user_ids=["2", "1"], exclude_platforms=["epic", "gog"])
+    assert query_key(a) == query_key(b)
+    assert query_key(a) != query_key(ComparisonQuery(selected_user_ids=["1"]))
+
+
+def test_result_cache_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2, max_patch_age=60)
+    cache.put("a", 1, "A")
+    cache.put("b", 1, "B")
+    assert cache.get("a", 1) == "A"
+    cache.put("c", 1, "C")
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 2) is None  # stale version
+    assert cache.previous("a").value == "A"
+    assert cache.stats() == {
+        "hits": 1,
+        "misses": 2,
+        "patches": 0,
+        "entries": 2,
+        "max_entries": 2,
+    }
+
+
+@pytest.mark.parametrize(
+    "sort",
+    [
+        SortSpec(),
+        SortSpec(field="title", direction="desc"),
+        SortSpec(field="players", direction="desc"),
+        SortSpec(field="installed", direction="desc"),
+    ],
+)
+def test_patched_result_matches_a_full_recompute(populated, sort):
+    query = ComparisonQuery(
+        selected_user_ids=["1", "2"],
+        scope="owned",
+        include_single_player=True,
+        sort=sort,
+    )
+    compare(populated, query)
+    patches = get_result_cache().patches
+
+    populated.put_game(
+        {
+            "release_key": "gog_13",
+            "title": "New MP",
+            "slug": "newmp",
+            "igdb_key": "gog_13",
+            "platform": "gog",
+            "multiplayer": True,
+            "max_players": 4,
+        }
+    )
+    previous = populated.get_user_library("2")
+    entries = [
+        {"release_key": "steam_10", "platform": "steam", "installed": False},
+        {"release_key": "gog_12", "platform": "gog", "installed": True},
+        {"release_key": "gog_13", "platform": "gog", "installed": True},
+    ]
+    populated.replace_user_library("2", entries, delta=diff_library(previous, entries))
+    populated.put_metadata({"slug": "sharedmp", "max_players": 6})
+
+    patched = compare(populated, query)
+    assert get_result_cache().patches == patches + 1
+    get_result_cache().clear()
+    full = compare(populated, query)
+    assert patched is not full
+    assert patched.items == full.items
+    assert patched.total == full.total
+    assert patched.facets.counts() == full.facets.counts()
+
+
+def test_another_processes_writes_are_patched_in_once_reloaded(populated):
+    query = ComparisonQuery(selected_user_ids=["1", "2"], include_single_player=True)
+    compare(populated, query)
+    patches = get_result_cache().patches
+
+    # The db_parser Lambda ingests a library and an admin overrides a game,
+    # both from other processes; this one reloads them once they expire.
+    other = Repository(settings=populated.settings)
+    other.replace_user_library(
+        "2",
+        [
+            {"release_key": "steam_10", "platform": "steam", "installed": True},
+            {"release_key": "steam_11", "platform": "steam", "installed": True},
+        ],
+    )
+    other.put_metadata({"slug": "coopgame", "max_players": 2})
+    populated._cache.expire("library:2")
+    populated._cache.expire("metadata")
+
+    result = compare(populated, query)
+    assert get_result_cache().patches == patches + 1
+    get_result_cache().clear()
+    full = compare(populated, query)
+    assert result.items == full.items
+    assert {g.title for g in result.items} == {"Coop Game", "Solo Game"}
+
+
+def test_a_change_with_no_cached_base_forces_a_full_recompute(populated):
+    query = ComparisonQuery(selected_user_ids=["1", "2"])
+    compare(populated, query)
+    patches = get_result_cache().patches
+    # Evicted: there's nothing to diff the reloaded library against.
+    populated._cache._remove("library:2")
+    populated.replace_user_library(
+        "2", [{"release_key": "gog_12", "platform": "gog", "installed": True}]
+    )
+    result = compare(populated, query)
+    assert get_result_cache().patches == patches
+    assert {g.title for g in result.items} == {"Shared MP"}
+
+
+@pytest.mark.parametrize("include_single_player", [False, True])
+def test_overlap_matches_pairwise_shared_comparisons(populated, include_single_player):
+    populated.put_user({"email": "c@x.com", "username": "C", "user_id": "3"})
+    populated.replace_user_library(
+        "3",
+        [
+            {"release_key": "steam_11", "platform": "steam", "installed": True},
+            {"release_key": "gog_12", "platform": "gog", "installed": False},
+        ],
+    )
+    query = ComparisonQuery(include_single_player=include_single_player)
+    matrix = overlap(populated, query)
+
+    assert matrix.user_ids == ["1", "2", "3"]
+    for i, a in enumerate(matrix.user_ids):
+        for j, b in enumerate(matrix.user_ids):
+            pair = ComparisonQuery(
+                selected_user_ids=sorted({a, b}),
+                include_single_player=include_single_player,
+            )
+            assert matrix.counts[i][j] == compare(populated, pair).total
+
+
+def test_overlap_counts_a_game_owned_on_two_platforms_once(repo):
+    repo.put_user({"email": "a@x.com", "username": "A", "user_id": "1"})
+    repo.put_user({"email": "b@x.com", "username": "B", "user_id": "2"})
+    for rk in ("steam_1", "gog_1"):
+        repo.put_game(
+            {
+                "release_key": rk,
+                "title": "Twice",
+                "slug": "twice",
+                "igdb_key": "twice",
+                "platform": rk.split("_")[0],
+                "multiplayer": True,
+                "max_players": 4,
+            }
+        )
+    both = [{"release_key": "steam_1"}, {"release_key": "gog_1"}]
+    repo.replace_user_library("1", both)
+    repo.replace_user_library("2", both)
+
+    assert overlap(repo, ComparisonQuery()).counts == [[1, 1], [1, 1]]
+    gog_only = ComparisonQuery(exclude_platforms=["steam"], selected_user_ids=["2"])
+    assert overlap(repo, gog_only).counts == [[1]]
+
+
 def test_ensure_enrichment_job_reuses_active_job(repo, settings):
     repo.put_job(
         {
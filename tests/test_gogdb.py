@@ -9,6 +9,7 @@
 
 from gamatrix.gogdb.ingest import ingest_db_file
 from gamatrix.gogdb.parser import GogDBParser, is_sqlite3
+from gamatrix.storage.interning import release_keys
 from gamatrix.storage.queue import EnrichmentQueue
 
 
@@ -221,3 +222,45 @@ def test_ingest_writes_db_updated_at_to_user_record(gog_db, repo, settings):
     assert user is not None
     assert user.get("db_updated_at") is not None
     assert user["db_updated_at"] != "never"
+
+
+def test_reingest_only_rewrites_changed_stubs_and_patches_the_index(
+    gog_db, repo, settings, monkeypatch
+):
+    queue = EnrichmentQueue(settings=settings)
+    ingest_db_file(gog_db, repo, queue)
+    index = repo.get_ownership_index(["12345"])
+
+    writes: list[str] = []
+    put_game = repo.put_game
+    monkeypatch.setattr(
+        repo,
+        "put_game",
+        lambda game: writes.append(game["release_key"]) or put_game(game),
+    )
+
+    def rebuild(*args):
+        pytest.fail("re-ingest rebuilt the ownership index")
+
+    monkeypatch.setattr(index, "set_user", rebuild)
+    library_reads: list[dict] = []
+    query_all = repo._query_all
+    monkeypatch.setattr(
+        repo,
+        "_query_all",
+        lambda table, *args, **kwargs: (
+            table == repo.settings.libraries_table and library_reads.append(kwargs)
+        )
+        or query_all(table, *args, **kwargs),
+    )
+    ingest_db_file(gog_db, repo, queue)
+
+    assert writes == []
+    # The cached library the diff was taken from is what the replace writes
+    # against; the stored library isn't read again.
+    assert library_reads == []
+    rows = repo.get_user_library("12345")
+    assert index.owners_of(release_keys.intern("gog_2")) == ["12345"]
+    assert index.release_keys(["12345"], require_all=True) == {
+        release_keys.intern(row["release_key"]) for row in rows
+    }
@@ -141,3 +141,79 @@ def test_completed_count_sums_chunks_without_clobbering(repo):
     progress = repo.set_chunk_progress("j1", "1", 2)
     assert progress == {"0": 2, "1": 2}
     assert repo.get_job("j1")["completed_count"] == 4
+
+
+def test_only_active_jobs_are_in_the_status_index(repo, monkeypatch):
+    _job(repo, job_id="queued", status=JOB_PENDING)
+    _job(repo, job_id="busy", created_at=_ago(1), updated_at=now_iso())
+    _job(repo, job_id="done", status=JOB_COMPLETED)
+
+    # Finding active jobs never falls back to reading the whole table.
+    monkeypatch.setattr(repo, "_scan", None)
+    assert [j["job_id"] for j in repo.list_pending_jobs()] == ["queued"]
+    assert repo.get_active_job()["job_id"] == "queued"
+
+    repo.update_job("queued", {"status": JOB_RUNNING})
+    assert repo.list_pending_jobs() == []
+    repo.update_job("queued", {"status": JOB_COMPLETED, "completed_at": now_iso()})
+    assert "active_status" not in repo.get_job("queued")
+    assert repo.get_active_job()["job_id"] == "busy"
+
+
+def test_backfill_puts_jobs_from_before_the_index_into_it(repo):
+    table = repo._table(repo.settings.jobs_table)
+    # Written before the index existed: no active_status.
+    for job_id, status in (("old", JOB_PENDING), ("done", JOB_COMPLETED)):
+        table.put_item(
+            Item={"job_id": job_id, "status": status, "created_at": now_iso()}
+        )
+    assert repo.list_pending_jobs() == []
+
+    assert repo.backfill_active_status(dry_run=True) == ["old"]
+    assert repo.list_pending_jobs() == []
+    assert repo.backfill_active_status() == ["old"]
+    assert [j["job_id"] for j in repo.list_pending_jobs()] == ["old"]
+    assert "active_status" not in repo.get_job("done")
+    assert repo.backfill_active_status() == []
+
+
+def test_finished_jobs_expire_and_drop_their_key_list(repo):
+    _job(repo, job_id="j1")
+    finished = datetime.now(timezone.utc)
+    repo.finish_job("j1", JOB_COMPLETED, completed_at=finished.isoformat())
+
+    job = repo.get_job("j1")
+    assert "release_keys" not in job
+    assert job["total"] == 2
+    retention = repo.settings.job_retention_days
+    assert job["expires_at"] == int((finished + timedelta(days=retention)).timestamp())
+
+
+def test_retention_can_keep_finished_jobs_whole(repo):
+    repo.settings = repo.settings.model_copy(
+        update={"job_retention_days": 0, "compact_finished_jobs": False}
+    )
+    _job(repo, job_id="j1")
+    repo.finish_job("j1", JOB_FAILED)
+
+    job = repo.get_job("j1")
+    assert job["release_keys"] == ["steam_1", "steam_2"]
+    assert "expires_at" not in job
+
+
+def test_only_finish_job_applies_retention(repo):
+    _job(repo, job_id="j1")
+    repo.update_job("j1", {"status": JOB_COMPLETED, "completed_at": now_iso()})
+    job = repo.get_job("j1")
+    assert job["release_keys"] == ["steam_1", "steam_2"]
+    assert "expires_at" not in job and "active_status" not in job
+
+    # Reaping a presumed-dead job expires it but keeps its keys.
+    _job(repo, job_id="j2", created_at=_ago(JOB_TIMEOUT_MINUTES + 5))
+    assert repo.fail_stale_jobs() == ["j2"]
+    reaped = repo.get_job("j2")
+    assert reaped["status"] == JOB_FAILED
+    assert reaped["release_keys"] == ["steam_1", "steam_2"]
+    assert "expires_at" in reaped
+
+    assert {j["job_id"] for j in repo.list_finished_jobs()} == {"j1", "j2"}
@@ -151,6 +151,7 @@ def test_init_local_main_creates_local_stack_state_and_is_idempotent(
                     settings.libraries_table,
                     settings.jobs_table,
                     settings.metadata_table,
+                    settings.entities_table,
                     settings.profile_pics_table,
                     settings.config_table,
                     settings.passkeys_table,
@@ -172,6 +173,42 @@ def test_init_local_main_creates_local_stack_state_and_is_idempotent(
             dynamo._repo = original_repo
 
 
+def test_init_local_adds_indexes_missing_from_existing_tables(monkeypatch):
+    init_local = _load_script(monkeypatch, "init_local")
+    settings = _local_settings("localdev-upgrade")
+
+    with mock_aws():
+        ddb = boto3.client("dynamodb", region_name=settings.aws_region)
+        # Tables as created before their GSIs were added.
+        for defn in init_local._table_defs(settings):
+            if defn["TableName"] not in (settings.users_table, settings.jobs_table):
+                continue
+            key = defn["KeySchema"][0]["AttributeName"]
+            ddb.create_table(
+                TableName=defn["TableName"],
+                KeySchema=defn["KeySchema"],
+                AttributeDefinitions=[{"AttributeName": key, "AttributeType": "S"}],
+                BillingMode="PAY_PER_REQUEST",
+            )
+        ddb.put_item(
+            TableName=settings.users_table,
+            Item={"email": {"S": "a@x.com"}, "user_id": {"S": "1"}},
+        )
+
+        init_local.create_tables(settings)
+
+        for table, index in (
+            (settings.users_table, "user_id-index"),
+            (settings.jobs_table, "active_status-index"),
+        ):
+            described = ddb.describe_table(TableName=table)["Table"]
+            assert [i["IndexName"] for i in described["GlobalSecondaryIndexes"]] == [
+                index
+            ]
+        repo = Repository(settings=settings)
+        assert repo.get_user_by_user_id("1")["email"] == "a@x.com"
+
+
 def test_init_local_main_can_skip_default_user_seeding(monkeypatch, tmp_path):
     init_local = _load_script(monkeypatch, "init_local")
     config_dir = tmp_path / "configs"
@@ -259,3 +296,55 @@ def stop_after_one_poll(_seconds: int) -> None:
     assert processed == ["pending-job"]
     assert repo.get_job("pending-job")["status"] == JOB_COMPLETED
     assert repo.get_job("done-job")["status"] == JOB_COMPLETED
+
+
+def test_benchmark_scan_times_each_segment_count(repo, monkeypatch, tmp_path):
+    benchmark_scan = _load_script(monkeypatch, "benchmark_scan")
+    output = tmp_path / "scan.json"
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["benchmark_scan.py", "--items", "40", "--segments", "1,3", "--repeat", "1"]
+        + ["--drop", "--output", str(output)],
+    )
+    benchmark_scan.main()
+
+    report = json.loads(output.read_text())
+    assert [run["segments"] for run in report["runs"]] == [1, 3]
+    assert all(run["items"] == 40 for run in report["runs"])
+
+
+def test_compact_jobs_retires_jobs_finished_before_the_policy(repo, monkeypatch):
+    compact_jobs = _load_script(monkeypatch, "compact_jobs")
+    old = {
+        "job_id": "old",
+        "status": JOB_COMPLETED,
+        "created_at": "2026-01-01T00:00:00+00:00",
+        "completed_at": "2026-01-02T00:00:00+00:00",
+        "release_keys": ["steam_1"],
+        "total": 1,
+        "completed_count": 1,
+    }
+    # Written as before the policy: straight to the table, keys and no TTL.
+    repo._table(repo.settings.jobs_table).put_item(Item=old)
+    # And one still queued from before the active index.
+    repo._table(repo.settings.jobs_table).put_item(
+        Item={**old, "job_id": "queued", "status": JOB_PENDING}
+    )
+    repo.put_job({**old, "job_id": "live", "status": JOB_PENDING})
+    monkeypatch.setattr(compact_jobs, "get_settings", lambda: repo.settings)
+
+    monkeypatch.setattr(sys, "argv", ["compact_jobs.py", "--dry-run"])
+    compact_jobs.main()
+    assert "expires_at" not in repo.get_job("old")
+    assert "active_status" not in repo.get_job("queued")
+
+    monkeypatch.setattr(sys, "argv", ["compact_jobs.py"])
+    compact_jobs.main()
+    retired = repo.get_job("old")
+    assert "release_keys" not in retired
+    assert retired["expires_at"] == 1767312000 + 30 * 86400  # finished + 30 days
+    assert repo.get_job("live")["release_keys"] == ["steam_1"]
+    assert compact_jobs.unretired_jobs(repo) == []
+    pending = {j["job_id"] for j in repo.list_pending_jobs()}
+    assert pending == {"live", "queued"}
@@ -0,0 +1,281 @@
+"""Tests for Repository reads beyond the read-model cache (scans, batch gets)."""
+
+from __future__ import annotations
+
+import pytest
+
+
+def test_segmented_scan_reads_every_item_once(repo):
+    table = repo._table(repo.settings.games_table)
+    with table.batch_writer() as batch:
+        for n in range(120):
+            batch.put_item(Item={"release_key": f"steam_{n}", "title": f"G{n}"})
+
+    serial = repo._scan(repo.settings.games_table)
+    segmented = repo._scan(repo.settings.games_table, segments=4)
+    assert len(segmented) == 120
+    assert sorted(g["release_key"] for g in segmented) == sorted(
+        g["release_key"] for g in serial
+    )
+    assert set(repo.get_all_games_map()) == {f"steam_{n}" for n in range(120)}
+
+
+def test_games_map_holds_only_the_comparison_columns(repo):
+    repo.put_game(
+        {
+            "release_key": "steam_1",
+            "slug": "one",
+            "title": "One",
+            "rating": 80,
+            "igdb_id": 42,
+            "enriched_at": "2026-01-01T00:00:00+00:00",
+            "summary": "long text",
+        }
+    )
+
+    row = repo.get_all_games_map()["steam_1"]
+    assert row == {
+        "release_key": "steam_1",
+        "slug": "one",
+        "title": "One",
+        "rating": 80,
+    }
+    # Uncached full-row reads are unaffected.
+    [full] = repo.scan_all_games()
+    assert full["igdb_id"] == 42
+    assert repo.scan_all_games(projection=["release_key", "summary"]) == [
+        {"release_key": "steam_1", "summary": "long text"}
+    ]
+
+
+def test_library_reads_and_write_through_are_projected(repo):
+    entries = [
+        {"release_key": "steam_1", "installed": True, "db_updated_at": "now"},
+        {"release_key": "gog_2", "platform": "gog"},
+    ]
+    repo.replace_user_library("1", entries)
+    cached = repo.get_user_library("1")
+
+    repo._cache_invalidate("library:1")
+    loaded = repo.get_user_library("1")
+    expected = [
+        {"user_id": "1", "release_key": "gog_2"},
+        {"user_id": "1", "release_key": "steam_1", "installed": True},
+    ]
+    assert sorted(cached, key=lambda r: r["release_key"]) == expected
+    assert sorted(loaded, key=lambda r: r["release_key"]) == expected
+
+
+def _put_games(repo, count: int) -> list[str]:
+    keys = [f"steam_{n}" for n in range(count)]
+    with repo._table(repo.settings.games_table).batch_writer() as batch:
+        for key in keys:
+            batch.put_item(Item={"release_key": key, "title": key, "rating": 50})
+    return keys
+
+
+def test_batch_get_retries_unprocessed_keys(repo, monkeypatch):
+    keys = _put_games(repo, 250)
+    client = repo._resource.meta.client
+    batch_get_item = client.batch_get_item
+    calls = []
+
+    def throttled(RequestItems):
+        # Every first request for a chunk leaves its last 10 keys unprocessed.
+        [(table, request)] = RequestItems.items()
+        calls.append(len(request["Keys"]))
+        if len(request["Keys"]) <= 10:
+            return batch_get_item(RequestItems=RequestItems)
+        done = {**request, "Keys": request["Keys"][:-10]}
+        resp = batch_get_item(RequestItems={table: done})
+        resp["UnprocessedKeys"] = {table: {**request, "Keys": request["Keys"][-10:]}}
+        return resp
+
+    monkeypatch.setattr(client, "batch_get_item", throttled)
+    games = repo.batch_get_games(keys + ["missing_1"], projection=["title"])
+
+    assert set(games) == set(keys)
+    assert games["steam_7"] == {"release_key": "steam_7", "title": "steam_7"}
+    assert sorted(calls) == [10, 10, 10, 51, 100, 100]
+
+
+def test_batch_get_raises_when_keys_stay_unprocessed(repo, monkeypatch):
+    from gamatrix.storage import dynamo
+
+    keys = _put_games(repo, 3)
+    client = repo._resource.meta.client
+    monkeypatch.setattr(dynamo, "_BATCH_GET_BASE_DELAY", 0.0)
+    monkeypatch.setattr(
+        client,
+        "batch_get_item",
+        lambda RequestItems: {"Responses": {}, "UnprocessedKeys": RequestItems},
+    )
+
+    with pytest.raises(dynamo.UnprocessedKeysError):
+        repo.batch_get_games(keys)
+
+
+async def test_async_repository_prefetches_the_read_model_concurrently(repo):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from gamatrix.storage.aio import AsyncRepository
+
+    repo.put_user({"email": "a@x.com", "username": "A", "user_id": "1"})
+    repo.replace_user_library("1", [{"release_key": "steam_1", "installed": True}])
+    repo._cache_invalidate("users", "library:1")
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        arepo = AsyncRepository(repo, executor)
+        await arepo.prefetch_read_model(["1", "1"])
+        before = repo.cache_stats()
+        users = await arepo.scan_users()
+        assert await arepo.run(repo.get_user_library, "1") == [
+            {"user_id": "1", "release_key": "steam_1", "installed": True}
+        ]
+
+    assert [u["email"] for u in users] == ["a@x.com"]
+    stats = repo.cache_stats()
+    for family in ("users", "games_map", "metadata", "entities", "library"):
+        assert stats[family]["loads"] == before[family]["loads"]
+    assert before["library"]["loads"] == 1  # the prefetch, once per user
+
+
+@pytest.fixture
+def packed(repo):
+    repo.settings = repo.settings.model_copy(update={"library_layout": "packed"})
+    return repo
+
+
+def _library_items(repo, user_id: str) -> list[dict]:
+    from boto3.dynamodb.conditions import Key
+
+    return repo._table(repo.settings.libraries_table).query(
+        KeyConditionExpression=Key("user_id").eq(user_id)
+    )["Items"]
+
+
+def test_packed_library_is_one_item_read_back_in_full(packed):
+    entries = [
+        {"release_key": f"steam_{n}", "installed": n % 3 == 0} for n in range(500)
+    ]
+    packed.replace_user_library("1", entries + [{"release_key": "gog_1"}])
+
+    [item] = _library_items(packed, "1")
+    assert (item["release_key"], item["shards"], item["entries"]) == (
+        "#library#0",
+        1,
+        501,
+    )
+    packed._cache_invalidate("library:1")
+    rows = packed.get_user_library("1")
+    assert len(rows) == 501
+    assert rows[3] == {"user_id": "1", "release_key": "steam_3", "installed": True}
+    assert rows[-1] == {"user_id": "1", "release_key": "gog_1", "installed": False}
+
+
+def test_packed_write_replaces_row_layout_items_and_surplus_shards(packed, monkeypatch):
+    from gamatrix.storage import library
+
+    # Rows written under the row layout are read until the library is repacked.
+    packed.settings = packed.settings.model_copy(update={"library_layout": "rows"})
+    packed.replace_user_library("1", [{"release_key": "steam_1", "installed": True}])
+    packed.settings = packed.settings.model_copy(update={"library_layout": "packed"})
+    packed._cache_invalidate("library:1")
+    assert [r["release_key"] for r in packed.get_user_library("1")] == ["steam_1"]
+
+    pack = library.pack
+    # Tiny shards, so a few hundred entries take several.
+    monkeypatch.setattr(library, "pack", lambda rows: pack(rows, 200))
+    packed.replace_user_library("1", [{"release_key": f"gog_{n}"} for n in range(300)])
+    assert len(_library_items(packed, "1")) > 1
+    monkeypatch.undo()
+
+    packed.replace_user_library("1", [{"release_key": "epic_9"}])
+    assert [i["release_key"] for i in _library_items(packed, "1")] == ["#library#0"]
+    packed._cache_invalidate("library:1")
+    assert [r["release_key"] for r in packed.get_user_library("1")] == ["epic_9"]
+    assert packed.clear_user_library("1") == 1
+    assert _library_items(packed, "1") == []
+
+
+def test_owners_of_a_release_with_packed_libraries(packed):
+    for user_id in ("1", "2", "3"):
+        packed.put_user({"email": f"{user_id}@x.com", "user_id": user_id})
+    packed.replace_user_library("1", [{"release_key": "steam_1"}])
+    packed.replace_user_library("2", [{"release_key": "steam_1"}])
+    packed.replace_user_library("3", [{"release_key": "gog_2"}])
+
+    assert sorted(packed.get_owners_of_release("steam_1")) == ["1", "2"]
+    assert packed.get_owners_of_release("steam_404") == []
+
+
+def test_replace_library_writes_only_changed_rows(repo):
+    first = [
+        {"release_key": "steam_1", "installed": True, "platform": "steam"},
+        {"release_key": "steam_2", "platform": "steam"},
+        {"release_key": "gog_3", "platform": "gog"},
+    ]
+    changes = repo.replace_user_library("1", first)
+    assert changes.added == {"steam_1", "steam_2", "gog_3"}
+
+    # steam_2's install state is unchanged, so its new platform isn't written.
+    changes = repo.replace_user_library(
+        "1",
+        [
+            {"release_key": "steam_1", "installed": False},
+            {"release_key": "steam_2", "platform": "other"},
+            {"release_key": "epic_4"},
+        ],
+    )
+    assert (changes.added, changes.removed, changes.install_changed) == (
+        {"epic_4"},
+        {"gog_3"},
+        {"steam_1"},
+    )
+    items = {i["release_key"]: i for i in _library_items(repo, "1")}
+    assert sorted(items) == ["epic_4", "steam_1", "steam_2"]
+    assert items["steam_2"]["platform"] == "steam"
+    assert items["steam_1"]["installed"] is False
+
+
+def test_unchanged_packed_library_is_not_rewritten(packed):
+    entries = [{"release_key": "steam_1", "installed": True}]
+    packed.replace_user_library("1", entries)
+    [before] = _library_items(packed, "1")
+
+    changes = packed.replace_user_library("1", entries)
+    assert not changes.release_keys
+    assert _library_items(packed, "1") == [before]
+
+    changes = packed.replace_user_library("1", entries + [{"release_key": "gog_2"}])
+    assert changes.added == {"gog_2"}
+    [after] = _library_items(packed, "1")
+    assert after["generation"] != before["generation"]
+
+
+def test_user_lookup_by_user_id_queries_the_index_when_cold(repo, monkeypatch):
+    repo.put_user({"email": "A@x.com", "user_id": 7, "username": "a"})
+    repo.put_user({"email": "b@x.com", "user_id": None, "username": "b"})
+
+    monkeypatch.setattr(repo, "_scan", None)  # a cold lookup must not scan
+    assert repo.get_user_by_user_id("7")["email"] == "a@x.com"
+    assert repo.get_user_by_user_id("8") is None
+    monkeypatch.undo()
+
+    index = repo.users_by_user_id()
+    assert list(index) == ["7"]  # unlinked users are left out
+    assert repo.users_by_user_id() is index
+    assert repo.get_user_by_user_id("7") is index["7"]
+    repo.update_user("b@x.com", {"user_id": 8})
+    assert sorted(repo.users_by_user_id()) == ["7", "8"]
+
+
+def test_user_lookup_by_user_id_scans_a_table_without_the_index(repo):
+    repo.put_user({"email": "a@x.com", "user_id": 7, "username": "a"})
+    # A users table created before user_id-index was added.
+    repo._client.update_table(
+        TableName=repo.settings.users_table,
+        GlobalSecondaryIndexUpdates=[{"Delete": {"IndexName": "user_id-index"}}],
+    )
+
+    assert repo.get_user_by_user_id("7")["email"] == "a@x.com"
+    assert repo.get_user_by_user_id("8") is None
@@ -9,6 +9,25 @@
 
 from __future__ import annotations
 
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from gamatrix.storage.cache import (
+    ReadCache,
+    RedisCache,
+    SQLiteCache,
+    approximate_size,
+    decode_entry,
+    encode_entry,
+)
+from gamatrix.storage.dynamo import Repository
+from gamatrix.storage.interning import release_keys, slugs
+from gamatrix.storage.ownership import OwnershipIndex, popcount
+
 
 def test_games_map_caches_until_a_game_is_written(repo):
     repo.put_game({"release_key": "steam_1", "slug": "one", "title": "One"})
@@ -56,6 +75,21 @@ def test_user_library_caches_per_user_and_invalidates_on_replace(repo):
     assert {row["release_key"] for row in refreshed} == {"steam_1", "steam_2"}
 
 
+def test_merged_duplicate_entries_are_cached_under_the_user(repo):
+    repo.replace_user_library(
+        "1",
+        [
+            {"release_key": "steam_1", "installed": False, "platform": "steam"},
+            {"release_key": "steam_1", "installed": True, "title": "One"},
+        ],
+    )
+    rows = repo._cache.get("library:1")
+    assert rows is repo.get_user_library("1")
+    assert [(row["release_key"], row["installed"]) for row in rows] == [
+        ("steam_1", True)
+    ]
+
+
 def test_user_library_invalidates_on_clear(repo):
     repo.replace_user_library("1", [{"release_key": "steam_1", "installed": False}])
     assert repo.get_user_library("1")  # populate cache
@@ -80,3 +114,405 @@ def test_ttl_zero_disables_caching(repo):
     repo.put_game({"release_key": "steam_1", "slug": "one", "title": "One"})
     # With caching off every read re-scans, so no two calls share identity.
     assert repo.get_all_games_map() is not repo.get_all_games_map()
+
+
+def test_read_cache_evicts_least_recently_used_past_its_budget():
+    row = {"release_key": "steam_1", "title": "x" * 100}
+    size = approximate_size([row] * 10)
+    cache = ReadCache(max_bytes=size * 2 + size // 2)
+    for user_id in ("1", "2"):
+        cache.put(f"library:{user_id}", [row] * 10, ttl=60)
+    assert cache.get("library:1") is not None  # now most recently used
+
+    cache.put("library:3", [row] * 10, ttl=60)
+    assert cache.get("library:2") is None
+    assert cache.get("library:1") is not None
+    assert cache.bytes <= cache.max_bytes
+
+    # Too big for the whole budget: not kept, and counted as an eviction.
+    cache.put("games_map", {str(n): row for n in range(100)}, ttl=60)
+    assert cache.get("games_map") is None
+
+    stats = cache.stats()
+    assert stats["library"] == {
+        "hits": 2,
+        "misses": 1,
+        "loads": 0,
+        "load_seconds": 0.0,
+        "shared_hits": 0,
+        "stale_hits": 0,
+        "refreshes": 0,
+        "evictions": 1,
+        "entries": 2,
+        "bytes": 2 * size,
+    }
+    assert stats["games_map"]["evictions"] == 1
+
+
+def test_an_expired_entry_misses_but_is_kept_until_replaced():
+    cache = ReadCache(max_bytes=0)
+    cache.put("users", [{"email": "a@x.com"}], ttl=60)
+    cache.expire("users")
+    assert cache.lookup("users", max_stale=60) is None
+    assert cache.peek("users") == [{"email": "a@x.com"}]
+    assert cache.stats()["users"]["entries"] == 1
+
+
+def test_approximate_size_extrapolates_from_a_sample():
+    rows = [{"release_key": f"steam_{n:05d}", "installed": False} for n in range(5000)]
+    exact = sys.getsizeof(rows) + sum(
+        sys.getsizeof(row)
+        + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in row.items())
+        for row in rows
+    )
+    assert abs(approximate_size(rows) - exact) < exact * 0.05
+
+
+def test_cache_stats_count_loads_per_family(repo):
+    repo.put_user({"email": "a@x.com", "username": "A", "user_id": "1"})
+    repo.scan_users()
+    repo.scan_users()
+    repo.get_all_games_map()
+
+    stats = repo.cache_stats()
+    assert stats["users"]["loads"] == 1
+    assert stats["users"]["misses"] == 1
+    assert stats["users"]["hits"] == 1
+    assert stats["users"]["load_seconds"] > 0
+    assert stats["games_map"]["loads"] == 1
+
+
+def test_ownership_index_tracks_library_writes(repo):
+    repo.replace_user_library(
+        "1",
+        [
+            {"release_key": "steam_1", "installed": True},
+            {"release_key": "gog_2", "installed": False},
+        ],
+    )
+    repo.replace_user_library("2", [{"release_key": "steam_1", "installed": False}])
+    steam_1 = release_keys.intern("steam_1")
+    gog_2 = release_keys.intern("gog_2")
+
+    index = repo.get_ownership_index(["1", "2"])
+    view = index.view(["1", "2"])
+    rk = np.array([steam_1, gog_2])
+    assert view.user_ids_of(view.owner_masks(rk)[0]) == ["1", "2"]
+    assert view.user_ids_of(view.installed_masks(rk)[0]) == ["1"]
+    assert index.owners_of(gog_2) == ["1"]
+
+    # Replacing a library moves the user's bits; clearing removes them.
+    repo.replace_user_library("1", [{"release_key": "gog_2", "installed": True}])
+    assert index.owners_of(steam_1) == ["2"]
+    view = index.view(["1", "2"])
+    assert (view.installed_masks(rk)[1] == view.mask(["1"])).all()
+
+    repo.clear_user_library("2")
+    assert index.owners_of(steam_1) == []
+    assert repo.get_ownership_index(["1", "2"]) is index
+
+
+def test_ownership_view_masks_span_more_than_one_word():
+    index = OwnershipIndex()
+    users = [str(u) for u in range(70)]
+    for user_id in users:
+        index.set_user(user_id, [{"release_key": "steam_1", "installed": True}])
+    index.set_user("69", [{"release_key": "gog_2"}])
+
+    view = index.view(users)
+    assert view.words == 2
+    owners = view.owner_masks(
+        np.array([release_keys.intern("steam_1"), release_keys.intern("gog_2")])
+    )
+    assert owners.dtype == np.uint64 and owners.shape == (2, 2)
+    assert popcount(owners).tolist() == [69, 1]
+    assert view.user_ids_of(owners[1]) == ["69"]
+    assert ((owners[0] & view.mask(["0", "68"])) == view.mask(["0", "68"])).all()
+
+
+def test_ownership_index_resyncs_when_the_library_cache_reloads(repo):
+    repo.replace_user_library("1", [{"release_key": "steam_1", "installed": False}])
+    index = repo.get_ownership_index(["1"])
+
+    # Another process rewrote the library; once our cached copy expires the
+    # next read re-indexes from the fresh rows.
+    repo._table(repo.settings.libraries_table).put_item(
+        Item={"user_id": "1", "release_key": "steam_2", "installed": True}
+    )
+    repo._cache_invalidate("library:1")
+    index = repo.get_ownership_index(["1"])
+    owned = index.release_keys(["1"], require_all=False)
+    assert {release_keys.key(rk) for rk in owned} == {"steam_1", "steam_2"}
+    view = index.view(["1"])
+    installed = view.installed_masks(np.array([release_keys.intern("steam_2")]))
+    assert view.user_ids_of(installed[0]) == ["1"]
+
+
+def test_reloads_log_how_they_differ_from_the_entry_they_replace(repo):
+    repo.put_user({"email": "a@x.com", "username": "A", "user_id": "1"})
+    repo.put_game({"release_key": "steam_1", "slug": "one", "title": "One"})
+    repo.put_game({"release_key": "steam_2", "slug": "two", "title": "Two"})
+    repo.replace_user_library("1", [{"release_key": "steam_1", "installed": False}])
+    version = repo.read_model_version(["1"])
+
+    # Written by other processes (the db_parser Lambda ingests libraries),
+    # and picked up here once the cached copies expire.
+    repo._table(repo.settings.libraries_table).put_item(
+        Item={"user_id": "1", "release_key": "steam_2", "installed": True}
+    )
+    repo._table(repo.settings.users_table).put_item(
+        Item={"email": "a@x.com", "username": "Renamed", "user_id": "1"}
+    )
+    for key in ("users", "games_map", "library:1"):
+        repo._cache.expire(key)
+    reloaded = repo.read_model_version(["1"])
+    assert reloaded != version
+    assert repo.changed_slugs(version, reloaded) == {"two"}
+
+    # Another user linked: which rows that changes isn't a matter of slugs.
+    repo.put_user({"email": "b@x.com", "username": "B", "user_id": "2"})
+    assert repo.changed_slugs(reloaded, repo.read_model_version(["1"])) is None
+
+
+def test_client_pool_has_a_connection_per_worker_thread(settings):
+    settings = settings.model_copy(
+        update={
+            "repository_workers": 16,
+            "scan_segments": 8,
+            "batch_get_concurrency": 3,
+        }
+    )
+    client = Repository(settings=settings)._client
+    assert client.meta.config.max_pool_connections == 27
+
+
+def test_concurrent_requests_share_one_repository(repo):
+    # games_page gathers several repository calls onto worker threads at once.
+    users = [str(u) for u in range(6)]
+
+    def request(user_id: str) -> None:
+        for n in range(5):
+            repo.replace_user_library(
+                user_id, [{"release_key": f"steam_{n}", "installed": n % 2 == 0}]
+            )
+            repo.read_model_version(users)
+            repo.get_ownership_index(users).view(users)
+
+    with ThreadPoolExecutor(max_workers=len(users)) as pool:
+        list(pool.map(request, users))
+
+    index = repo.get_ownership_index(users)
+    assert index.owners_of(release_keys.intern("steam_4")) == users
+    assert index.owners_of(release_keys.intern("steam_3")) == []
+    version = repo.read_model_version(users)
+    assert repo.changed_slugs(version, version) == set()
+
+
+def test_a_load_never_overwrites_a_write_made_while_it_read(repo, monkeypatch):
+    repo.replace_user_library("1", [{"release_key": "steam_1"}])
+    repo._cache_invalidate("library:1")
+    read = repo._read_library
+
+    def slow_read(user_id):
+        rows = read(user_id)
+        # Another request replaces the library after this read.
+        repo.replace_user_library("1", [{"release_key": "steam_2"}])
+        return rows
+
+    monkeypatch.setattr(repo, "_read_library", slow_read)
+    assert [r["release_key"] for r in repo.get_user_library("1")] == ["steam_1"]
+    monkeypatch.setattr(repo, "_read_library", read)
+    assert [r["release_key"] for r in repo.get_user_library("1")] == ["steam_2"]
+
+
+def test_interned_views_follow_the_cached_maps(repo):
+    repo.put_game({"release_key": "steam_1", "slug": "one", "title": "One"})
+    repo.put_metadata({"slug": "one", "max_players": 4})
+
+    games = repo.get_games_by_id()
+    assert repo.get_games_by_id() is games  # derived once per cached map
+    game = games[release_keys.intern("steam_1")]
+    assert game.slug_id == slugs.intern("one")
+    assert game.row["title"] == "One"
+    assert repo.get_metadata_by_slug_id()[slugs.intern("one")]["max_players"] == 4
+
+    repo.put_game({"release_key": "steam_2", "slug": "two", "title": "Two"})
+    assert repo.get_games_by_id() is not games
+    assert release_keys.intern("steam_2") in repo.get_games_by_id()
+
+
+@pytest.fixture
+def shared_settings(settings, tmp_path):
+    return settings.model_copy(
+        update={
+            "read_cache_backend": "sqlite",
+            "read_cache_url": str(tmp_path / "read-cache.sqlite3"),
+        }
+    )
+
+
+def test_shared_tier_serves_a_peer_processes_load(repo, shared_settings):
+    first = Repository(settings=shared_settings)
+    first.put_game({"release_key": "steam_1", "slug": "one", "title": "One"})
+    assert set(first.get_all_games_map()) == {"steam_1"}
+
+    # Written behind both processes' backs: a process that loads from the
+    # shared tier rather than scanning doesn't see it.
+    repo._table(repo.settings.games_table).put_item(
+        Item={"release_key": "steam_2", "slug": "two", "title": "Two"}
+    )
+    second = Repository(settings=shared_settings)
+    games = second.get_all_games_map()
+    assert set(games) == {"steam_1"}
+    assert games["steam_1"]["title"] == "One"
+    assert second.get_all_games_map() is games  # then cached in-process
+
+
+def test_writes_invalidate_the_shared_tier(repo, shared_settings):
+    first = Repository(settings=shared_settings)
+    first.replace_user_library("1", [{"release_key": "steam_1", "installed": True}])
+    first.put_metadata({"slug": "one", "max_players": 4})
+    assert first.get_all_metadata()
+
+    # Library writes go through to the shared tier; other writes drop it.
+    first.replace_user_library("1", [{"release_key": "steam_2", "installed": False}])
+    first.put_metadata({"slug": "two", "max_players": 2})
+
+    second = Repository(settings=shared_settings)
+    assert [row["release_key"] for row in second.get_user_library("1")] == ["steam_2"]
+    assert set(second.get_all_metadata()) == {"one", "two"}
+
+
+def test_shared_entries_round_trip_and_reject_corruption():
+    value = {"steam_1": {"title": "One", "rating": 81.5, "tags": ["a"]}}
+    expires_at, decoded = decode_entry(encode_entry(value, 123.0))
+    assert (expires_at, decoded) == (123.0, value)
+    assert decode_entry(b"garbage") is None
+    assert encode_entry({"bad": {1, 2}}, 0.0) is None  # sets aren't JSON
+
+
+def test_sqlite_cache_expires_and_deletes(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"))
+    cache.set("a", b"1", ttl=60, generation=0)
+    cache.set("b", b"2", ttl=0.01, generation=0)
+    time.sleep(0.05)
+    assert cache.get("a") == b"1"
+    assert cache.get("b") is None
+    cache.delete("a")
+    assert cache.get("a") is None
+
+
+def test_sqlite_cache_only_publishes_at_the_generation_it_was_read(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"))
+    peer = SQLiteCache(str(tmp_path / "cache.sqlite3"))
+    generation = cache.generation("games_map")
+    assert generation == 0
+
+    peer.delete("games_map")  # another process wrote while we loaded
+    cache.set("games_map", b"stale", ttl=60, generation=generation)
+    assert peer.get("games_map") is None
+
+    assert cache.generation("games_map") == 1
+    cache.set("games_map", b"fresh", ttl=60, generation=1)
+    assert peer.get("games_map") == b"fresh"
+
+
+def test_a_load_that_raced_a_write_is_not_published(repo, shared_settings, monkeypatch):
+    first = Repository(settings=shared_settings)
+    second = Repository(settings=shared_settings)
+    first.put_metadata({"slug": "one", "max_players": 4})
+    scan = first._scan
+
+    def slow_scan(*args, **kwargs):
+        rows = scan(*args, **kwargs)
+        # The other process writes (and invalidates) after our read.
+        second.put_metadata({"slug": "two", "max_players": 2})
+        return rows
+
+    monkeypatch.setattr(first, "_scan", slow_scan)
+    assert set(first.get_all_metadata()) == {"one"}
+
+    # Our stale copy never reached the shared tier, so a cold process reads
+    # the current overrides.
+    third = Repository(settings=shared_settings)
+    assert set(third.get_all_metadata()) == {"one", "two"}
+
+
+def test_unreachable_redis_reads_as_a_miss():
+    pytest.importorskip("redis")
+    cache = RedisCache("redis://127.0.0.1:1/0", timeout=0.2)
+    assert cache.get("games_map") is None
+    assert cache.generation("games_map") is None
+    cache.set("games_map", b"x", ttl=60, generation=0)  # logged, not raised
+    assert cache.get("games_map") is None
+
+
+def _wait_for_refreshes(repo, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while repo._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not repo._refreshing
+
+
+def test_expired_games_map_is_served_while_it_refreshes(repo):
+    repo.settings = repo.settings.model_copy(
+        update={"read_cache_ttl_seconds": 0.05, "read_cache_max_stale_seconds": 60}
+    )
+    repo.put_game({"release_key": "steam_1", "slug": "one", "title": "One"})
+    first = repo.get_all_games_map()
+    repo._table(repo.settings.games_table).put_item(
+        Item={"release_key": "steam_2", "slug": "two", "title": "Two"}
+    )
+    time.sleep(0.1)
+
+    assert repo.get_all_games_map() is first  # stale, refresh started
+    _wait_for_refreshes(repo)
+    refreshed = repo.get_all_games_map()
+    assert set(refreshed) == {"steam_1", "steam_2"}
+    stats = repo.cache_stats()["games_map"]
+    assert (stats["stale_hits"], stats["refreshes"]) == (1, 1)
+
+
+def test_in_lambda_an_expired_entry_reloads_inline(repo):
+    repo.settings = repo.settings.model_copy(
+        update={
+            "read_cache_ttl_seconds": 0.05,
+            "read_cache_max_stale_seconds": 60,
+            "aws_lambda_function_name": "gamatrix-web",
+        }
+    )
+    repo.put_user({"email": "a@x.com", "username": "A", "user_id": "1"})
+    first = repo.scan_users()
+    time.sleep(0.1)
+
+    # No refresh is left to run while the sandbox is frozen.
+    assert repo.scan_users() is not first
+    assert not repo._refreshing
+    stats = repo.cache_stats()["users"]
+    assert (stats["stale_hits"], stats["refreshes"]) == (0, 0)
+
+
+def test_past_the_staleness_cap_reads_reload_inline(repo):
+    repo.settings = repo.settings.model_copy(
+        update={"read_cache_ttl_seconds": 0.05, "read_cache_max_stale_seconds": 0.05}
+    )
+    repo.put_user({"email": "a@x.com", "username": "A", "user_id": "1"})
+    first = repo.scan_users()
+    time.sleep(0.15)
+
+    assert repo.scan_users() is not first
+    assert repo.cache_stats()["users"]["stale_hits"] == 0
+
+
+def test_a_refresh_never_overwrites_a_newer_write(repo):
+    repo.put_user({"email": "a@x.com", "username": "A", "user_id": "1"})
+    repo.scan_users()
+    started_at = repo._versions["users"]
+
+    # The write lands while the refresh (holding pre-write rows) is running.
+    repo.put_user({"email": "b@x.com", "username": "B", "user_id": "2"})
+    repo._refreshing.add("users")
+    repo._refresh("users", lambda: [{"email": "a@x.com"}], started_at)
+
+    assert not repo._refreshing
+    assert {u["email"] for u in repo.scan_users()} == {"a@x.com", "b@x.com"}
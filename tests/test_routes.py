@@ -8,6 +8,7 @@
 
 from __future__ import annotations
 
+import json
 import types
 
 from fastapi.testclient import TestClient
@@ -26,7 +27,7 @@ def _include_all() -> str:
 
 def _opts(query_string: str, preferences: dict):
     request = types.SimpleNamespace(query_params=QueryParams(query_string))
-    repo = types.SimpleNamespace(scan_users=lambda: [])
+    repo = types.SimpleNamespace(users_by_user_id=lambda: {})
     return web.parse_options(request, {"preferences": preferences}, repo)
 
 
@@ -174,6 +175,171 @@ def test_api_games_returns_headless_dataset(repo):
     assert payload["games"][0]["title"] == "Coop Game"
 
 
+def _api_client_with_games(repo, count: int) -> TestClient:
+    repo.put_user({"email": "a@x.com", "username": "A", "user_id": "1"})
+    entries = []
+    for n in range(count):
+        release_key = f"steam_{n}"
+        repo.put_game(
+            {
+                "release_key": release_key,
+                "title": f"Game {n:02d}",
+                "slug": f"game{n:02d}",
+                "igdb_key": release_key,
+                "platform": "steam",
+                "multiplayer": True,
+                "max_players": n % 3 + 2,
+            }
+        )
+        entries.append({"release_key": release_key, "platform": "steam"})
+    repo.replace_user_library("1", entries)
+    app.dependency_overrides[get_repo] = lambda: repo
+    app.dependency_overrides[current_user_api] = lambda: {
+        "email": "a@x.com",
+        "username": "A",
+    }
+    return TestClient(app)
+
+
+def test_api_games_cursor_pages_cover_the_result_once(repo):
+    try:
+        client = _api_client_with_games(repo, 7)
+        full = client.get("/api/games?user=1&sort=players&dir=desc").json()
+        seen: list[str] = []
+        cursor = None
+        while True:
+            url = "/api/games?user=1&sort=players&dir=desc&limit=3"
+            if cursor:
+                url += f"&cursor={cursor}"
+            page = client.get(url).json()
+            seen.extend(g["release_key"] for g in page["games"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+    finally:
+        app.dependency_overrides.clear()
+
+    assert full["next_cursor"] is None
+    assert seen == [g["release_key"] for g in full["games"]]
+
+
+def test_api_games_returns_ndjson(repo):
+    try:
+        client = _api_client_with_games(repo, 3)
+        response = client.get(
+            "/api/games?user=1&limit=2",
+            headers={"Accept": "application/x-ndjson"},
+        )
+        bad_cursor = client.get("/api/games?user=1&cursor=not-a-cursor")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["x-total-count"] == "3"
+    assert "x-next-cursor" in response.headers
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [g["title"] for g in lines] == ["Game 00", "Game 01"]
+    assert bad_cursor.status_code == 400
+
+
+def test_min_owners_param_parses_blank_and_junk_as_everyone():
+    prefs = {"selected_users": ["1"]}
+    assert _opts("user=1&min_owners=2", prefs).to_query().min_owners == 2
+    assert _opts("user=1&min_owners=", prefs).min_owners is None
+    assert _opts("user=1&min_owners=lots", prefs).min_owners is None
+    assert _opts("user=1&min_owners=%C2%B2", prefs).min_owners is None  # "²"
+
+
+def test_top_param_parses_junk_and_non_ascii_digits_as_unset():
+    prefs = {"selected_users": ["1"]}
+    assert _opts("user=1&top=5", prefs).top == 5
+    for junk in ("", "0", "-3", "lots", "%C2%B2"):
+        assert _opts(f"user=1&top={junk}", prefs).top is None
+
+
+def test_api_games_echoes_and_validates_min_owners(repo):
+    try:
+        client = _api_client_with_games(repo, 2)
+        response = client.get("/api/games?user=1&min_owners=1")
+        invalid = client.get("/api/games?user=1&min_owners=0")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.json()["query"]["min_owners"] == 1
+    assert response.json()["facets"]["platform"]["steam"] == 2
+    assert response.json()["total"] == 2
+    assert invalid.status_code == 422
+
+
+def test_api_games_overlap_returns_pairwise_counts(repo):
+    try:
+        client = _api_client_with_games(repo, 3)
+        response = client.get("/api/games/overlap?user=1")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["user_ids"] == ["1"]
+    assert payload["counts"] == [[3]]
+
+
+def test_api_games_search_suggests_titles_and_filters_the_comparison(repo):
+    try:
+        client = _api_client_with_games(repo, 12)
+        suggestions = client.get("/api/games/search?q=game 1&limit=2").json()
+        filtered = client.get("/api/games?user=1&q=game 11").json()
+    finally:
+        app.dependency_overrides.clear()
+
+    assert suggestions["results"] == [
+        {"slug": "game10", "title": "Game 10"},
+        {"slug": "game11", "title": "Game 11"},
+    ]
+    assert filtered["query"]["q"] == "game 11"
+    assert [g["title"] for g in filtered["games"]] == ["Game 11"]
+
+
+def test_api_games_recommends_the_top_games_and_records_picks(repo):
+    try:
+        client = _api_client_with_games(repo, 5)
+        app.dependency_overrides[current_user_api] = lambda: repo.get_user("a@x.com")
+        top = client.get("/api/games?user=1&sort=recommended&top=2").json()
+        pick = client.post("/api/games/picks", data={"slug": top["games"][0]["slug"]})
+        after = client.get("/api/games?user=1&sort=recommended&top=2").json()
+        unknown = client.post("/api/games/picks", data={"slug": "no-such-game"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert top["query"]["sort"] == {"field": "recommended", "direction": "desc"}
+    assert len(top["games"]) == 2 and top["total"] == 5
+    assert top["games"][0]["score"] >= top["games"][1]["score"]
+    assert pick.json()["recent_picks"][0]["slug"] == top["games"][0]["slug"]
+    assert after["games"][0]["slug"] != top["games"][0]["slug"]
+    assert unknown.status_code == 404
+
+
+def test_cache_stats_are_admin_only(repo):
+    try:
+        client = _api_client_with_games(repo, 3)
+        client.get("/api/games?user=1")
+        denied = client.get("/api/cache/stats")
+        app.dependency_overrides[current_user_api] = lambda: {
+            "email": "a@x.com",
+            "is_admin": True,
+        }
+        stats = client.get("/api/cache/stats").json()
+    finally:
+        app.dependency_overrides.clear()
+
+    assert denied.status_code == 403
+    families = stats["read_model"]["families"]
+    assert families["games_map"]["entries"] == 1
+    assert families["games_map"]["bytes"] > 0
+    assert families["library"]["hits"] >= 1
+    assert stats["comparisons"]["misses"] >= 1
+
+
 def test_authenticated_ux_routes_remain_auth_gated(repo):
     app.dependency_overrides[get_repo] = lambda: repo
     try:
@@ -189,10 +355,20 @@ def test_authenticated_ux_routes_remain_auth_gated(repo):
             assert response.status_code == 302
             assert response.headers["location"] == "/auth/login"
 
-        for path in ("/games/table", "/api/games", "/api/jobs/not-found"):
+        for path in (
+            "/games/table",
+            "/api/games",
+            "/api/games/overlap",
+            "/api/games/search",
+            "/api/jobs/not-found",
+        ):
             assert client.get(path).status_code == 401
 
-        for path in ("/games/refresh-igdb", "/games/refresh-igdb-all"):
+        for path in (
+            "/games/refresh-igdb",
+            "/games/refresh-igdb-all",
+            "/api/games/picks",
+        ):
             assert client.post(path).status_code == 401
     finally:
         app.dependency_overrides.clear()
@@ -0,0 +1,64 @@
+"""Tests for the title search index."""
+
+from __future__ import annotations
+
+import numpy as np
+
+from gamatrix.games.search import build_search_index, search_index_for
+from gamatrix.storage import interning
+from gamatrix.storage.interning import InternedGame
+
+
+def _games(*rows: tuple[str, str, str]) -> dict[int, InternedGame]:
+    games = {}
+    for release_key, title, slug in rows:
+        games[interning.release_keys.intern(release_key)] = InternedGame(
+            interning.slugs.intern(slug),
+            {"release_key": release_key, "title": title, "slug": slug},
+        )
+    return games
+
+
+def _slugs(ids: np.ndarray | None) -> set[str] | None:
+    if ids is None:
+        return None
+    return {interning.slugs.key(int(i)) for i in ids}
+
+
+GAMES = _games(
+    ("steam_901", "The Witcher 3", "the-witcher-3"),
+    ("gog_901", "The Witcher 3 GOTY", "the-witcher-3"),
+    ("steam_902", "Witchfire", "witchfire"),
+    ("steam_903", "Baldur's Gate 3", "baldurs-gate-3"),
+    ("steam_904", "Portal 2", "portal-2"),
+)
+
+
+def test_prefix_matches_any_word_of_the_title():
+    index = build_search_index(GAMES)
+    assert _slugs(index.match("wit")) == {"the-witcher-3", "witchfire"}
+    assert _slugs(index.match("WITCHER")) == {"the-witcher-3"}
+    # Apostrophes and accents normalize like slugs.
+    assert _slugs(index.match("baldurs g")) == {"baldurs-gate-3"}
+    assert index.match("  ") is None
+
+
+def test_falls_back_to_fuzzy_matching_without_a_prefix_hit():
+    index = build_search_index(GAMES)
+    assert _slugs(index.match("portl")) == {"portal-2"}
+    assert _slugs(index.match("zz")) == set()
+
+
+def test_suggestions_rank_title_prefixes_first_and_use_the_preferred_title():
+    index = build_search_index(GAMES)
+    assert len(index) == 4
+    titles = [title for _, title in index.suggest("wit", 5)]
+    # The steam release's title wins for the slug both releases share.
+    assert titles == ["Witchfire", "The Witcher 3"]
+    assert index.suggest("wit", 1) == index.suggest("wit", 5)[:1]
+
+
+def test_index_is_reused_until_the_games_map_is_replaced():
+    first = search_index_for(GAMES)
+    assert search_index_for(GAMES) is first
+    assert search_index_for(dict(GAMES)) is not first
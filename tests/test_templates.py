@@ -152,3 +152,28 @@ def test_default_token_templates_preserve_management_ui():
         assert "/auth/tokens/list" in html
         assert "/auth/upload-gamatrix.sh" in html
         assert "No tokens yet." in fragment
+
+
+def test_games_table_fragment_refreshes_facet_counts_out_of_band():
+    opts = types.SimpleNamespace(
+        selected_user_ids=["1"], sort="title", direction="asc", show_keys=False
+    )
+    facets = {
+        "platform": {"steam": 3, "gog": 1},
+        "mode": {"multiplayer": 2, "single_player": 5},
+        "installed": {"installed": 1},
+    }
+    for ux_template in UX_TEMPLATES:
+        environment = build_authenticated_templates(ux_template)
+        html = environment.env.get_template("games_table.html.jinja").render(
+            users={},
+            opts=opts,
+            is_grid=False,
+            platforms=["steam", "gog"],
+            games=[],
+            caption="",
+            facets=facets,
+            facets_oob=True,
+        )
+        assert 'id="facet-platform-steam" hx-swap-oob="true">(3)' in html
+        assert 'id="facet-mode-single_player" hx-swap-oob="true">(5)' in html